@@ -3,104 +3,392 @@ Flask API for AI-based Disease Prediction System
 Provides endpoints for disease prediction using Bayesian inference.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g, has_request_context
 from flask_cors import CORS
+import base64
+import binascii
+import hashlib
+import hmac
 import json
+import os
+import threading
+import time
 from bayesian_model import BayesianDiseaseModel
+from disease_catalogue import DISEASE_CATALOGUE
+from json_provider import FastJSONProvider
+from lookup_table import EvidenceLookupTable
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, SIZE_BUCKETS, MetricsRegistry
+from model_snapshots import ModelFileWatcher, ModelManager
+from parallel_batch import ParallelBatchExecutor, isolate_workers_from_main
+from prediction_cache import LRUCache
+from profiling import RequestProfiler
+from storage import DEFAULT_MAX_SESSIONS_PER_USER, DEFAULT_SESSION_TTL, open_store
+from symptom_validator import SymptomValidator, normalize_symptom
+from werkzeug.local import LocalProxy
 from flask import session
 import uuid
-from difflib import get_close_matches
-import re
 
 app = Flask(__name__)
+# orjson-backed JSON encoding when available; JSON_PROVIDER=json forces the stdlib encoder
+app.json = FastJSONProvider(app, use_orjson=os.environ.get('JSON_PROVIDER', 'orjson') != 'json')
 CORS(app, resources={r"/*": {"origins": "*"}}, allow_headers=["Content-Type", "Authorization"])  # Enable CORS for React frontend with Authorization header
 
-# Initialize the Bayesian model
-model = BayesianDiseaseModel()
+# Opt-in cProfile profiling of single requests: requests carrying PROFILE_TOKEN
+# in X-Profile-Token, and a PROFILE_SAMPLE_RATE fraction of prediction requests
+request_profiler = RequestProfiler(app.wsgi_app, token=os.environ.get('PROFILE_TOKEN'),
+                                   sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)))
+app.wsgi_app = request_profiler
 
-# In-memory user and history storage
-users = {
-    "testuser": {"password": "testpass", "name": "Test User"}
-}
-user_histories = {}
-sessions = {}
+# Initialize the Bayesian model; MODEL_ARTIFACT points at a binary model file
+# (see model_artifact.py) that is memory-mapped and shared between workers
+_model_artifact = os.environ.get('MODEL_ARTIFACT')
+# SPARSE_MODEL=1 scores predictions through sparse likelihood tables (log-space
+# inference), for large catalogues where most symptoms follow a background
+_sparse_model = os.environ.get('SPARSE_MODEL') == '1'
+model_manager = ModelManager(
+    BayesianDiseaseModel(artifact=_model_artifact, inference='log' if _sparse_model else 'linear',
+                         sparse=_sparse_model),
+    source=_model_artifact
+)
 
-# In-memory storage for custom symptoms per user
-user_custom_symptoms = {}
+
+def _request_model():
+    """The model of the snapshot pinned to the current request, else the one currently served."""
+    snapshot = g.get('model_snapshot') if has_request_context() else None
+    return (snapshot or model_manager.current).model
+
+
+# Each request sees one model from start to finish, even if a new one is
+# swapped in meanwhile (see model_snapshots.py)
+model = LocalProxy(_request_model)
+
+# MODEL_WATCH_INTERVAL > 0 reloads MODEL_ARTIFACT whenever the file is
+# replaced, checking every that many seconds
+_watch_interval = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+model_watcher = (ModelFileWatcher(model_manager, _model_artifact, _watch_interval).start()
+                 if _watch_interval > 0 and _model_artifact else None)
+
+# Large batches are sharded across BATCH_WORKERS processes sharing the model
+# tables; unset or 1 scores batches in-process
+_batch_workers = int(os.environ.get('BATCH_WORKERS', 1))
+batch_executor = ParallelBatchExecutor(model, _batch_workers) if _batch_workers > 1 and model.backend == 'numpy' else None
+
+# Grouped log-likelihood tables behind /api/triage, compiled per model version
+_lookup_table = None
+
+# Guards the /admin/model endpoints (X-Admin-Token header); unset disables them
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Catalogue lists may be reused for 5 minutes, then revalidated by ETag
+CATALOGUE_CACHE_CONTROL = 'public, max-age=300'
+
+# Pre-serialized bodies of endpoints that only change with the model:
+# endpoint -> (model version, body, ETag)
+_static_responses = {}
+
+# Serialized /api/predict responses keyed by (model version, evidence key, format)
+response_cache = LRUCache(4096)
+
+# Incremental inference state of interactive diagnosis sessions, keyed by
+# session id. The sessions themselves live in the store, so any worker can
+# serve them; this is only a per-process cache of their scored evidence
+inference_sessions = LRUCache(10000)
+# Held by session updates and deletes from loading a session through saving
+# it, so concurrent deltas to one session apply in turn within a worker
+prediction_session_lock = threading.Lock()
+
+# Users, login sessions, history, custom symptoms and diagnosis sessions. STORAGE_PATH selects a
+# SQLite database shared by all workers; without it data is kept in memory.
+# Login tokens expire after SESSION_TTL idle seconds
+store = open_store(
+    os.environ.get('STORAGE_PATH'),
+    session_ttl=float(os.environ.get('SESSION_TTL', DEFAULT_SESSION_TTL)),
+    max_sessions_per_user=int(os.environ.get('MAX_SESSIONS_PER_USER', DEFAULT_MAX_SESSIONS_PER_USER))
+)
+store.add_user("testuser", "testpass", "Test User")
+
+# Likelihood overlays giving custom symptoms a say in inference, per username
+user_overlays = LRUCache(10000)
+
+
+def _drop_replaced_model_caches(previous, current):
+    """Free what was derived from a replaced model; its version keys can never match again."""
+    global _lookup_table
+    _static_responses.clear()
+    response_cache.clear()
+    user_overlays.clear()
+    inference_sessions.clear()
+    _lookup_table = None
+    if batch_executor is not None:
+        batch_executor.reset(current.model.version)
+
+
+model_manager.add_listener(_drop_replaced_model_caches)
+
+# History entries per page, entries kept per user (oldest are compacted away)
+# and the largest accepted entry, in bytes of JSON
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+HISTORY_RETENTION = int(os.environ.get('HISTORY_RETENTION', 1000))
+MAX_HISTORY_ENTRY_BYTES = 16 * 1024
+
+# Cases scored per model call by the streaming batch endpoint
+STREAM_CHUNK_SIZE = 500
+MAX_STREAM_CHUNK_SIZE = 10000
+
+# Prometheus metrics served at /metrics; recording is lock-free (per-thread
+# cells merged on scrape). Each worker process reports its own values.
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter('disease_api_requests_total', 'HTTP requests by route, method and status',
+                           ('route', 'method', 'status'))
+REQUEST_SECONDS = metrics.histogram('disease_api_request_duration_seconds',
+                                    'Time to produce a response, by route', ('route', 'method'))
+INFERENCE_SECONDS = metrics.histogram('disease_api_inference_duration_seconds',
+                                      'Time spent inside the model, by operation', ('operation',))
+SERIALIZATION_SECONDS = metrics.histogram('disease_api_serialization_duration_seconds',
+                                          'Time spent serializing response bodies, by route', ('route',))
+BATCH_CASES = metrics.histogram('disease_api_batch_cases', 'Cases per /api/batch-predict request',
+                                buckets=SIZE_BUCKETS)
+VALIDATION_SECONDS = metrics.histogram('disease_api_symptom_validation_duration_seconds',
+                                       'Time spent validating custom symptom names')
+
+
+def _store_sizes():
+    sizes = store.sizes()
+    sizes["login_sessions"] = store.session_stats()["live"]
+    return {(kind,): count for kind, count in sizes.items()}
+
+
+def _cache_stats():
+    return {
+        "prediction": model.prediction_cache.stats(),
+        "response": response_cache.stats(),
+        "inference_sessions": inference_sessions.stats(),
+        "user_overlays": user_overlays.stats()
+    }
+
+
+metrics.gauge('disease_api_store_records', 'Records held by the user store, by kind', _store_sizes, ('kind',))
+metrics.gauge('disease_api_cache_entries', 'Entries held by each in-process cache',
+              lambda: {(name,): stats["size"] for name, stats in _cache_stats().items()}, ('cache',))
+metrics.gauge('disease_api_cache_lookups_total', 'Cache lookups by cache and result',
+              lambda: {(name, result): stats[key] for name, stats in _cache_stats().items()
+                       for result, key in (("hit", "hits"), ("miss", "misses"))},
+              ('cache', 'result'), kind='counter')
+metrics.gauge('disease_api_model_version', 'Version of the loaded model tables', lambda: model.version)
 
 
 def _normalize_symptom(name: str) -> str:
-    return re.sub(r"\s+", " ", name.strip()).title()
+    return normalize_symptom(name)
+
+
+# Precompiled validators, one per symptom catalogue
+_symptom_validators = {}
 
 
 def _validate_symptom_text(symptom: str, model_symptoms) -> (bool, str, str):
-    if not symptom or not isinstance(symptom, str):
-        return False, "Symptom must be a non-empty string", ""
-    normalized = _normalize_symptom(symptom)
-    if not re.match(r"^[A-Za-z\s\-/]+$", normalized):
-        return False, "Only letters, spaces, hyphen and slash are allowed", ""
-
-    # Already exists in model
-    if normalized in model_symptoms:
-        return False, "Symptom already exists in the system", normalized
-
-    # Basic quality checks for custom symptoms
-    tokens = [t for t in re.split(r"\s+", normalized) if t]
-    if len(tokens) < 2:
-        return False, "Please provide a more descriptive symptom (e.g., 'Back Pain').", ""
-    if any(len(t) < 3 for t in tokens):
-        return False, "Each word should have at least 3 letters.", ""
-
-    # Require a medical descriptor to avoid nonsense terms
-    descriptors = {
-        "Pain", "Ache", "Swelling", "Rash", "Numbness", "Itching", "Bleeding",
-        "Cramp", "Stiffness", "Burning", "Tingling", "Weakness", "Fatigue",
-        "Diarrhea", "Vomiting", "Nausea", "Cough", "Fever", "Dizziness",
-        "Shortness", "Breath", "Soreness", "Inflammation"
-    }
-    if tokens[-1] not in descriptors and not any(t in descriptors for t in tokens):
-        return False, "Please end with a medical descriptor like 'Pain', 'Rash', 'Swelling', etc.", ""
-
-    # At least one non-descriptor token should be a known anatomical/symptom term
-    allowed_terms = {
-        # Anatomy
-        "Head","Scalp","Face","Eye","Ear","Nose","Mouth","Tooth","Gum","Throat","Neck",
-        "Shoulder","Arm","Elbow","Wrist","Hand","Finger","Chest","Breast","Back","Upper","Lower",
-        "Abdomen","Stomach","Hip","Groin","Thigh","Knee","Calf","Ankle","Foot","Toe","Spine","Waist",
-        "Skin","Joint","Muscle",
-        # Systems / general
-        "Breathing","Vision","Hearing","Urination","Bowel","Sleep","Appetite"
-    }
-    non_descriptor_tokens = [t for t in tokens if t not in descriptors]
-    has_known_term = False
-    for t in non_descriptor_tokens:
-        if t in allowed_terms:
-            has_known_term = True
-            break
-        # fuzzy check to nearest allowed term
-        close_allowed = get_close_matches(t, list(allowed_terms), n=1, cutoff=0.85)
-        if close_allowed:
-            has_known_term = True
-            break
-    if not has_known_term:
-        close_any = get_close_matches(non_descriptor_tokens[0], list(allowed_terms), n=1, cutoff=0.7)
-        hint = f" Did you mean '{close_any[0]}'?" if close_any else ""
-        return False, "Please use a recognizable body area or symptom term." + hint, ""
-
-    # Suggest closest existing symptom if typo
-    close = get_close_matches(normalized, model_symptoms, n=1, cutoff=0.85)
-    if close:
-        return False, f"Did you mean '{close[0]}'? This symptom already exists.", close[0]
-
-    return True, "", normalized
+    key = tuple(model_symptoms)
+    validator = _symptom_validators.get(key)
+    if validator is None:
+        validator = _symptom_validators[key] = SymptomValidator(key)
+    started = time.perf_counter()
+    verdict = validator.validate(symptom)
+    VALIDATION_SECONDS.observe(time.perf_counter() - started)
+    return verdict
 
 
 def _get_username_from_auth_header():
-    auth = request.headers.get('Authorization') or ''
-    token = auth.replace('Bearer ', '').strip()
-    if not token:
+    """Username for the request's login token; the token is looked up once per request."""
+    if 'username' not in g:
+        auth = request.headers.get('Authorization') or ''
+        token = auth.replace('Bearer ', '').strip()
+        g.username = store.session_user(token) if token else None
+    return g.username
+
+
+def _static_json_response(endpoint, build_payload, cache_control):
+    """
+    Serve a payload that only changes with the model. It is serialized once
+    per model version and served with a strong ETag; requests whose
+    If-None-Match matches get an empty 304.
+    """
+    cached = _static_responses.get(endpoint)
+    if cached is None or cached[0] != model.version:
+        version = model.version
+        body = app.json.response(build_payload()).get_data()
+        stale = cached is not None and cached[0] > version
+        cached = (version, body, hashlib.sha1(body).hexdigest())
+        if not stale:
+            # Requests still on a replaced model must not evict the new model's body
+            _static_responses[endpoint] = cached
+    _, body, etag = cached
+    
+    headers = {"ETag": f'"{etag}"', "Cache-Control": cache_control}
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype=app.json.mimetype, headers=headers)
+
+
+def _get_lookup_table():
+    """The triage lookup table for the current model, compiled on first use."""
+    global _lookup_table
+    table = _lookup_table
+    if table is None or table.model_version != model.version:
+        stale = table is not None and table.model_version > model.version
+        table = EvidenceLookupTable(model)
+        if not stale:
+            _lookup_table = table
+    return table
+
+
+def _get_allowed_custom_symptoms(username=None):
+    """Custom symptom names accepted for `username` (default: the requesting user)."""
+    username = username or _get_username_from_auth_header()
+    return set(store.custom_symptoms(username)) if username else set()
+
+
+def _get_user_overlay(username):
+    """
+    The user's custom-symptom overlay for the current model, built on first use
+    and rebuilt when the model or the user's custom symptoms change.
+    """
+    custom_symptoms = tuple(store.custom_symptoms(username)) if username else ()
+    if not custom_symptoms or model.backend != 'numpy':
+        return None
+    key = (model.version, custom_symptoms)
+    entry = user_overlays.get(username)
+    if entry is None or entry[0] != key:
+        entry = (key, model.build_overlay(custom_symptoms))
+        user_overlays.put(username, entry)
+    return entry[1]
+
+
+def _batch_results(cases, top_k, include_top_diseases, allowed_symptoms, overlay=None):
+    """Score a list of {"id", "symptoms"} cases in one model call, preserving order."""
+    scored = [case for case in cases if isinstance(case, dict) and 'id' in case and 'symptoms' in case]
+    predictor = batch_executor or model
+    started = time.perf_counter()
+    predictions = iter(predictor.predict_batch([case['symptoms'] for case in scored], top_k=top_k,
+                                               allowed_symptoms=allowed_symptoms, overlay=overlay))
+    INFERENCE_SECONDS.observe(time.perf_counter() - started, 'predict_batch')
+    
+    results = []
+    for case in cases:
+        if not isinstance(case, dict) or 'id' not in case or 'symptoms' not in case:
+            results.append({
+                "id": case.get('id', 'unknown') if isinstance(case, dict) else 'unknown',
+                "error": "Missing 'id' or 'symptoms' field"
+            })
+            continue
+        
+        prediction = next(predictions)
+        if "error" in prediction:
+            results.append({
+                "id": case['id'],
+                "success": False,
+                "error": prediction["error"]
+            })
+            continue
+        
+        result = {
+            "id": case['id'],
+            "success": True,
+            "most_probable_disease": prediction["most_probable_disease"],
+            "most_probable_probability": prediction["most_probable_probability"],
+            "symptoms": case['symptoms']
+        }
+        if include_top_diseases:
+            result["top_diseases"] = prediction["top_diseases"]
+        results.append(result)
+    return results
+
+
+def _encode_history_cursor(entry_id: int) -> str:
+    return base64.urlsafe_b64encode(str(entry_id).encode()).decode().rstrip('=')
+
+
+def _decode_history_cursor(cursor: str):
+    """Entry id encoded in a history cursor, or None if the cursor is malformed."""
+    try:
+        entry_id = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    # str.isdigit() also accepts non-ASCII digits such as "²", which int() rejects
+    if not (entry_id.isascii() and entry_id.isdigit()) or len(entry_id) > 19:
         return None
-    return sessions.get(token)
+    entry_id = int(entry_id)
+    # Entry ids are SQLite INTEGERs, which cannot hold 2**63 or more
+    return entry_id if entry_id < 2 ** 63 else None
+
+
+def _predict_response_body(symptoms, prediction_result, session_id=None) -> bytes:
+    """
+    Serialize the /api/predict response. The top-5 disease entries are spliced
+    in from the catalogue's pre-serialized fragments. Session responses also
+    carry their `session_id`.
+    """
+    analysis_metadata = {
+        "total_diseases_analyzed": len(model.diseases),
+        "symptoms_provided": len(symptoms),
+        "model_type": "Bayesian Network"
+    }
+    top_diseases = DISEASE_CATALOGUE.ranked_fragments(prediction_result["all_diseases"][:5])  # Top 5 diseases
+    # Keys in sorted order, so the body equals json.dumps(response, sort_keys=True)
+    return "".join((
+        '{"all_probabilities": ', json.dumps(prediction_result["probability_distribution"], sort_keys=True),
+        ', "analysis_metadata": ', json.dumps(analysis_metadata, sort_keys=True),
+        ', "input_symptoms": ', json.dumps(symptoms, sort_keys=True),
+        ', "most_probable_disease": ', json.dumps(prediction_result["most_probable_disease"]),
+        ', "most_probable_probability": ', json.dumps(prediction_result["most_probable_probability"]),
+        ', "session_id": ' + json.dumps(session_id) if session_id is not None else '',
+        ', "success": true',
+        ', "top_diseases": ', top_diseases,
+        '}'
+    )).encode()
+
+
+def _compact_predict_response_body(prediction_result) -> bytes:
+    """
+    Serialize the compact /api/predict response: the most probable disease and
+    rounded percentages for every disease as an array in /api/diseases order.
+    """
+    probabilities = prediction_result["probability_distribution"]
+    return app.json.dumps({
+        "success": True,
+        "most_probable_disease": prediction_result["most_probable_disease"],
+        "most_probable_probability": prediction_result["most_probable_probability"],
+        "probabilities": [probabilities[disease] for disease in model.diseases]
+    }).encode()
+
+
+@app.before_request
+def _pin_model_snapshot():
+    # Registered first: every later hook and the view see this snapshot
+    g.model_snapshot = model_manager.current
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    # Streamed responses are timed up to their first byte
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method)
+    REQUESTS.inc(route, request.method, response.status_code)
+    return response
+
+
+@app.after_request
+def _add_model_version_header(response):
+    snapshot = g.get('model_snapshot')
+    if snapshot is not None:
+        response.headers['X-Model-Version'] = snapshot.version_id
+    return response
 
 
 @app.route("/")
@@ -110,42 +398,167 @@ def home():
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({
+    # Monitors must revalidate every time; a matching ETag still costs only a 304
+    return _static_json_response('health', lambda: {
         "status": "healthy",
         "message": "AI Disease Prediction API is running",
         "diseases_count": len(model.diseases),
-        "symptoms_count": len(model.symptoms)
-    })
+        "symptoms_count": len(model.symptoms),
+        "model_version": g.model_snapshot.version_id
+    }, cache_control='no-cache')
 
 @app.route('/api/diseases', methods=['GET'])
 def get_diseases():
     """Get list of all supported diseases."""
-    return jsonify({
+    return _static_json_response('diseases', lambda: {
         "diseases": model.diseases,
         "count": len(model.diseases)
-    })
+    }, cache_control=CATALOGUE_CACHE_CONTROL)
 
 @app.route('/api/symptoms', methods=['GET'])
 def get_symptoms():
     """Get list of all supported symptoms."""
-    return jsonify({
+    return _static_json_response('symptoms', lambda: {
         "symptoms": model.symptoms,
         "severity_levels": model.severity_levels,
-        "count": len(model.symptoms)
+        "count": len(model.symptoms),
+        # Evidence codes: symptom i at severity level j adds (j + 1) * base ** i
+        "evidence_code_base": len(model.severity_levels) + 1
+    }, cache_control=CATALOGUE_CACHE_CONTROL)
+
+def _check_profiling_access():
+    """Return an error response unless profiling is configured and the request carries its token."""
+    if request_profiler.token is None:
+        return jsonify({"success": False, "error": "Profiling is disabled; set PROFILE_TOKEN"}), 404
+    if not request_profiler.authorized(request.environ):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    return None
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Buffered request profiles, newest first, plus the sampling settings."""
+    error = _check_profiling_access()
+    if error:
+        return error
+    return jsonify({
+        "success": True,
+        "profiles": request_profiler.summaries(),
+        "sample_rate": request_profiler.sample_rate,
+        "skipped": request_profiler.skipped
+    })
+
+@app.route('/admin/profiles/<int:profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    One profile. `format` selects collapsed stacks (default, text for
+    flamegraph tools), the pstats report (`stats`) or everything as JSON.
+    """
+    error = _check_profiling_access()
+    if error:
+        return error
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        return jsonify({"success": False, "error": "Profile not found"}), 404
+    output_format = request.args.get('format', 'collapsed')
+    if output_format == 'collapsed':
+        return Response("\n".join(profile["collapsed"]) + "\n", mimetype='text/plain')
+    if output_format == 'stats':
+        return Response(profile["stats"], mimetype='text/plain')
+    if output_format == 'json':
+        return jsonify({"success": True, "profile": profile})
+    return jsonify({"success": False, "error": "'format' must be 'collapsed', 'stats' or 'json'"}), 400
+
+@app.route('/admin/profiles', methods=['DELETE'])
+def clear_profiles():
+    error = _check_profiling_access()
+    if error:
+        return error
+    request_profiler.clear()
+    return jsonify({"success": True})
+
+@app.route('/admin/profiles/sampling', methods=['PUT'])
+def set_profile_sampling():
+    """Change the sampling rate at runtime: {"rate": 0.01}; 0 stops sampling."""
+    error = _check_profiling_access()
+    if error:
+        return error
+    rate = (request.get_json(silent=True) or {}).get('rate')
+    if not isinstance(rate, (int, float)) or isinstance(rate, bool):
+        return jsonify({"success": False, "error": "'rate' must be a number between 0 and 1"}), 400
+    try:
+        request_profiler.set_sample_rate(float(rate))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "sample_rate": request_profiler.sample_rate})
+
+def _check_admin_access():
+    """Return an error response unless model administration is configured and the request carries its token."""
+    if not ADMIN_TOKEN:
+        return jsonify({"success": False, "error": "Model administration is disabled; set ADMIN_TOKEN"}), 404
+    supplied = request.headers.get('X-Admin-Token')
+    if supplied is None or not hmac.compare_digest(supplied, ADMIN_TOKEN):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    return None
+
+@app.route('/admin/model', methods=['GET'])
+def get_model_status():
+    """The served model snapshot and the outcome of the last reload."""
+    error = _check_admin_access()
+    if error:
+        return error
+    return jsonify({"success": True, "model": model_manager.status()})
+
+@app.route('/admin/model/reload', methods=['POST'])
+def reload_model():
+    """
+    Load, validate and swap in a model artifact: {"path": "...", "wait": true}.
+    
+    `path` defaults to the artifact currently served. Requests already running
+    finish on the old model. With "wait": false the reload runs in the
+    background and the response is 202; poll GET /admin/model for the outcome.
+    """
+    error = _check_admin_access()
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    path = data.get('path')
+    if path is not None and (not isinstance(path, str) or not path):
+        return jsonify({"success": False, "error": "'path' must be a non-empty string"}), 400
+    if not (path or model_manager.source):
+        return jsonify({"success": False, "error": "No model artifact to reload; pass 'path'"}), 400
+    if not data.get('wait', True):
+        model_manager.reload_async(path)
+        return jsonify({"success": True, "status": "loading"}), 202
+    try:
+        snapshot = model_manager.reload(path)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e), "model": model_manager.status()}), 422
+    return jsonify({"success": True, "model_version": snapshot.version_id, "model": model_manager.status()})
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Get hit/miss/eviction counters for the prediction caches and login sessions."""
+    return jsonify({
+        "model_version": model.version,
+        "prediction_cache": model.prediction_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "login_sessions": store.session_stats()
     })
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics for this worker process."""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/api/disease-info/<disease_name>', methods=['GET'])
 def get_disease_info(disease_name):
     """Get detailed information about a specific disease."""
     try:
-        disease_info = model.get_disease_info(disease_name)
-        if disease_info["description"] == "No additional information available.":
+        body = DISEASE_CATALOGUE.info_body(disease_name)
+        if body is None:
             return jsonify({"error": "Disease not found"}), 404
         
-        return jsonify({
-            "disease": disease_name,
-            "info": disease_info
-        })
+        return Response(body, mimetype=app.json.mimetype)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -162,14 +575,29 @@ def predict_disease():
             "Headache": "Mild"
         }
     }
+    
+    With `?format=compact` the response only carries "success",
+    "most_probable_disease", "most_probable_probability" and "probabilities",
+    an array of percentages aligned to /api/diseases.
     """
     try:
         # Validate request
         if not request.is_json:
             return jsonify({"error": "Request must be JSON"}), 400
         
+        response_format = request.args.get('format', 'full')
+        if response_format not in ('full', 'compact'):
+            return jsonify({"error": "'format' must be 'full' or 'compact'"}), 400
+        
         data = request.get_json()
         
+        if 'symptoms' not in data and 'evidence_code' in data:
+            # Compact integer encoding of the symptom dict (see /api/symptoms)
+            try:
+                data['symptoms'] = model.decode_evidence(data['evidence_code'])
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        
         if 'symptoms' not in data:
             return jsonify({"error": "Missing 'symptoms' field"}), 400
         
@@ -177,7 +605,7 @@ def predict_disease():
         
         # Determine allowed symptoms (built-in + user's custom)
         username = _get_username_from_auth_header()
-        user_allowed = set(user_custom_symptoms.get(username, [])) if username else set()
+        user_allowed = set(store.custom_symptoms(username)) if username else set()
         allowed_symptoms = set(model.symptoms) | user_allowed
         
         # Validate symptoms format
@@ -198,37 +626,30 @@ def predict_disease():
                     "valid_levels": model.severity_levels
                 }), 400
         
-        # Make prediction
-        prediction_result = model.predict(symptoms)
-        
-        # Get detailed information for top diseases
-        top_diseases = []
-        for disease, probability in prediction_result["all_diseases"][:5]:  # Top 5 diseases
-            disease_info = model.get_disease_info(disease)
-            top_diseases.append({
-                "name": disease,
-                "probability": probability,
-                "description": disease_info["description"],
-                "common_causes": disease_info["common_causes"],
-                "severity": disease_info["severity"]
-            })
-        
-        # Prepare response
-        response = {
-            "success": True,
-            "input_symptoms": symptoms,
-            "most_probable_disease": prediction_result["most_probable_disease"],
-            "most_probable_probability": prediction_result["most_probable_probability"],
-            "top_diseases": top_diseases,
-            "all_probabilities": prediction_result["probability_distribution"],
-            "analysis_metadata": {
-                "total_diseases_analyzed": len(model.diseases),
-                "symptoms_provided": len(symptoms),
-                "model_type": "Bayesian Network"
-            }
-        }
+        # Catalogue-only evidence fully determines the response; serve it from cache
+        response_key = model.evidence_key(symptoms, strict=True)
+        if response_key is not None:
+            cached_body = response_cache.get((model.version, response_key, response_format))
+            if cached_body is not None:
+                return Response(cached_body, mimetype=app.json.mimetype)
         
-        return jsonify(response)
+        # Make prediction; custom symptoms are scored through the user's overlay
+        overlay = _get_user_overlay(username)
+        started = time.perf_counter()
+        if response_format == 'compact':
+            prediction_result = model.predict(symptoms, top_k=1, overlay=overlay)
+        else:
+            prediction_result = model.predict(symptoms, overlay=overlay)
+        predicted = time.perf_counter()
+        if response_format == 'compact':
+            body = _compact_predict_response_body(prediction_result)
+        else:
+            body = _predict_response_body(symptoms, prediction_result)
+        INFERENCE_SECONDS.observe(predicted - started, 'predict')
+        SERIALIZATION_SECONDS.observe(time.perf_counter() - predicted, '/api/predict')
+        if response_key is not None:
+            response_cache.put((model.version, response_key, response_format), body)
+        return Response(body, mimetype=app.json.mimetype)
         
     except Exception as e:
         return jsonify({
@@ -236,6 +657,172 @@ def predict_disease():
             "error": f"Prediction failed: {str(e)}"
         }), 500
 
+@app.route('/api/triage/<int:evidence_code>', methods=['GET'])
+def triage(evidence_code):
+    """
+    Low-latency top-k prediction for a compact evidence code (see
+    /api/symptoms for the encoding), answered from precomputed tables.
+    Optional `top_k` query parameter (default 3).
+    """
+    top_k = request.args.get('top_k', 3, type=int)
+    if top_k < 1:
+        return jsonify({"error": "'top_k' must be a positive integer"}), 400
+    try:
+        table = _get_lookup_table()
+    except ValueError as e:
+        return jsonify({"error": f"Triage lookup is unavailable: {e}"}), 503
+    started = time.perf_counter()
+    try:
+        result = table.predict(evidence_code, top_k)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    INFERENCE_SECONDS.observe(time.perf_counter() - started, 'triage')
+    result["evidence_code"] = evidence_code
+    return jsonify(result)
+
+def _session_request_body():
+    """The JSON object of a session request ({} for an empty body), or None if the body is not one."""
+    if not request.get_data():
+        return {}
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+def _check_session_owner(owner):
+    """Return an error response unless the request is signed in as the session's owner, or None."""
+    if owner is None:
+        return None
+    username = _get_username_from_auth_header()
+    if not username:
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    if username != owner:
+        return jsonify({"success": False, "error": "Session belongs to another user"}), 403
+    return None
+
+def _validate_session_symptoms(symptoms, username):
+    """Return an error response for invalid evidence, or None."""
+    error = model.validate_symptoms(symptoms, _get_allowed_custom_symptoms(username))
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    return None
+
+def _load_prediction_session(session_id):
+    """
+    The owner and InferenceSession of a stored diagnosis session, or None.
+    
+    The cached InferenceSession is reused while it still scores the stored
+    evidence with the current model and the owner's current custom
+    symptoms; otherwise it is rebuilt from the stored evidence.
+    """
+    stored = store.prediction_session(session_id)
+    if stored is None:
+        inference_sessions.pop(session_id)
+        return None
+    username, evidence = stored
+    overlay = _get_user_overlay(username)
+    session = inference_sessions.get(session_id)
+    if (session is None or session.evidence != evidence or session.model.version != model.version
+            or session.overlay is not overlay):
+        session = model.new_session(evidence, overlay)
+        inference_sessions.put(session_id, session)
+    return username, session
+
+@app.route('/api/predict/session', methods=['POST'])
+def create_prediction_session():
+    """
+    Start an interactive diagnosis session.
+    
+    Expected JSON format (symptoms optional):
+    {
+        "symptoms": {"Fever": "Severe"}
+    }
+    
+    Returns the /api/predict response for the initial evidence plus a
+    `session_id` to send deltas to. Sessions started while signed in can
+    only be updated or ended by the same user.
+    """
+    data = _session_request_body()
+    if data is None:
+        return jsonify({"success": False, "error": "Request body must be a JSON object"}), 400
+    symptoms = data.get('symptoms', {})
+    username = _get_username_from_auth_header()
+    error_response = _validate_session_symptoms(symptoms, username)
+    if error_response:
+        return error_response
+    
+    session_id = str(uuid.uuid4())
+    session = model.new_session(symptoms, _get_user_overlay(username))
+    store.save_prediction_session(session_id, username, session.evidence)
+    inference_sessions.put(session_id, session)
+    body = _predict_response_body(dict(session.evidence), session.prediction(), session_id)
+    return Response(body, status=201, mimetype=app.json.mimetype)
+
+@app.route('/api/predict/session/<session_id>', methods=['PATCH'])
+def update_prediction_session(session_id):
+    """
+    Apply evidence deltas to a diagnosis session.
+    
+    Expected JSON format (both fields optional):
+    {
+        "set": {"Cough": "Mild"},    # add or change severities
+        "retract": ["Fever"]         # remove reported symptoms
+    }
+    
+    Deltas are validated against the session's evidence and applied under
+    prediction_session_lock, so concurrent updates cannot interleave.
+    """
+    data = _session_request_body()
+    if data is None:
+        return jsonify({"success": False, "error": "Request body must be a JSON object"}), 400
+    with prediction_session_lock:
+        return _update_prediction_session(session_id, data)
+
+def _update_prediction_session(session_id, data):
+    """Validate and apply the deltas of a PATCH body; the caller holds prediction_session_lock."""
+    loaded = _load_prediction_session(session_id)
+    if loaded is None:
+        return jsonify({"success": False, "error": "Session not found"}), 404
+    username, session = loaded
+    error_response = _check_session_owner(username)
+    if error_response:
+        return error_response
+    
+    updates = data.get('set', {})
+    retractions = data.get('retract', [])
+    error_response = _validate_session_symptoms(updates, username)
+    if error_response:
+        return error_response
+    if not isinstance(retractions, list) or not all(isinstance(symptom, str) for symptom in retractions):
+        return jsonify({"success": False, "error": "'retract' must be a list of symptom names"}), 400
+    # Retracting a symptom twice in one request retracts it once
+    retractions = list(dict.fromkeys(retractions))
+    for symptom in retractions:
+        if symptom not in session.evidence:
+            return jsonify({"success": False, "error": f"Symptom not reported: {symptom}"}), 400
+    
+    for symptom in retractions:
+        session.retract_evidence(symptom)
+    for symptom, severity in updates.items():
+        session.add_evidence(symptom, severity)
+    store.save_prediction_session(session_id, username, session.evidence)
+    
+    body = _predict_response_body(dict(session.evidence), session.prediction(), session_id)
+    return Response(body, mimetype=app.json.mimetype)
+
+@app.route('/api/predict/session/<session_id>', methods=['DELETE'])
+def delete_prediction_session(session_id):
+    """End a diagnosis session."""
+    with prediction_session_lock:
+        stored = store.prediction_session(session_id)
+        if stored is None:
+            return jsonify({"success": False, "error": "Session not found"}), 404
+        error_response = _check_session_owner(stored[0])
+        if error_response:
+            return error_response
+        inference_sessions.pop(session_id)
+        if not store.delete_prediction_session(session_id):
+            return jsonify({"success": False, "error": "Session not found"}), 404
+    return jsonify({"success": True})
+
 @app.route('/api/batch-predict', methods=['POST'])
 def batch_predict():
     """
@@ -252,7 +839,8 @@ def batch_predict():
                 "id": "case2", 
                 "symptoms": {"Headache": "Mild", "Fatigue": "Moderate"}
             }
-        ]
+        ],
+        "top_k": 3  # optional; adds "top_diseases" to each result
     }
     """
     try:
@@ -264,37 +852,23 @@ def batch_predict():
         if 'cases' not in data or not isinstance(data['cases'], list):
             return jsonify({"error": "Missing or invalid 'cases' field"}), 400
         
-        results = []
+        top_k = data.get('top_k', 1)
+        if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1:
+            return jsonify({"error": "'top_k' must be a positive integer"}), 400
         
-        for case in data['cases']:
-            if 'id' not in case or 'symptoms' not in case:
-                results.append({
-                    "id": case.get('id', 'unknown'),
-                    "error": "Missing 'id' or 'symptoms' field"
-                })
-                continue
-            
-            try:
-                prediction = model.predict(case['symptoms'])
-                results.append({
-                    "id": case['id'],
-                    "success": True,
-                    "most_probable_disease": prediction["most_probable_disease"],
-                    "most_probable_probability": prediction["most_probable_probability"],
-                    "symptoms": case['symptoms']
-                })
-            except Exception as e:
-                results.append({
-                    "id": case['id'],
-                    "success": False,
-                    "error": str(e)
-                })
+        username = _get_username_from_auth_header()
+        BATCH_CASES.observe(len(data['cases']))
+        results = _batch_results(data['cases'], top_k, 'top_k' in data, _get_allowed_custom_symptoms(),
+                                 _get_user_overlay(username))
         
-        return jsonify({
+        started = time.perf_counter()
+        response = jsonify({
             "success": True,
             "results": results,
             "total_cases": len(results)
         })
+        SERIALIZATION_SECONDS.observe(time.perf_counter() - started, '/api/batch-predict')
+        return response
         
     except Exception as e:
         return jsonify({
@@ -302,15 +876,71 @@ def batch_predict():
             "error": f"Batch prediction failed: {str(e)}"
         }), 500
 
+@app.route('/api/batch-predict/stream', methods=['POST'])
+def batch_predict_stream():
+    """
+    Streaming variant of /api/batch-predict for very large case files.
+    
+    The request body is newline-delimited JSON, one case per line:
+        {"id": "case1", "symptoms": {"Fever": "Severe", "Cough": "Moderate"}}
+        {"id": "case2", "symptoms": {"Headache": "Mild"}}
+    
+    Cases are read incrementally and scored in chunks of `chunk_size` (query
+    parameter, default 500). One NDJSON result line is written per case, in
+    input order, using the same result objects as /api/batch-predict. An
+    optional `top_k` query parameter adds "top_diseases" to each result.
+    """
+    top_k = request.args.get('top_k', type=int)
+    chunk_size = request.args.get('chunk_size', STREAM_CHUNK_SIZE, type=int)
+    if top_k is not None and top_k < 1:
+        return jsonify({"error": "'top_k' must be a positive integer"}), 400
+    if chunk_size < 1 or chunk_size > MAX_STREAM_CHUNK_SIZE:
+        return jsonify({"error": f"'chunk_size' must be between 1 and {MAX_STREAM_CHUNK_SIZE}"}), 400
+    
+    allowed_symptoms = _get_allowed_custom_symptoms()
+    overlay = _get_user_overlay(_get_username_from_auth_header())
+    stream = request.stream
+    
+    def flush(chunk):
+        results = _batch_results(chunk, top_k or 1, top_k is not None, allowed_symptoms, overlay)
+        started = time.perf_counter()
+        lines = "".join(json.dumps(result) + "\n" for result in results)
+        SERIALIZATION_SECONDS.observe(time.perf_counter() - started, '/api/batch-predict/stream')
+        return lines
+    
+    def generate():
+        chunk = []
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                case = json.loads(line)
+            except ValueError:
+                # Keep output aligned with input: emit pending results first
+                if chunk:
+                    yield flush(chunk)
+                    chunk = []
+                yield json.dumps({"id": "unknown", "line": line_number, "error": "Invalid JSON"}) + "\n"
+                continue
+            chunk.append(case)
+            if len(chunk) >= chunk_size:
+                yield flush(chunk)
+                chunk = []
+        if chunk:
+            yield flush(chunk)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/login', methods=['POST'])
 def login():
     data = request.get_json()
     username = data.get('username')
     password = data.get('password')
-    user = users.get(username)
+    user = store.get_user(username)
     if user and user['password'] == password:
         token = str(uuid.uuid4())
-        sessions[token] = username
+        store.create_session(token, username)
         return jsonify({"success": True, "token": token, "name": user["name"]})
     return jsonify({"success": False, "error": "Invalid credentials"}), 401
 
@@ -322,17 +952,44 @@ def register():
     name = data.get('name')
     if not username or not password or not name:
         return jsonify({"success": False, "error": "Missing fields"}), 400
-    if username in users:
+    if not store.add_user(username, password, name):
         return jsonify({"success": False, "error": "Username already exists"}), 409
-    users[username] = {"password": password, "name": name}
     return jsonify({"success": True})
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
+    """
+    Page through the user's history, newest first.
+    
+    Query parameters (all optional):
+        limit: entries per page (default 50, at most 500)
+        cursor: `next_cursor` of the previous page
+        fields: comma-separated entry fields to return, e.g. "date,most_probable_disease"
+    """
     username = _get_username_from_auth_header()
     if not username:
         return jsonify({"success": False, "error": "Unauthorized"}), 401
-    return jsonify({"success": True, "history": user_histories.get(username, [])})
+    
+    limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+    if limit < 1 or limit > MAX_HISTORY_PAGE_SIZE:
+        return jsonify({"success": False, "error": f"'limit' must be between 1 and {MAX_HISTORY_PAGE_SIZE}"}), 400
+    before = None
+    if 'cursor' in request.args:
+        before = _decode_history_cursor(request.args['cursor'])
+        if before is None:
+            return jsonify({"success": False, "error": "Invalid cursor"}), 400
+    fields = [field for field in request.args.get('fields', '').split(',') if field]
+    
+    page, next_before = store.history_page(username, limit, before)
+    entries = [entry for _, entry in page]
+    if fields:
+        entries = [{field: entry[field] for field in fields if field in entry} if isinstance(entry, dict) else entry
+                   for entry in entries]
+    return jsonify({
+        "success": True,
+        "history": entries,
+        "next_cursor": _encode_history_cursor(next_before) if next_before is not None else None
+    })
 
 @app.route('/api/history', methods=['POST'])
 def add_history():
@@ -343,7 +1000,9 @@ def add_history():
     entry = data.get('entry')
     if not entry:
         return jsonify({"success": False, "error": "Missing entry"}), 400
-    user_histories.setdefault(username, []).append(entry)
+    if len(json.dumps(entry)) > MAX_HISTORY_ENTRY_BYTES:
+        return jsonify({"success": False, "error": f"Entry exceeds {MAX_HISTORY_ENTRY_BYTES} bytes"}), 413
+    store.add_history(username, entry, HISTORY_RETENTION)
     return jsonify({"success": True})
 
 @app.route('/api/validate-symptom', methods=['POST'])
@@ -359,9 +1018,12 @@ def get_custom_symptoms():
     username = _get_username_from_auth_header()
     if not username:
         return jsonify({"success": False, "error": "Unauthorized"}), 401
+    overlay = _get_user_overlay(username)
     return jsonify({
         "success": True,
-        "custom_symptoms": user_custom_symptoms.get(username, [])
+        "custom_symptoms": store.custom_symptoms(username),
+        # Built-in symptom each custom symptom's likelihoods are derived from
+        "likelihood_sources": overlay.sources if overlay else {}
     })
 
 
@@ -378,12 +1040,9 @@ def add_custom_symptom():
     if not is_valid:
         return jsonify({"success": False, "error": message, "suggestion": normalized}), 400
 
-    current = user_custom_symptoms.setdefault(username, [])
-    if normalized in current:
+    if not store.add_custom_symptom(username, normalized):
         return jsonify({"success": False, "error": "Symptom already added"}), 409
-
-    current.append(normalized)
-    return jsonify({"success": True, "custom_symptoms": current})
+    return jsonify({"success": True, "custom_symptoms": store.custom_symptoms(username)})
 
 
 @app.route('/api/custom-symptoms', methods=['DELETE'])
@@ -395,10 +1054,8 @@ def remove_custom_symptom():
     data = request.get_json() or {}
     text = _normalize_symptom(data.get('text', ''))
 
-    current = user_custom_symptoms.setdefault(username, [])
-    if text in current:
-        current.remove(text)
-        return jsonify({"success": True, "custom_symptoms": current})
+    if store.remove_custom_symptom(username, text):
+        return jsonify({"success": True, "custom_symptoms": store.custom_symptoms(username)})
     return jsonify({"success": False, "error": "Symptom not found"}), 404
 
 @app.errorhandler(404)
@@ -419,10 +1076,16 @@ if __name__ == '__main__':
     print(f"Supported symptoms: {len(model.symptoms)}")
     print("API endpoints:")
     print("  GET  /health - Health check")
+    print("  GET  /metrics - Prometheus metrics")
     print("  GET  /api/diseases - List all diseases")
     print("  GET  /api/symptoms - List all symptoms")
     print("  GET  /api/disease-info/<name> - Get disease details")
     print("  POST /api/predict - Predict disease from symptoms")
+    print("  GET  /api/triage/<code> - Top diseases for a compact evidence code")
     print("  POST /api/batch-predict - Batch predictions")
+    print("  POST /api/batch-predict/stream - Streaming NDJSON batch predictions")
+    print("  POST /api/predict/session - Start an incremental diagnosis session")
+    print("  PATCH /api/predict/session/<id> - Apply symptom deltas to a session")
     
+    isolate_workers_from_main()
     app.run(debug=True, host='0.0.0.0', port=5000)
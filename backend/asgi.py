@@ -0,0 +1,237 @@
+"""
+ASGI entry point for the Disease Prediction API.
+Serves the Flask app from app.py (same routes and JSON contracts) on an
+event loop, so connections are multiplexed by the server instead of each
+holding a worker thread.
+
+Requests run on a thread pool; the batch endpoints run on a separate pool so
+large CPU-bound jobs never occupy the threads serving cheap requests. Request
+bodies are read from the connection on demand and responses are streamed back
+chunk by chunk, so the NDJSON streaming endpoint keeps streaming.
+
+Usage:
+    python asgi.py                                          # uvicorn launcher
+    uvicorn asgi:application --port 5000 --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 asgi:application
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app as flask_app
+
+logger = logging.getLogger(__name__)
+
+# Threads serving ordinary requests, and threads reserved for batch inference
+REQUEST_THREADS = int(os.environ.get('ASGI_REQUEST_THREADS', 32))
+BATCH_THREADS = int(os.environ.get('ASGI_BATCH_THREADS', 4))
+BATCH_PATHS = frozenset({'/api/batch-predict', '/api/batch-predict/stream'})
+
+# Response chunks buffered ahead of a slow client before the app blocks
+RESPONSE_BUFFER_CHUNKS = 16
+
+# Launcher settings for `python asgi.py`
+UVICORN_CONFIG = {
+    "host": os.environ.get('HOST', '0.0.0.0'),
+    "port": int(os.environ.get('PORT', 5000)),
+    "workers": int(os.environ.get('WEB_CONCURRENCY', 1)),
+    "backlog": 2048,
+    "timeout_keep_alive": 5,
+    "proxy_headers": True
+}
+
+_request_executor = ThreadPoolExecutor(REQUEST_THREADS, thread_name_prefix='asgi-request')
+_batch_executor = ThreadPoolExecutor(BATCH_THREADS, thread_name_prefix='asgi-batch')
+
+
+class _RequestBody:
+    def __init__(self, receive, loop: asyncio.AbstractEventLoop):
+        """`wsgi.input` for a worker thread, pulling body chunks from the event loop as they are read."""
+        self._receive = receive
+        self._loop = loop
+        self._buffer = bytearray()
+        self._more = True
+
+    def _fill(self):
+        message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+        if message['type'] == 'http.disconnect':
+            self._more = False
+            return
+        self._buffer += message.get('body', b'')
+        self._more = message.get('more_body', False)
+
+    def _take(self, size: int) -> bytes:
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+    def read(self, size: int = -1) -> bytes:
+        while self._more and (size is None or size < 0 or len(self._buffer) < size):
+            self._fill()
+        if size is None or size < 0:
+            size = len(self._buffer)
+        return self._take(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        while self._more and b'\n' not in self._buffer and (size is None or size < 0 or len(self._buffer) < size):
+            self._fill()
+        end = self._buffer.find(b'\n') + 1 or len(self._buffer)
+        if size is not None and size >= 0:
+            end = min(end, size)
+        return self._take(end)
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+
+class _ResponseChannel:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        """Hands ASGI messages from a worker thread to the event loop, with backpressure."""
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._slots = threading.Semaphore(RESPONSE_BUFFER_CHUNKS)
+        self.closed = False
+
+    def put(self, message):
+        """Called from the worker thread; blocks while the client is behind."""
+        while not self._slots.acquire(timeout=1.0):
+            if self.closed:
+                raise ConnectionAbortedError("Client disconnected")
+        if self.closed:
+            raise ConnectionAbortedError("Client disconnected")
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, message)
+
+    async def get(self):
+        message = await self._queue.get()
+        self._slots.release()
+        return message
+
+    def close(self):
+        self.closed = True
+
+
+def _wsgi_environ(scope, body: _RequestBody):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(environ, channel: _ResponseChannel):
+    """Run the Flask app on a worker thread, forwarding its response as ASGI messages."""
+    started = []
+    headers_sent = False
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [{
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        }]
+
+    try:
+        try:
+            response = flask_app(environ, start_response)
+            try:
+                channel.put(started[0])
+                headers_sent = True
+                for chunk in response:
+                    if chunk:
+                        channel.put({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+        except ConnectionAbortedError:
+            raise
+        except Exception:
+            logger.exception("Unhandled error serving %s", environ['PATH_INFO'])
+            if not headers_sent:
+                channel.put({'type': 'http.response.start', 'status': 500,
+                             'headers': [(b'content-type', b'application/json')]})
+                channel.put({'type': 'http.response.body', 'body': b'{"error":"Internal server error"}',
+                             'more_body': True})
+        channel.put({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    except ConnectionAbortedError:
+        pass  # the client went away; nothing left to send
+
+
+async def _serve_http(scope, receive, send):
+    loop = asyncio.get_running_loop()
+    channel = _ResponseChannel(loop)
+    executor = _batch_executor if scope['path'] in BATCH_PATHS else _request_executor
+    worker = loop.run_in_executor(executor, _run_wsgi, _wsgi_environ(scope, _RequestBody(receive, loop)), channel)
+    try:
+        while True:
+            message = await channel.get()
+            await send(message)
+            if message['type'] == 'http.response.body' and not message['more_body']:
+                break
+    finally:
+        channel.close()
+    await worker
+
+
+async def _serve_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            _request_executor.shutdown(wait=False)
+            _batch_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI application callable."""
+    if scope['type'] == 'http':
+        await _serve_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await _serve_lifespan(receive, send)
+    else:
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    from parallel_batch import isolate_workers_from_main
+
+    isolate_workers_from_main()
+    uvicorn.run('asgi:application', **UVICORN_CONFIG)
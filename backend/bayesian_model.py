@@ -3,13 +3,154 @@ Bayesian Disease Prediction Model
 Implements a Bayesian network for disease prediction based on symptoms.
 """
 
+import itertools
 import json
-from typing import Dict, List, Tuple, Any
+import re
+import threading
+from difflib import SequenceMatcher
+from typing import Dict, List, Tuple, Any, Optional, Union
 from collections import defaultdict
 
+from disease_catalogue import DISEASE_CATALOGUE
+from prediction_cache import LRUCache
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; fall back to the pure-Python backend
+    np = None
+
+BACKENDS = ("numpy", "python")
+INFERENCE_MODES = ("linear", "log")
+DEFAULT_SMOOTHING = 1e-3
+# Inference sessions recompute their log-posterior from scratch after this many
+# incremental updates, bounding floating-point drift from repeated add/subtract
+SESSION_RESYNC_INTERVAL = 1000
+# Weight of the most similar built-in symptom when deriving likelihoods for a
+# custom symptom; the rest comes from that symptom's background distribution
+CUSTOM_SYMPTOM_WEIGHT = 0.5
+
+_WORDS = re.compile(r"[a-z]{3,}")
+# Validator terms that say where a symptom is without naming a body part or
+# system, so they do not make two symptoms similar
+_POSITION_TERMS = frozenset({"upper", "lower"})
+
+# Model versions are unique across all models in the process, so caches keyed
+# by version never confuse a replacement model with the one it replaced
+_versions = itertools.count(1)
+
+
+def compile_factor_rows(prior, cpt_array, pad: float = 1.0):
+    """
+    Lay out priors and a (diseases x symptoms x severity_levels) CPT as a
+    row-major factor table for gathers: row 0 is the prior, row
+    1 + s * n_levels + l is P(symptom s at severity l | disease) for every
+    disease, and the last row is a neutral pad used to square up batched
+    index matrices.
+    """
+    n_diseases, n_symptoms, n_levels = cpt_array.shape
+    likelihood_rows = cpt_array.transpose(1, 2, 0).reshape(n_symptoms * n_levels, n_diseases)
+    return np.ascontiguousarray(np.vstack((prior, likelihood_rows, np.full(n_diseases, pad))))
+
+
+def compile_log_factor_rows(prior, cpt_array, present, smoothing: float):
+    """
+    Log-space counterpart of `compile_factor_rows` with Laplace smoothing:
+    log((p + a) / (1 + a * n_levels)). Cells not `present` stay log(1).
+    """
+    n_levels = cpt_array.shape[2]
+    with np.errstate(divide="ignore"):
+        smoothed = np.log((cpt_array + smoothing) / (1.0 + smoothing * n_levels))
+        log_prior = np.log(prior)
+    log_cpt_array = np.where(present, smoothed, 0.0)
+    return compile_factor_rows(log_prior, log_cpt_array, pad=0.0)
+
+
+def top_k_indices(scores, k: int):
+    """
+    Indices of the k highest scores in each row of a (rows x diseases) array,
+    ordered like a stable descending sort (ties go to the lower index), using
+    partial selection instead of sorting whole rows.
+    """
+    n = scores.shape[1]
+    if k >= n:
+        return np.argsort(-scores, axis=1, kind="stable")
+    
+    # k-th largest value per row, then everything above it plus the first ties
+    kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1:k]
+    above = scores > kth
+    tied = scores == kth
+    needed = k - above.sum(axis=1, keepdims=True)
+    selected = above | (tied & (np.cumsum(tied, axis=1) <= needed))
+    
+    candidates = np.nonzero(selected)[1].reshape(len(scores), k)
+    ranking = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, ranking, axis=1)
+
+
 class BayesianDiseaseModel:
-    def __init__(self):
-        """Initialize the Bayesian model with conditional probability tables."""
+    def __init__(self, backend: str = "numpy", inference: str = "linear", smoothing: Optional[float] = None,
+                 cache_size: int = 4096, artifact: Optional[Union[str, "ModelArtifact"]] = None,
+                 sparse: bool = False):
+        """
+        Initialize the Bayesian model with conditional probability tables.
+        
+        Args:
+            backend: "numpy" to run inference on compiled CPT arrays, or "python"
+                to use the reference dict-based implementation. Falls back to
+                "python" when numpy is not installed.
+            inference: "linear" multiplies raw CPT probabilities (the original
+                behaviour); "log" sums a precomputed log-CPT table and normalizes
+                with log-sum-exp. Log mode requires the numpy backend.
+            smoothing: Laplace pseudo-probability added to every CPT cell of the
+                log-CPT table, so zero entries no longer veto a disease. Defaults
+                to DEFAULT_SMOOTHING, or to the value an artifact was built with.
+            cache_size: Maximum number of memoized predictions; 0 disables the cache.
+            artifact: Path to a binary model artifact (see model_artifact.py) to
+                memory-map instead of the built-in tables, or an already loaded
+                ModelArtifact. Requires numpy.
+            sparse: Score predict() calls through sparse log-likelihood ratio
+                tables (see sparse_model.py), touching only the diseases linked
+                to a reported symptom. Requires log inference and positive
+                smoothing.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        if inference not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode: {inference}")
+        if smoothing is not None and smoothing < 0:
+            raise ValueError("Smoothing must be non-negative")
+        
+        if artifact is not None:
+            self._init_from_artifact(artifact, backend, smoothing)
+        else:
+            self._init_builtin()
+            self.smoothing = DEFAULT_SMOOTHING if smoothing is None else smoothing
+            self._artifact = None
+        
+        # Lookup sets for request validation
+        self._symptom_set = frozenset(self.symptoms)
+        self._severity_set = frozenset(self.severity_levels)
+        self.symptom_index = {symptom: i for i, symptom in enumerate(self.symptoms)}
+        self.severity_index = {level: i for i, level in enumerate(self.severity_levels)}
+        
+        # Memoized predictions keyed by evidence_key(); a new version invalidates them
+        self.version = next(_versions)
+        self.prediction_cache = LRUCache(cache_size)
+        
+        # Compile the CPT into dense arrays for the vectorized backend
+        self.backend = backend if np is not None else "python"
+        self.inference = inference
+        if self.inference == "log" and self.backend != "numpy":
+            raise ValueError("Log-space inference requires the numpy backend")
+        if sparse and self.inference != "log":
+            raise ValueError("Sparse inference requires log-space inference")
+        self.sparse = sparse
+        self._sparse = None
+        if self.backend == "numpy":
+            self._compile()
+    
+    def _init_builtin(self):
+        """Load the built-in disease/symptom catalogue and CPTs."""
         self.diseases = [
             "Common Cold", "Influenza", "Malaria", "Dengue", "Typhoid",
             "Pneumonia", "COVID-19", "Asthma", "Tuberculosis", "Diabetes",
@@ -30,6 +171,228 @@ class BayesianDiseaseModel:
         # Load conditional probability tables
         self.cpt = self._load_cpt()
     
+    def _init_from_artifact(self, artifact: Union[str, "ModelArtifact"], backend: str, smoothing: Optional[float]):
+        """Adopt the vocabularies and memory-mapped tables of a model artifact."""
+        from model_artifact import load_artifact
+        
+        if np is None or backend != "numpy":
+            raise ValueError("Model artifacts require the numpy backend")
+        if isinstance(artifact, str):
+            artifact = load_artifact(artifact)
+        self.diseases = list(artifact.diseases)
+        self.symptoms = list(artifact.symptoms)
+        self.severity_levels = list(artifact.severity_levels)
+        self.prior_probabilities = dict(zip(self.diseases, artifact.factor_rows[0].tolist()))
+        self.smoothing = artifact.smoothing if smoothing is None else smoothing
+        # CPT dicts are only materialized on demand (see the `cpt` property)
+        self._cpt = None
+        self._artifact = artifact
+    
+    @property
+    def cpt(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """CPT dicts; built from the compiled arrays for artifact-backed models."""
+        if self._cpt is None:
+            self._cpt = {
+                disease: {
+                    symptom: dict(zip(self.severity_levels, self.cpt_array[d, s].tolist()))
+                    for s, symptom in enumerate(self.symptoms)
+                }
+                for d, disease in enumerate(self.diseases)
+            }
+        return self._cpt
+    
+    @cpt.setter
+    def cpt(self, value: Dict[str, Dict[str, Dict[str, float]]]):
+        self._cpt = value
+    
+    def _compile(self):
+        """
+        Compile the CPT dicts into a dense (diseases x symptoms x severity_levels)
+        array, with integer index maps for symptom and severity names.
+        
+        Entries missing from the CPT are stored as 1.0 so that, like the dict
+        implementation, they leave the posterior unchanged. A smoothed log-CPT
+        table is precomputed alongside for log-space inference.
+        
+        Artifact-backed models use the artifact's tables in place, so worker
+        processes share one physical copy of them.
+        """
+        n_symptoms, n_levels = len(self.symptoms), len(self.severity_levels)
+        self._row_ids = {
+            (symptom, level): 1 + s * n_levels + l
+            for symptom, s in self.symptom_index.items()
+            for level, l in self.severity_index.items()
+        }
+        
+        if self._artifact is not None:
+            log_factor_rows = None
+            if self.smoothing == self._artifact.smoothing:
+                log_factor_rows = self._artifact.log_factor_rows
+            self._install_tables(self._artifact.factor_rows, log_factor_rows)
+            return
+        
+        cpt_array = np.ones((len(self.diseases), len(self.symptoms), len(self.severity_levels)))
+        present = np.zeros(cpt_array.shape, dtype=bool)
+        for d, disease in enumerate(self.diseases):
+            for symptom, distribution in self.cpt.get(disease, {}).items():
+                s = self.symptom_index.get(symptom)
+                if s is None:
+                    continue
+                for level, probability in distribution.items():
+                    l = self.severity_index.get(level)
+                    if l is not None:
+                        cpt_array[d, s, l] = probability
+                        present[d, s, l] = True
+        
+        prior_array = np.array([self.prior_probabilities[disease] for disease in self.diseases])
+        self._install_tables(
+            compile_factor_rows(prior_array, cpt_array),
+            compile_log_factor_rows(prior_array, cpt_array, present, self.smoothing)
+        )
+    
+    def _install_tables(self, factor_rows, log_factor_rows=None):
+        """
+        Use `factor_rows` (see `compile_factor_rows`) as the model's tables and
+        expose `prior_array`, `cpt_array` and `log_cpt_array` as views into them.
+        Without `log_factor_rows`, the log table is derived treating every CPT
+        cell as present.
+        """
+        shape = (len(self.symptoms), len(self.severity_levels), len(self.diseases))
+        self._factor_rows = factor_rows
+        self._pad_row_id = len(factor_rows) - 1
+        self.prior_array = factor_rows[0]
+        self.cpt_array = factor_rows[1:-1].reshape(shape).transpose(2, 0, 1)
+        
+        if log_factor_rows is None:
+            present = np.ones(self.cpt_array.shape, dtype=bool)
+            log_factor_rows = compile_log_factor_rows(self.prior_array, self.cpt_array, present, self.smoothing)
+        self._log_factor_rows = log_factor_rows
+        self.log_cpt_array = log_factor_rows[1:-1].reshape(shape).transpose(2, 0, 1)
+        self._session_rows = None
+        self._sparse = None
+        if self.sparse:
+            from sparse_model import SparseLikelihoods
+            self._sparse = SparseLikelihoods(log_factor_rows[0], self.log_cpt_array)
+    
+    def _session_tables(self):
+        """
+        Log-factor rows for incremental inference, split into a finite part and
+        a zero-likelihood indicator so evidence can be retracted by subtraction.
+        """
+        if self._session_rows is None:
+            if self.inference == "log":
+                rows = self._log_factor_rows
+            else:
+                with np.errstate(divide="ignore"):
+                    rows = np.log(self._factor_rows)
+            impossible = ~np.isfinite(rows)
+            self._session_rows = (np.where(impossible, 0.0, rows), impossible.astype(np.int32))
+        return self._session_rows
+    
+    def new_session(self, symptoms: Optional[Dict[str, str]] = None,
+                    overlay: Optional["SymptomOverlay"] = None) -> "InferenceSession":
+        """Start an incremental inference session, optionally with initial evidence."""
+        return InferenceSession(self, symptoms, overlay)
+    
+    def similar_symptom(self, name: str) -> Optional[str]:
+        """
+        Built-in symptom sharing the most body parts or body systems with
+        `name` (the terms of symptom_validator.ALLOWED_TERMS), ties
+        broken by string similarity; None if none is shared. Descriptors such
+        as "Pain" are not compared, so "Knee Pain" is not taken for "Chest Pain".
+        """
+        from symptom_validator import ALLOWED_TERMS
+        
+        terms = {term.lower() for term in ALLOWED_TERMS} - _POSITION_TERMS
+        words = set(_WORDS.findall(name.lower())) & terms
+        best, best_score = None, (0, 0.0)
+        if not words:
+            return best
+        for symptom in self.symptoms:
+            # A term may be the stem of a built-in's word ("Head" -> "Headache")
+            symptom_words = _WORDS.findall(symptom.lower())
+            shared = sum(any(word.startswith(term) for word in symptom_words) for term in words)
+            if not shared:
+                continue
+            score = (shared, SequenceMatcher(None, name.lower(), symptom.lower()).ratio())
+            if score > best_score:
+                best, best_score = symptom, score
+        return best
+    
+    def build_overlay(self, symptoms: List[str],
+                      likelihoods: Optional[Dict[str, Dict[str, Dict[str, float]]]] = None) -> "SymptomOverlay":
+        """
+        Give symptoms outside the catalogue (e.g. a user's custom symptoms)
+        likelihood rows, layered over this model's shared tables.
+        
+        P(severity | disease) for a custom symptom is taken from `likelihoods`
+        where given. Otherwise it is derived from the built-in symptom of the
+        same body part or system (see `similar_symptom`): CUSTOM_SYMPTOM_WEIGHT
+        of its CPT, the rest its mean distribution across diseases. A symptom
+        with no such built-in gets the mean distribution of the whole CPT,
+        which is the same for every disease and leaves the ranking unchanged.
+        
+        Args:
+            symptoms: Custom symptom names; catalogue symptoms are skipped
+            likelihoods: custom symptom -> disease -> severity distribution
+            
+        Returns:
+            A SymptomOverlay bound to the current model version
+        """
+        if self.backend != "numpy":
+            raise ValueError("Symptom overlays require the numpy backend")
+        likelihoods = likelihoods or {}
+        symptoms = [symptom for symptom in dict.fromkeys(symptoms) if symptom not in self._symptom_set]
+        disease_index = {disease: d for d, disease in enumerate(self.diseases)}
+        
+        cpt_array = np.empty((len(self.diseases), len(symptoms), len(self.severity_levels)))
+        sources = {}
+        for i, symptom in enumerate(symptoms):
+            source = sources[symptom] = self.similar_symptom(symptom)
+            if source is None:
+                cpt_array[:, i] = self.cpt_array.mean(axis=(0, 1))
+            else:
+                source_cpt = self.cpt_array[:, self.symptom_index[source]]
+                cpt_array[:, i] = (CUSTOM_SYMPTOM_WEIGHT * source_cpt
+                                   + (1.0 - CUSTOM_SYMPTOM_WEIGHT) * source_cpt.mean(axis=0))
+            for disease, distribution in likelihoods.get(symptom, {}).items():
+                d = disease_index.get(disease)
+                if d is None:
+                    raise ValueError(f"Unknown disease: {disease}")
+                cpt_array[d, i] = [distribution.get(level, 0.0) for level in self.severity_levels]
+        return SymptomOverlay(self, symptoms, cpt_array, sources, likelihoods)
+    
+    def refresh(self):
+        """
+        Recompile after `prior_probabilities` or `cpt` were modified in place,
+        and invalidate every cached prediction. Artifact-backed models switch
+        to private tables built from the (materialized) CPT dicts.
+        """
+        if self._artifact is not None:
+            self.cpt  # materialize before detaching from the artifact
+            self._artifact = None
+        if self.backend == "numpy":
+            self._compile()
+        self.version = next(_versions)
+        self.prediction_cache.clear()
+    
+    def set_priors(self, priors: Dict[str, float]):
+        """Replace prior probabilities for some or all diseases."""
+        unknown = set(priors) - set(self.diseases)
+        if unknown:
+            raise ValueError(f"Unknown disease: {sorted(unknown)[0]}")
+        self.prior_probabilities.update(priors)
+        self.refresh()
+    
+    def set_cpt(self, disease: str, symptom: str, distribution: Dict[str, float]):
+        """Replace the severity distribution P(symptom | disease)."""
+        if disease not in self.cpt:
+            raise ValueError(f"Unknown disease: {disease}")
+        if symptom not in self._symptom_set:
+            raise ValueError(f"Unknown symptom: {symptom}")
+        self.cpt[disease][symptom] = dict(distribution)
+        self.refresh()
+    
     def _load_cpt(self) -> Dict[str, Dict[str, Dict[str, float]]]:
         """Load the conditional probability tables."""
         return {
@@ -259,16 +622,106 @@ class BayesianDiseaseModel:
              }
          }
     
-    def predict(self, symptoms: Dict[str, str]) -> Dict[str, Any]:
+    def predict(self, symptoms: Dict[str, str], top_k: Optional[int] = None,
+                full_distribution: bool = True, overlay: Optional["SymptomOverlay"] = None) -> Dict[str, Any]:
         """
         Predict disease probabilities using Bayesian inference.
         
         Args:
             symptoms: Dictionary mapping symptom names to severity levels
+            top_k: Only rank the k most probable diseases in "all_diseases"
+                (partial selection instead of a full sort); None ranks all
+            full_distribution: Include the rounded "probability_distribution"
+                over every disease
+            overlay: Likelihood rows for custom symptoms (see build_overlay);
+                without one, custom symptoms are ignored
             
         Returns:
             Dictionary containing most probable disease and full probability distribution
         """
+        if top_k is not None:
+            top_k = max(1, min(top_k, len(self.diseases)))
+        if overlay is not None and overlay.covers(symptoms):
+            # Per-user evidence: scored directly, never shared through the cache
+            self._check_overlay(overlay)
+            posterior = self._posterior(self._encode(symptoms, overlay), overlay)
+            return self._format_prediction(posterior, top_k, full_distribution)
+        
+        key = (self.evidence_key(symptoms), top_k, full_distribution)
+        cached = self.prediction_cache.get(key)
+        if cached is not None:
+            return self._copy_prediction(cached)
+        
+        if self._sparse is not None:
+            result = self._predict_sparse(symptoms, top_k, full_distribution)
+        elif self.backend == "numpy":
+            result = self._predict_numpy(symptoms, top_k, full_distribution)
+        else:
+            result = self._predict_python(symptoms)
+            if top_k is not None:
+                result["all_diseases"] = result["all_diseases"][:top_k]
+            if not full_distribution:
+                del result["probability_distribution"]
+        self.prediction_cache.put(key, result)
+        return self._copy_prediction(result)
+    
+    @staticmethod
+    def _copy_prediction(result: Dict[str, Any]) -> Dict[str, Any]:
+        """A copy of a memoized result that callers may modify without corrupting the cache."""
+        copy = dict(result)
+        # The other values are strings, numbers and (name, probability) tuples
+        for key in ("probability_distribution", "all_diseases"):
+            if key in copy:
+                copy[key] = copy[key].copy()
+        return copy
+    
+    def evidence_key(self, symptoms: Dict[str, str], strict: bool = False):
+        """
+        Pack a symptom dict into a canonical integer.
+        
+        Each catalogue symptom is one base-(len(severity_levels) + 1) digit:
+        0 means "not reported", 1.. the severity level. Entries predict()
+        ignores (unknown symptoms or severities) do not change the key, and
+        neither does dict order.
+        
+        Args:
+            symptoms: Dictionary mapping symptom names to severity levels
+            strict: Return None instead if any entry is outside the catalogue
+            
+        Returns:
+            The packed key, or None in strict mode for non-catalogue input
+        """
+        base = len(self.severity_levels) + 1
+        key = 0
+        for symptom, severity in symptoms.items():
+            s = self.symptom_index.get(symptom)
+            l = self.severity_index.get(severity) if isinstance(severity, str) else None
+            if s is None or l is None:
+                if strict:
+                    return None
+                continue
+            key += (l + 1) * base ** s
+        return key
+    
+    def decode_evidence(self, key: int) -> Dict[str, str]:
+        """
+        Inverse of `evidence_key`: the symptom dict a packed key stands for.
+        
+        Raises:
+            ValueError: If `key` is not a valid key for this catalogue
+        """
+        base = len(self.severity_levels) + 1
+        if not isinstance(key, int) or isinstance(key, bool) or not 0 <= key < base ** len(self.symptoms):
+            raise ValueError(f"Evidence code must be an integer in [0, {base ** len(self.symptoms)})")
+        symptoms = {}
+        for symptom in self.symptoms:
+            key, digit = divmod(key, base)
+            if digit:
+                symptoms[symptom] = self.severity_levels[digit - 1]
+        return symptoms
+    
+    def _predict_python(self, symptoms: Dict[str, str]) -> Dict[str, Any]:
+        """Reference implementation of `predict` over the CPT dicts."""
         # Calculate posterior probabilities for each disease
         posterior_probs = {}
         
@@ -301,83 +754,408 @@ class BayesianDiseaseModel:
             "all_diseases": sorted_diseases
         }
     
+    def _check_overlay(self, overlay: "SymptomOverlay"):
+        if overlay.model_version != self.version:
+            raise ValueError("Symptom overlay was built for another model version")
+    
+    def _encode(self, symptoms: Dict[str, str], overlay: Optional["SymptomOverlay"] = None) -> List[int]:
+        """
+        Map a symptom dict to factor-table row ids (row 0 is the prior).
+        Overlay rows are numbered after the model's own rows.
+        """
+        row_of = self._row_ids
+        if overlay is None:
+            return [0] + [row_of[item] for item in symptoms.items() if item in row_of]
+        overlay_row_of = overlay.row_ids
+        row_ids = [0]
+        for item in symptoms.items():
+            row = row_of.get(item, overlay_row_of.get(item))
+            if row is not None:
+                row_ids.append(row)
+        return row_ids
+    
+    def _gather(self, row_ids: List[int], overlay: Optional["SymptomOverlay"] = None):
+        """
+        Factor rows (log-factor rows in log mode) for encoded evidence: one
+        gather from the shared tables plus one from the overlay, if any.
+        """
+        log = self.inference == "log"
+        table = self._log_factor_rows if log else self._factor_rows
+        if overlay is None:
+            return table.take(row_ids, axis=0)
+        base_rows = len(table)
+        overlay_ids = [row - base_rows for row in row_ids if row >= base_rows]
+        if not overlay_ids:
+            return table.take(row_ids, axis=0)
+        overlay_table = overlay.log_factor_rows if log else overlay.factor_rows
+        return np.concatenate((table.take([row for row in row_ids if row < base_rows], axis=0),
+                               overlay_table.take(overlay_ids, axis=0)))
+    
+    def _posterior(self, row_ids: List[int], overlay: Optional["SymptomOverlay"] = None):
+        """Normalized posterior vector (in disease order) for encoded evidence."""
+        if self.inference == "log":
+            # Sum log-factors, then normalize with log-sum-exp
+            log_posterior = self._gather(row_ids, overlay).sum(axis=0)
+            peak = log_posterior.max()
+            if not np.isfinite(peak):
+                # Evidence impossible under every disease (only with smoothing=0)
+                return self.prior_array.copy()
+            posterior = np.exp(log_posterior - peak)
+            return posterior / posterior.sum()
+        
+        # Gather prior + likelihood rows and multiply them down, in input order
+        posterior = np.multiply.reduce(self._gather(row_ids, overlay), axis=0)
+        
+        # Normalize probabilities to sum to 1
+        total_prob = sum(posterior.tolist())
+        if total_prob > 0:
+            posterior = posterior / total_prob
+        return posterior
+    
+    def _predict_numpy(self, symptoms: Dict[str, str], top_k: Optional[int] = None,
+                       full_distribution: bool = True) -> Dict[str, Any]:
+        """
+        Vectorized `predict`: gather the likelihood columns of the observed
+        symptoms from the compiled CPT and reduce them across all diseases at once.
+        
+        In linear mode factors are multiplied in the same order as the dict
+        implementation and normalized with a sequential sum, so the output is
+        identical to it.
+        """
+        return self._format_prediction(self._posterior(self._encode(symptoms)), top_k, full_distribution)
+    
+    def _predict_sparse(self, symptoms: Dict[str, str], top_k: Optional[int] = None,
+                        full_distribution: bool = True) -> Dict[str, Any]:
+        """
+        `predict` through the sparse likelihood tables. Without the full
+        distribution, a top-k ranking costs O(candidates + k) instead of
+        O(diseases); otherwise the sparse scores are expanded to a posterior
+        vector and formatted as usual.
+        """
+        row_ids = self._encode(symptoms)
+        if full_distribution or top_k is None:
+            return self._format_prediction(self._sparse.posterior(row_ids), top_k, full_distribution)
+        indices, probabilities = self._sparse.top_k(row_ids, top_k)
+        return {
+            "most_probable_disease": self.diseases[indices[0]],
+            "most_probable_probability": round(probabilities[0] * 100, 2),
+            "all_diseases": [(self.diseases[i], p) for i, p in zip(indices, probabilities)],
+        }
+    
+    def _format_prediction(self, posterior, top_k: Optional[int] = None,
+                           full_distribution: bool = True) -> Dict[str, Any]:
+        """Build the predict() result for a normalized posterior vector."""
+        # Stable descending order matches sorted(..., reverse=True) on ties
+        if full_distribution or top_k is None:
+            order = np.argsort(-posterior, kind="stable").tolist()
+        else:
+            order = top_k_indices(posterior[None, :], top_k)[0].tolist()
+        ranked = order if top_k is None else order[:top_k]
+        probabilities = posterior.tolist()
+        most_probable = order[0]
+        
+        result = {
+            "most_probable_disease": self.diseases[most_probable],
+            "most_probable_probability": round(probabilities[most_probable] * 100, 2),
+        }
+        if full_distribution:
+            percentages = (posterior * 100).tolist()
+            result["probability_distribution"] = {self.diseases[i]: round(percentages[i], 2) for i in order}
+        result["all_diseases"] = [(self.diseases[i], probabilities[i]) for i in ranked]
+        return result
+    
+    def validate_symptoms(self, symptoms: Any, allowed_symptoms=None) -> str:
+        """
+        Check a symptom dict against the catalogue.
+        
+        Args:
+            symptoms: Dictionary mapping symptom names to severity levels
+            allowed_symptoms: Extra symptom names accepted on top of the
+                built-in catalogue (e.g. a user's custom symptoms)
+            
+        Returns:
+            An error message, or an empty string if the symptoms are valid
+        """
+        if not isinstance(symptoms, dict):
+            return "Symptoms must be a dictionary"
+        for symptom, severity in symptoms.items():
+            if symptom not in self._symptom_set and not (allowed_symptoms and symptom in allowed_symptoms):
+                return f"Unknown symptom: {symptom}"
+            if not isinstance(severity, str) or severity not in self._severity_set:
+                return f"Invalid severity level: {severity}"
+        return ""
+    
+    def predict_batch(self, cases: List[Dict[str, str]], top_k: int = 1, allowed_symptoms=None,
+                      overlay: Optional["SymptomOverlay"] = None) -> List[Dict[str, Any]]:
+        """
+        Predict disease probabilities for many symptom sets at once.
+        
+        Valid cases are encoded into a single (cases x factors) index matrix and
+        scored together; each result carries only the top-k diseases.
+        
+        Args:
+            cases: List of dictionaries mapping symptom names to severity levels
+            top_k: Number of most probable diseases to return per case
+            allowed_symptoms: Extra symptom names accepted during validation
+            overlay: Likelihood rows for custom symptoms (see build_overlay)
+            
+        Returns:
+            One result per case, in input order. Valid cases get
+            "most_probable_disease", "most_probable_probability" and
+            "top_diseases"; invalid ones get an "error" message instead.
+        """
+        top_k = max(1, min(top_k, len(self.diseases)))
+        results: List[Dict[str, Any]] = [None] * len(cases)
+        encoded = []
+        for i, symptoms in enumerate(cases):
+            error = self.validate_symptoms(symptoms, allowed_symptoms)
+            if error:
+                results[i] = {"error": error}
+            else:
+                encoded.append((i, symptoms))
+        
+        if not encoded:
+            return results
+        
+        if self.backend != "numpy":
+            for i, symptoms in encoded:
+                prediction = self._predict_python(symptoms)
+                results[i] = self._top_k_result(
+                    [(disease, round(prob * 100, 2)) for disease, prob in prediction["all_diseases"][:top_k]]
+                )
+            return results
+        
+        if overlay is not None:
+            self._check_overlay(overlay)
+        posteriors = self._posterior_batch([self._encode(symptoms, overlay) for _, symptoms in encoded], overlay)
+        
+        order = top_k_indices(posteriors, top_k)
+        top_percentages = (np.take_along_axis(posteriors, order, axis=1) * 100).tolist()
+        for (i, _), disease_ids, percentages in zip(encoded, order.tolist(), top_percentages):
+            results[i] = self._top_k_result(
+                [(self.diseases[d], round(p, 2)) for d, p in zip(disease_ids, percentages)]
+            )
+        return results
+    
+    def _posterior_batch(self, encoded: List[List[int]], overlay: Optional["SymptomOverlay"] = None):
+        """Normalized (cases x diseases) posterior matrix for encoded evidence."""
+        factors = self._gather_batch(encoded, overlay)
+        
+        if self.inference == "log":
+            log_posteriors = factors.sum(axis=1)
+            peaks = log_posteriors.max(axis=1, keepdims=True)
+            impossible = ~np.isfinite(peaks[:, 0])
+            posteriors = np.exp(log_posteriors - np.where(impossible[:, None], 0.0, peaks))
+            posteriors[impossible] = self.prior_array
+            return posteriors / posteriors.sum(axis=1, keepdims=True)
+        
+        posteriors = np.multiply.reduce(factors, axis=1)
+        # A running sum adds each case's terms in disease order, like predict()'s
+        # sum(); reductions may sum pairwise and break exact ties differently
+        totals = np.cumsum(posteriors, axis=1)[:, -1]
+        nonzero = totals > 0
+        posteriors[nonzero] /= totals[nonzero, None]
+        return posteriors
+    
+    def _gather_batch(self, encoded: List[List[int]], overlay: Optional["SymptomOverlay"] = None):
+        """
+        (cases x factors x diseases) factor rows for encoded evidence. Cases are
+        squared up with the neutral pad row; overlay rows are gathered through a
+        second index matrix over the overlay's own table.
+        """
+        log = self.inference == "log"
+        table = self._log_factor_rows if log else self._factor_rows
+        base_rows = len(table)
+        if overlay is not None and not any(row >= base_rows for row_ids in encoded for row in row_ids):
+            overlay = None
+        if overlay is not None:
+            overlay_ids = [[row - base_rows for row in row_ids if row >= base_rows] for row_ids in encoded]
+            encoded = [[row for row in row_ids if row < base_rows] for row_ids in encoded]
+        
+        width = max(len(row_ids) for row_ids in encoded)
+        index_matrix = np.full((len(encoded), width), self._pad_row_id, dtype=np.intp)
+        for n, row_ids in enumerate(encoded):
+            index_matrix[n, :len(row_ids)] = row_ids
+        if overlay is None:
+            return table[index_matrix]
+        
+        overlay_table = overlay.log_factor_rows if log else overlay.factor_rows
+        width = max(len(row_ids) for row_ids in overlay_ids)
+        overlay_matrix = np.full((len(overlay_ids), width), overlay.pad_row_id, dtype=np.intp)
+        for n, row_ids in enumerate(overlay_ids):
+            overlay_matrix[n, :len(row_ids)] = row_ids
+        return np.concatenate((table[index_matrix], overlay_table[overlay_matrix]), axis=1)
+    
+    @staticmethod
+    def _top_k_result(top_diseases: List[Tuple[str, float]]) -> Dict[str, Any]:
+        return {
+            "most_probable_disease": top_diseases[0][0],
+            "most_probable_probability": top_diseases[0][1],
+            "top_diseases": [{"name": disease, "probability": prob} for disease, prob in top_diseases]
+        }
+    
     def get_disease_info(self, disease_name: str) -> Dict[str, Any]:
         """Get additional information about a disease."""
-        disease_descriptions = {
-            "Common Cold": {
-                "description": "A viral infection of the upper respiratory tract that is generally harmless.",
-                "common_causes": ["Rhinovirus", "Coronavirus", "Seasonal transmission"],
-                "severity": "low"
-            },
-            "Influenza": {
-                "description": "Influenza is a viral infection that attacks the respiratory system.",
-                "common_causes": ["Influenza A virus", "Influenza B virus", "Seasonal outbreak"],
-                "severity": "moderate"
-            },
-            "Malaria": {
-                "description": "A mosquito-borne infectious disease caused by Plasmodium parasites.",
-                "common_causes": ["Plasmodium falciparum", "Plasmodium vivax", "Mosquito bites"],
-                "severity": "high"
-            },
-            "Dengue": {
-                "description": "A mosquito-borne viral infection causing flu-like illness.",
-                "common_causes": ["Dengue virus", "Aedes mosquito", "Tropical regions"],
-                "severity": "moderate"
-            },
-            "Typhoid": {
-                "description": "A bacterial infection caused by Salmonella typhi.",
-                "common_causes": ["Salmonella typhi", "Contaminated food/water", "Poor sanitation"],
-                "severity": "moderate"
-            },
-            "Pneumonia": {
-                "description": "Infection that inflames air sacs in one or both lungs.",
-                "common_causes": ["Bacteria", "Viruses", "Fungi", "Weakened immune system"],
-                "severity": "moderate"
-            },
-            "COVID-19": {
-                "description": "Coronavirus disease caused by SARS-CoV-2 virus.",
-                "common_causes": ["SARS-CoV-2 virus", "Respiratory droplets", "Close contact"],
-                "severity": "moderate"
-            },
-            "Asthma": {
-                "description": "A chronic respiratory condition causing airway inflammation.",
-                "common_causes": ["Allergens", "Respiratory infections", "Environmental factors"],
-                "severity": "moderate"
-            },
-            "Tuberculosis": {
-                "description": "A bacterial infection that mainly affects the lungs.",
-                "common_causes": ["Mycobacterium tuberculosis", "Airborne transmission", "Weakened immune system"],
-                "severity": "high"
-            },
-                         "Diabetes": {
-                 "description": "A chronic condition affecting blood sugar regulation.",
-                 "common_causes": ["Insulin resistance", "Genetic factors", "Lifestyle factors"],
-                 "severity": "moderate"
-             },
-             "Gastroenteritis": {
-                 "description": "Inflammation of the stomach and intestines, commonly caused by viral or bacterial infection.",
-                 "common_causes": ["Norovirus", "Rotavirus", "Food poisoning", "Contaminated water"],
-                 "severity": "moderate"
-             },
-             "Migraine": {
-                 "description": "A neurological condition characterized by intense, recurring headaches often accompanied by other symptoms.",
-                 "common_causes": ["Genetic factors", "Hormonal changes", "Stress", "Certain foods", "Environmental triggers"],
-                 "severity": "moderate"
-             },
-             "Anemia": {
-                 "description": "A condition where the body lacks enough healthy red blood cells to carry adequate oxygen to tissues.",
-                 "common_causes": ["Iron deficiency", "Vitamin B12 deficiency", "Chronic disease", "Blood loss", "Genetic disorders"],
-                 "severity": "moderate"
-             },
-             "Allergic Rhinitis": {
-                 "description": "An allergic response causing inflammation of the nasal passages and upper respiratory tract.",
-                 "common_causes": ["Pollen", "Dust mites", "Pet dander", "Mold spores", "Seasonal allergens"],
-                 "severity": "low"
-             }
+        return DISEASE_CATALOGUE.info(disease_name)
+
+
+class SymptomOverlay:
+    def __init__(self, model: BayesianDiseaseModel, symptoms: List[str], cpt_array,
+                 sources: Dict[str, Optional[str]], likelihoods: Dict[str, Dict[str, Dict[str, float]]]):
+        """
+        Likelihood rows for symptoms outside a model's catalogue, built by
+        BayesianDiseaseModel.build_overlay().
+        
+        Only the overlay's own rows are stored; the model's tables are shared,
+        never copied. Overlay row ids continue after the model's factor rows,
+        so one encoded case can mix both, and the last overlay row is a
+        neutral pad like the model's.
+        
+        Args:
+            model: The (numpy-backend) model being overlaid
+            symptoms: Custom symptom names
+            cpt_array: (diseases x symptoms x severity_levels) likelihoods
+            sources: Built-in symptom each likelihood was derived from, or None
+            likelihoods: Explicit likelihoods the overlay was built with
+        """
+        n_diseases, n_symptoms, n_levels = cpt_array.shape
+        self.symptoms = list(symptoms)
+        self.sources = sources
+        self.likelihoods = likelihoods
+        self.model_version = model.version
+        base_rows = len(model._factor_rows)
+        self.row_ids = {
+            (symptom, level): base_rows + i * n_levels + l
+            for i, symptom in enumerate(self.symptoms)
+            for l, level in enumerate(model.severity_levels)
         }
+        self._symptom_set = frozenset(self.symptoms)
         
-        return disease_descriptions.get(disease_name, {
-            "description": "No additional information available.",
-            "common_causes": [],
-            "severity": "unknown"
-        })
+        prior = np.ones(n_diseases)
+        self.factor_rows = compile_factor_rows(prior, cpt_array)[1:]
+        self.log_factor_rows = compile_log_factor_rows(prior, cpt_array, np.ones(cpt_array.shape, dtype=bool),
+                                                       model.smoothing)[1:]
+        self.pad_row_id = len(self.factor_rows) - 1
+        self._session_rows = {}
+    
+    def session_tables(self, inference: str):
+        """Overlay counterpart of BayesianDiseaseModel._session_tables()."""
+        if inference not in self._session_rows:
+            if inference == "log":
+                rows = self.log_factor_rows
+            else:
+                with np.errstate(divide="ignore"):
+                    rows = np.log(self.factor_rows)
+            impossible = ~np.isfinite(rows)
+            self._session_rows[inference] = (np.where(impossible, 0.0, rows), impossible.astype(np.int32))
+        return self._session_rows[inference]
+    
+    def covers(self, symptoms: Dict[str, str]) -> bool:
+        """Whether any reported symptom has overlay rows."""
+        return any(symptom in self._symptom_set for symptom in symptoms)
+
+
+class InferenceSession:
+    def __init__(self, model: BayesianDiseaseModel, symptoms: Optional[Dict[str, str]] = None,
+                 overlay: Optional[SymptomOverlay] = None):
+        """
+        Incremental inference over evidence that changes one symptom at a time.
+        
+        The session keeps the unnormalized log-posterior of every disease, so
+        adding, changing or retracting a symptom is a single vector update
+        instead of a full recomputation. Results match predict() on the same
+        evidence up to floating-point rounding.
+        
+        Args:
+            model: The model to score against
+            symptoms: Initial evidence, as accepted by predict()
+            overlay: Likelihood rows for custom symptoms; rebuilt for the new
+                version when the model changes
+        """
+        self.model = model
+        self.overlay = overlay
+        self.evidence: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._rebuild()
+        for symptom, severity in (symptoms or {}).items():
+            self.add_evidence(symptom, severity)
+    
+    def _rebuild(self):
+        """Recompute the log-posterior from the current evidence."""
+        self.model_version = self.model.version
+        self._updates = 0
+        if self.model.backend != "numpy":
+            return
+        self._log_rows, self._impossible_rows = self.model._session_tables()
+        if self.overlay is not None:
+            if self.overlay.model_version != self.model_version:
+                self.overlay = self.model.build_overlay(self.overlay.symptoms, self.overlay.likelihoods)
+            self._overlay_log_rows, self._overlay_impossible_rows = self.overlay.session_tables(self.model.inference)
+        self.log_posterior = self._log_rows[0].copy()
+        self._impossible = self._impossible_rows[0].copy()
+        for symptom, severity in self.evidence.items():
+            self._apply(symptom, severity, 1)
+    
+    def _apply(self, symptom: str, severity: str, sign: int):
+        if self.model.backend != "numpy":
+            return
+        log_rows, impossible_rows = self._log_rows, self._impossible_rows
+        row = self.model._row_ids.get((symptom, severity))
+        if row is None and self.overlay is not None:
+            row = self.overlay.row_ids.get((symptom, severity))
+            if row is not None:
+                row -= len(log_rows)
+                log_rows, impossible_rows = self._overlay_log_rows, self._overlay_impossible_rows
+        if row is None:
+            # Not in the catalogue: ignored by inference, like in predict()
+            return
+        if sign > 0:
+            self.log_posterior += log_rows[row]
+            self._impossible += impossible_rows[row]
+        else:
+            self.log_posterior -= log_rows[row]
+            self._impossible -= impossible_rows[row]
+        self._updates += 1
+    
+    def _sync(self):
+        if self.model_version != self.model.version or self._updates >= SESSION_RESYNC_INTERVAL:
+            self._rebuild()
+    
+    def add_evidence(self, symptom: str, severity: str):
+        """Report `symptom` at `severity`, replacing any earlier severity."""
+        with self._lock:
+            self._sync()
+            previous = self.evidence.get(symptom)
+            if previous is not None:
+                self._apply(symptom, previous, -1)
+            self.evidence[symptom] = severity
+            self._apply(symptom, severity, 1)
+    
+    def retract_evidence(self, symptom: str):
+        """Forget a reported symptom. Raises KeyError if it was not reported."""
+        with self._lock:
+            self._sync()
+            severity = self.evidence.pop(symptom)
+            self._apply(symptom, severity, -1)
+    
+    def posterior(self):
+        """Normalized posterior vector in disease order (numpy backend)."""
+        with self._lock:
+            self._sync()
+            scores = np.where(self._impossible > 0, -np.inf, self.log_posterior)
+        peak = scores.max()
+        if not np.isfinite(peak):
+            # Same fallbacks as predict(): all-zero in linear mode, prior in log mode
+            if self.model.inference == "log":
+                return self.model.prior_array.copy()
+            return np.zeros(len(self.model.diseases))
+        posterior = np.exp(scores - peak)
+        return posterior / posterior.sum()
+    
+    def prediction(self, top_k: Optional[int] = None, full_distribution: bool = True) -> Dict[str, Any]:
+        """Current prediction, in the same format as BayesianDiseaseModel.predict()."""
+        if self.model.backend != "numpy":
+            with self._lock:
+                evidence = dict(self.evidence)
+            return self.model.predict(evidence, top_k, full_distribution)
+        return self.model._format_prediction(self.posterior(), top_k, full_distribution)
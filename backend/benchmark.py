@@ -0,0 +1,371 @@
+"""
+Benchmark Suite
+Offline micro-benchmarks for the model and the HTTP layer, parameterized by
+catalogue size.
+
+Catalogue size 14 is the built-in model; larger sizes are synthetic models
+(same symptoms and severity levels, randomly drawn CPTs) built in memory as
+model artifacts. For every size the suite times:
+
+    model.*   BayesianDiseaseModel.predict, predict_batch, get_disease_info
+              and the app's _validate_symptom_text
+    route.*   Flask routes, run in-process through the test client
+
+Workloads are drawn from fixed-seed distributions that resemble real traffic
+(a few symptoms per case, common symptoms reported more often, mostly mild or
+moderate). Each workload cycles through more distinct inputs than the
+prediction, response and validator caches hold, so the LRU caches always
+miss and the timings measure the uncached path.
+
+Results are written as JSON keyed by "<benchmark>[<size>]". Given a baseline
+file from an earlier run, medians are compared and the process exits with
+status 1 if any benchmark slowed down by more than the threshold.
+
+Usage:
+    python benchmark.py --output results.json
+    python benchmark.py --sizes 14,1000 --baseline results.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bayesian_model import BayesianDiseaseModel, compile_factor_rows, compile_log_factor_rows
+from disease_catalogue import DISEASE_DESCRIPTIONS
+from model_artifact import ModelArtifact
+from model_snapshots import ModelSnapshot, take_snapshot
+from symptom_validator import ALLOWED_TERMS, DESCRIPTORS
+
+DEFAULT_SIZES = (14, 1000, 10000)
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_REPEAT = 7
+# Target duration of one timed round; the call count per round is calibrated to it
+ROUND_SECONDS = 0.05
+# Distinct inputs per workload; larger than every cache on the request path
+WORKLOAD_SIZE = 5000
+# Benchmarks that score `batch_size` cases per call; per-item times divide by it
+BATCH_BENCHMARKS = frozenset({"model.predict_batch", "route.batch_predict"})
+
+# Reported symptoms per case (1..6) and severity mix of reported symptoms
+_CASE_LENGTH_WEIGHTS = (0.15, 0.25, 0.25, 0.18, 0.10, 0.07)
+_SEVERITY_WEIGHTS = {"None": 0.05, "Mild": 0.40, "Moderate": 0.35, "Severe": 0.20}
+
+
+def synthetic_model(n_diseases: int, seed: int = 0, cache_size: int = 4096) -> BayesianDiseaseModel:
+    """
+    A model with `n_diseases` synthetic diseases over the built-in symptoms.
+
+    Each disease has a handful of characteristic symptoms whose severity
+    distributions lean towards Moderate/Severe; all other symptoms lean
+    towards None. Priors are long-tailed.
+    """
+    builtin = BayesianDiseaseModel(cache_size=0)
+    symptoms, severity_levels = builtin.symptoms, builtin.severity_levels
+    if n_diseases == len(builtin.diseases):
+        return BayesianDiseaseModel(cache_size=cache_size)
+
+    rng = np.random.default_rng(seed)
+    n_symptoms, n_levels = len(symptoms), len(severity_levels)
+    background = np.array([8.0, 1.5, 0.8, 0.4])[:n_levels]
+    characteristic = np.array([0.5, 1.5, 2.5, 2.0])[:n_levels]
+    cpt_array = rng.gamma(np.broadcast_to(background, (n_diseases, n_symptoms, n_levels)))
+    n_characteristic = rng.integers(2, 6, size=n_diseases)
+    for d in range(n_diseases):
+        chosen = rng.choice(n_symptoms, size=n_characteristic[d], replace=False)
+        cpt_array[d, chosen] = rng.gamma(np.broadcast_to(characteristic, (len(chosen), n_levels)))
+    cpt_array /= cpt_array.sum(axis=2, keepdims=True)
+
+    prior = rng.pareto(1.5, size=n_diseases) + 1.0
+    prior /= prior.sum()
+    present = np.ones(cpt_array.shape, dtype=bool)
+    header = {
+        "diseases": [f"Synthetic Disease {d:05d}" for d in range(n_diseases)],
+        "symptoms": symptoms,
+        "severity_levels": severity_levels,
+        "smoothing": builtin.smoothing
+    }
+    artifact = ModelArtifact(header, {
+        "factor_rows": compile_factor_rows(prior, cpt_array),
+        "log_factor_rows": compile_log_factor_rows(prior, cpt_array, present, builtin.smoothing)
+    })
+    return BayesianDiseaseModel(cache_size=cache_size, artifact=artifact)
+
+
+def symptom_cases(model: BayesianDiseaseModel, count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """`count` distinct symptom dicts; earlier catalogue symptoms are reported more often."""
+    rng = random.Random(seed)
+    popularity = [1.0 / (rank + 1) ** 0.8 for rank in range(len(model.symptoms))]
+    levels = [level for level in _SEVERITY_WEIGHTS if level in model.severity_index]
+    level_weights = [_SEVERITY_WEIGHTS[level] for level in levels]
+
+    cases, seen = [], set()
+    for _ in range(count * 20):
+        if len(cases) == count:
+            break
+        length = rng.choices(range(1, len(_CASE_LENGTH_WEIGHTS) + 1), _CASE_LENGTH_WEIGHTS)[0]
+        chosen = set()
+        while len(chosen) < min(length, len(model.symptoms)):
+            chosen.add(rng.choices(model.symptoms, popularity)[0])
+        case = {symptom: rng.choices(levels, level_weights)[0] for symptom in chosen}
+        key = model.evidence_key(case)
+        if key not in seen:
+            seen.add(key)
+            cases.append(case)
+    return cases
+
+
+def _mangle(text: str, rng: random.Random) -> str:
+    """Case, spacing and single-character typos, as typed by users."""
+    choice = rng.random()
+    if choice < 0.3:
+        text = text.lower()
+    elif choice < 0.4:
+        text = text.upper()
+    if rng.random() < 0.3:
+        text = f"  {text.replace(' ', '  ')} "
+    if rng.random() < 0.35 and len(text) > 3:
+        i = rng.randrange(1, len(text) - 1)
+        edit = rng.random()
+        if edit < 0.4:
+            text = text[:i] + text[i + 1:]
+        elif edit < 0.7:
+            text = text[:i] + text[i] + text[i:]
+        else:
+            text = text[:i] + rng.choice("aeiourst") + text[i + 1:]
+    return text
+
+
+def symptom_texts(model: BayesianDiseaseModel, count: int, seed: int = 0) -> List[str]:
+    """`count` distinct custom-symptom inputs: mostly plausible, some duplicates of built-ins, some junk."""
+    rng = random.Random(seed)
+    terms, descriptors = sorted(ALLOWED_TERMS), sorted(DESCRIPTORS)
+    texts, seen = [], set()
+    for _ in range(count * 50):
+        if len(texts) == count:
+            break
+        kind = rng.random()
+        if kind < 0.6:
+            text = f"{rng.choice(terms)} {rng.choice(descriptors)}"
+        elif kind < 0.75:
+            text = rng.choice(model.symptoms)
+        elif kind < 0.9:
+            text = f"{rng.choice(terms)} {rng.choice(terms)} {rng.choice(descriptors)}"
+        else:
+            text = rng.choice(["Feeling off", "xx Pain", "Pain", "Knee 42 Pain", "Bad Stuff", "Odd Burning"])
+        text = _mangle(text, rng)
+        if text not in seen:
+            seen.add(text)
+            texts.append(text)
+    return texts
+
+
+def measure(call: Callable[[int], Any], repeat: int = DEFAULT_REPEAT, items: int = 1) -> Dict[str, Any]:
+    """
+    Time `call(i)` for i = 0, 1, 2, ... over `repeat` rounds, after one
+    discarded warm-up round. Times are per call, in microseconds.
+    """
+    counter = [0]
+
+    def timed_round(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            call(counter[0])
+            counter[0] += 1
+        return time.perf_counter() - start
+
+    number = 1
+    while True:
+        elapsed = timed_round(number)
+        if elapsed >= ROUND_SECONDS / 4 or number >= 1 << 20:
+            break
+        number *= 4
+    number = max(1, int(number * ROUND_SECONDS / max(elapsed, 1e-9)))
+
+    rounds = [timed_round(number) / number * 1e6 for _ in range(repeat)]
+    median = statistics.median(rounds)
+    return {
+        "median_us": round(median, 3),
+        "min_us": round(min(rounds), 3),
+        "max_us": round(max(rounds), 3),
+        "calls": number * repeat,
+        "items": items,
+        "per_item_us": round(median / items, 3)
+    }
+
+
+def model_benchmarks(model: BayesianDiseaseModel, cases: List[Dict[str, str]], texts: List[str],
+                     batch_size: int) -> Dict[str, Callable[[int], Any]]:
+    import app as app_module
+
+    batches = [cases[start:start + batch_size] for start in range(0, len(cases) - batch_size + 1, batch_size)]
+    return {
+        "model.predict": lambda i: model.predict(cases[i % len(cases)]),
+        "model.predict_top5": lambda i: model.predict(cases[i % len(cases)], top_k=5, full_distribution=False),
+        "model.predict_batch": lambda i: model.predict_batch(batches[i % len(batches)], top_k=3),
+        "model.get_disease_info": lambda i: model.get_disease_info(model.diseases[i % len(model.diseases)]),
+        "model.validate_symptom_text": lambda i: app_module._validate_symptom_text(texts[i % len(texts)],
+                                                                                    model.symptoms)
+    }
+
+
+def _use_model(app_module, snapshot: ModelSnapshot):
+    """Serve the model of `snapshot`, dropping everything derived from the previous one."""
+    app_module.model_manager.swap(snapshot)
+    app_module.inference_sessions.clear()
+
+
+def route_benchmarks(client, model: BayesianDiseaseModel, cases: List[Dict[str, str]], texts: List[str],
+                     batch_size: int) -> Dict[str, Callable[[int], Any]]:
+    # Disease metadata only exists for the built-in diseases
+    described = sorted(DISEASE_DESCRIPTIONS)
+    batches = [
+        {"cases": [{"id": j, "symptoms": case} for j, case in enumerate(cases[start:start + batch_size])],
+         "top_k": 3}
+        for start in range(0, len(cases) - batch_size + 1, batch_size)
+    ]
+
+    def check(response):
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.request.path} returned {response.status_code}: {response.get_data()[:200]}")
+        return response
+
+    return {
+        "route.health": lambda i: check(client.get('/health')),
+        "route.diseases": lambda i: check(client.get('/api/diseases')),
+        "route.disease_info": lambda i: check(client.get(f"/api/disease-info/{described[i % len(described)]}")),
+        "route.predict": lambda i: check(client.post('/api/predict', json={"symptoms": cases[i % len(cases)]})),
+        "route.predict_compact": lambda i: check(client.post('/api/predict?format=compact',
+                                                             json={"symptoms": cases[i % len(cases)]})),
+        "route.batch_predict": lambda i: check(client.post('/api/batch-predict', json=batches[i % len(batches)])),
+        "route.validate_symptom": lambda i: check(client.post('/api/validate-symptom',
+                                                              json={"text": texts[i % len(texts)]}))
+    }
+
+
+def run(sizes=DEFAULT_SIZES, batch_size: int = DEFAULT_BATCH_SIZE, repeat: int = DEFAULT_REPEAT, seed: int = 0,
+        only: Optional[str] = None, log=print) -> Dict[str, Any]:
+    """
+    Run the suite for each catalogue size.
+
+    Args:
+        sizes: Catalogue sizes (number of diseases)
+        batch_size: Cases per predict_batch call and /api/batch-predict request
+        repeat: Timed rounds per benchmark
+        seed: Seed for the synthetic catalogues and workloads
+        only: Substring filter on benchmark names
+        log: Progress output; None silences it
+
+    Returns:
+        The results document written by --output
+    """
+    import app as app_module
+
+    client = app_module.app.test_client()
+    original_snapshot = app_module.model_manager.current
+    results = {}
+    try:
+        for size in sizes:
+            model = synthetic_model(size, seed)
+            cases = symptom_cases(model, max(WORKLOAD_SIZE, batch_size), seed)
+            texts = symptom_texts(model, WORKLOAD_SIZE, seed)
+            _use_model(app_module, take_snapshot(model))
+
+            benchmarks = model_benchmarks(model, cases, texts, batch_size)
+            benchmarks.update(route_benchmarks(client, model, cases, texts, batch_size))
+            for name, call in benchmarks.items():
+                if only and only not in name:
+                    continue
+                items = batch_size if name in BATCH_BENCHMARKS else 1
+                result = results[f"{name}[{size}]"] = measure(call, repeat, items)
+                if log:
+                    log(f"{name}[{size}]: {result['median_us']:.1f} us/call ({result['per_item_us']:.2f} us/item)")
+    finally:
+        _use_model(app_module, original_snapshot)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "json_encoder": app_module.app.json.encoder
+        },
+        "settings": {"sizes": list(sizes), "batch_size": batch_size, "repeat": repeat, "seed": seed},
+        "results": results
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> Tuple[List[str], List[str]]:
+    """
+    Compare median times against a baseline document.
+
+    Returns:
+        (report lines, names of benchmarks slower than baseline by more than `threshold`)
+    """
+    lines, regressions = [], []
+    for name, result in current["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            lines.append(f"{name}: {result['median_us']:.1f} us (new)")
+            continue
+        ratio = result["median_us"] / reference["median_us"] if reference["median_us"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            flag = "  improved"
+        lines.append(f"{name}: {reference['median_us']:.1f} -> {result['median_us']:.1f} us ({ratio:.2f}x){flag}")
+
+    for key in ("python", "numpy", "platform", "cpus"):
+        before, after = baseline.get("environment", {}).get(key), current["environment"].get(key)
+        if before != after:
+            lines.append(f"note: {key} differs from the baseline ({before} vs {after})")
+    return lines, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the disease prediction model and API")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated catalogue sizes (number of diseases)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed rounds per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--output", help="Write the results JSON to this path")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Relative slowdown of the median that counts as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    if any(size < 1 for size in sizes) or args.batch_size < 1 or args.repeat < 1:
+        parser.error("Sizes, batch size and repeat must be positive")
+
+    document = run(sizes, args.batch_size, args.repeat, args.seed, args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+        print(f"Wrote {len(document['results'])} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(document, baseline, args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Disease Catalogue
+Immutable, indexed disease metadata with pre-serialized JSON fragments for
+the API responses that embed it.
+"""
+
+import json
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Tuple
+
+DISEASE_DESCRIPTIONS = {
+    "Common Cold": {
+        "description": "A viral infection of the upper respiratory tract that is generally harmless.",
+        "common_causes": ["Rhinovirus", "Coronavirus", "Seasonal transmission"],
+        "severity": "low"
+    },
+    "Influenza": {
+        "description": "Influenza is a viral infection that attacks the respiratory system.",
+        "common_causes": ["Influenza A virus", "Influenza B virus", "Seasonal outbreak"],
+        "severity": "moderate"
+    },
+    "Malaria": {
+        "description": "A mosquito-borne infectious disease caused by Plasmodium parasites.",
+        "common_causes": ["Plasmodium falciparum", "Plasmodium vivax", "Mosquito bites"],
+        "severity": "high"
+    },
+    "Dengue": {
+        "description": "A mosquito-borne viral infection causing flu-like illness.",
+        "common_causes": ["Dengue virus", "Aedes mosquito", "Tropical regions"],
+        "severity": "moderate"
+    },
+    "Typhoid": {
+        "description": "A bacterial infection caused by Salmonella typhi.",
+        "common_causes": ["Salmonella typhi", "Contaminated food/water", "Poor sanitation"],
+        "severity": "moderate"
+    },
+    "Pneumonia": {
+        "description": "Infection that inflames air sacs in one or both lungs.",
+        "common_causes": ["Bacteria", "Viruses", "Fungi", "Weakened immune system"],
+        "severity": "moderate"
+    },
+    "COVID-19": {
+        "description": "Coronavirus disease caused by SARS-CoV-2 virus.",
+        "common_causes": ["SARS-CoV-2 virus", "Respiratory droplets", "Close contact"],
+        "severity": "moderate"
+    },
+    "Asthma": {
+        "description": "A chronic respiratory condition causing airway inflammation.",
+        "common_causes": ["Allergens", "Respiratory infections", "Environmental factors"],
+        "severity": "moderate"
+    },
+    "Tuberculosis": {
+        "description": "A bacterial infection that mainly affects the lungs.",
+        "common_causes": ["Mycobacterium tuberculosis", "Airborne transmission", "Weakened immune system"],
+        "severity": "high"
+    },
+    "Diabetes": {
+        "description": "A chronic condition affecting blood sugar regulation.",
+        "common_causes": ["Insulin resistance", "Genetic factors", "Lifestyle factors"],
+        "severity": "moderate"
+    },
+    "Gastroenteritis": {
+        "description": "Inflammation of the stomach and intestines, commonly caused by viral or bacterial infection.",
+        "common_causes": ["Norovirus", "Rotavirus", "Food poisoning", "Contaminated water"],
+        "severity": "moderate"
+    },
+    "Migraine": {
+        "description": "A neurological condition characterized by intense, recurring headaches often accompanied by other symptoms.",
+        "common_causes": ["Genetic factors", "Hormonal changes", "Stress", "Certain foods", "Environmental triggers"],
+        "severity": "moderate"
+    },
+    "Anemia": {
+        "description": "A condition where the body lacks enough healthy red blood cells to carry adequate oxygen to tissues.",
+        "common_causes": ["Iron deficiency", "Vitamin B12 deficiency", "Chronic disease", "Blood loss", "Genetic disorders"],
+        "severity": "moderate"
+    },
+    "Allergic Rhinitis": {
+        "description": "An allergic response causing inflammation of the nasal passages and upper respiratory tract.",
+        "common_causes": ["Pollen", "Dust mites", "Pet dander", "Mold spores", "Seasonal allergens"],
+        "severity": "low"
+    }
+}
+
+UNKNOWN_DISEASE_INFO = MappingProxyType({
+    "description": "No additional information available.",
+    "common_causes": (),
+    "severity": "unknown"
+})
+
+
+class DiseaseCatalogue:
+    def __init__(self, descriptions: Dict[str, Dict[str, Any]]):
+        """
+        Freeze disease metadata and pre-serialize the JSON embedded in responses.
+
+        Args:
+            descriptions: Mapping of disease name to its description,
+                common_causes and severity
+        """
+        self._entries = MappingProxyType({
+            name: MappingProxyType({
+                "description": info["description"],
+                "common_causes": tuple(info["common_causes"]),
+                "severity": info["severity"]
+            })
+            for name, info in descriptions.items()
+        })
+
+        # /api/disease-info/<name> response bodies
+        self._info_bodies = {
+            name: json.dumps({"disease": name, "info": self._as_dict(entry)}, sort_keys=True).encode()
+            for name, entry in self._entries.items()
+        }
+
+        # top_diseases items of /api/predict, split around the probability value
+        self._ranked_fragments = {
+            name: self._split_ranked(name, entry) for name, entry in self._entries.items()
+        }
+
+    @staticmethod
+    def _as_dict(entry) -> Dict[str, Any]:
+        return {
+            "description": entry["description"],
+            "common_causes": list(entry["common_causes"]),
+            "severity": entry["severity"]
+        }
+
+    @staticmethod
+    def _split_ranked(name: str, entry) -> Tuple[str, str]:
+        # Keys in sorted order, matching json.dumps(..., sort_keys=True)
+        prefix = (
+            '{"common_causes": ' + json.dumps(list(entry["common_causes"]))
+            + ', "description": ' + json.dumps(entry["description"])
+            + ', "name": ' + json.dumps(name)
+            + ', "probability": '
+        )
+        suffix = ', "severity": ' + json.dumps(entry["severity"]) + '}'
+        return prefix, suffix
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def get(self, name: str):
+        """Return the frozen metadata for `name`, or the unknown-disease entry."""
+        return self._entries.get(name, UNKNOWN_DISEASE_INFO)
+
+    def info(self, name: str) -> Dict[str, Any]:
+        """Return a plain-dict copy of the metadata for `name`."""
+        return self._as_dict(self.get(name))
+
+    def info_body(self, name: str) -> bytes:
+        """Return the serialized /api/disease-info body, or None if unknown."""
+        return self._info_bodies.get(name)
+
+    def ranked_fragment(self, name: str, probability: float) -> str:
+        """Return the serialized top_diseases item for `name` at `probability`."""
+        fragment = self._ranked_fragments.get(name)
+        if fragment is None:
+            fragment = self._split_ranked(name, UNKNOWN_DISEASE_INFO)
+        prefix, suffix = fragment
+        return prefix + json.dumps(probability) + suffix
+
+    def ranked_fragments(self, ranked: Iterable[Tuple[str, float]]) -> str:
+        """Serialize a list of (disease, probability) pairs as a JSON array."""
+        return "[" + ", ".join(self.ranked_fragment(name, prob) for name, prob in ranked) + "]"
+
+
+DISEASE_CATALOGUE = DiseaseCatalogue(DISEASE_DESCRIPTIONS)
@@ -0,0 +1,402 @@
+"""
+Model Fitting
+Estimate priors and CPTs from labelled cases too large to hold in memory, and
+write them as a model artifact (see model_artifact.py).
+
+Case files are streamed in chunks. Each chunk is encoded into a
+(cases x symptoms) matrix of severity indices, and the
+(disease, symptom, severity) counts are accumulated with one `np.bincount`
+per chunk. Counts from different files are independent `CaseCounts` objects
+that merge by addition, so files are counted in parallel worker processes.
+Counts can also be saved (.npz), counted on other machines and merged later.
+
+Input formats (optionally gzip-compressed, by a .gz suffix):
+    .ndjson / .jsonl   {"disease": "Malaria", "symptoms": {"Fever": "Severe"}} per line
+    .csv               a "disease" column and one column per symptom holding
+                       its severity; blank cells are unreported symptoms
+    .npz               counts saved by an earlier run (--counts-out)
+
+Symptoms a case does not report are counted at `missing_level` ("None" by
+default), i.e. case files are assumed to list every symptom that was present.
+
+The CPTs are posterior means under a symmetric Dirichlet prior:
+
+    P(level | disease, symptom) = (n[d, s, level] + alpha) / (n[d, s] + alpha * n_levels)
+
+or, with base="pooled", a Dirichlet centred on the symptom's severity
+distribution pooled over all diseases, so rarely seen diseases shrink
+towards the population instead of towards uniform. Priors are smoothed
+disease frequencies.
+
+Usage:
+    python fit_model.py cases-2023.ndjson.gz cases-2024.csv -o model.bdm --workers 4
+    python fit_model.py part-*.csv --counts-out counts-a.npz          # count only
+    python fit_model.py counts-a.npz counts-b.npz -o model.bdm         # merge and fit
+    MODEL_ARTIFACT=model.bdm gunicorn app:app
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
+from bayesian_model import DEFAULT_SMOOTHING, compile_factor_rows, compile_log_factor_rows
+from model_artifact import write_artifact
+
+DEFAULT_CHUNK_SIZE = 100000
+DEFAULT_ALPHA = 1.0
+DEFAULT_PRIOR_ALPHA = 1.0
+DEFAULT_MISSING_LEVEL = "None"
+BASES = ("uniform", "pooled")
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class CaseCounts:
+    def __init__(self, symptoms: Sequence[str], severity_levels: Sequence[str], diseases: Sequence[str] = ()):
+        """
+        Empty (disease, symptom, severity) counts. The symptom and severity
+        vocabularies are fixed; diseases are added as they are first seen.
+
+        Args:
+            symptoms: Symptom names, in model order
+            severity_levels: Severity level names, in model order
+            diseases: Diseases to start with
+        """
+        self.symptoms = list(symptoms)
+        self.severity_levels = list(severity_levels)
+        self.symptom_index = {symptom: s for s, symptom in enumerate(self.symptoms)}
+        self.severity_index = {level: l for l, level in enumerate(self.severity_levels)}
+        self.diseases: List[str] = []
+        self.disease_index: Dict[str, int] = {}
+        self.counts = np.zeros((0, len(self.symptoms), len(self.severity_levels)), dtype=np.int64)
+        self.disease_cases = np.zeros(0, dtype=np.int64)
+        # Cases dropped for a missing disease or an unknown severity, and
+        # reported symptoms outside the vocabulary (ignored)
+        self.skipped_cases = 0
+        self.unknown_symptoms = 0
+        for disease in diseases:
+            self.disease_id(disease)
+
+    @property
+    def n_cases(self) -> int:
+        return int(self.disease_cases.sum())
+
+    def disease_id(self, name: str) -> int:
+        """Index of `name`, adding it (with zero counts) if it is new."""
+        d = self.disease_index.get(name)
+        if d is None:
+            d = self.disease_index[name] = len(self.diseases)
+            self.diseases.append(name)
+            if d >= len(self.disease_cases):
+                # Grow geometrically; rows past len(diseases) stay zero
+                capacity = max(16, 2 * len(self.disease_cases))
+                counts = np.zeros((capacity,) + self.counts.shape[1:], dtype=np.int64)
+                counts[:len(self.counts)] = self.counts
+                disease_cases = np.zeros(capacity, dtype=np.int64)
+                disease_cases[:len(self.disease_cases)] = self.disease_cases
+                self.counts, self.disease_cases = counts, disease_cases
+        return d
+
+    def add(self, disease_ids, levels) -> None:
+        """
+        Count a chunk of encoded cases.
+
+        Args:
+            disease_ids: (cases,) disease indices
+            levels: (cases x symptoms) severity indices; negative entries are not counted
+        """
+        disease_ids = np.asarray(disease_ids, dtype=np.int64)
+        levels = np.asarray(levels, dtype=np.int64)
+        if not len(disease_ids):
+            return
+        capacity, n_symptoms, n_levels = self.counts.shape
+        cells = (disease_ids[:, None] * n_symptoms + np.arange(n_symptoms)) * n_levels + levels
+        self.counts += np.bincount(cells[levels >= 0], minlength=self.counts.size).reshape(self.counts.shape)
+        self.disease_cases += np.bincount(disease_ids, minlength=capacity)
+
+    def merge(self, other: "CaseCounts") -> "CaseCounts":
+        """Add `other`'s counts into these ones, matching diseases by name."""
+        if other.symptoms != self.symptoms or other.severity_levels != self.severity_levels:
+            raise ValueError("Counts were made with different symptom or severity vocabularies")
+        ids = np.array([self.disease_id(name) for name in other.diseases], dtype=np.int64)
+        n = len(other.diseases)
+        # Names are distinct, so ids are too and fancy-index += is exact
+        self.counts[ids] += other.counts[:n]
+        self.disease_cases[ids] += other.disease_cases[:n]
+        self.skipped_cases += other.skipped_cases
+        self.unknown_symptoms += other.unknown_symptoms
+        return self
+
+    def save(self, path: str) -> None:
+        """Write the counts to an .npz file that `load` (and fit_model.py) can read back."""
+        n = len(self.diseases)
+        header = {
+            "diseases": self.diseases,
+            "symptoms": self.symptoms,
+            "severity_levels": self.severity_levels,
+            "skipped_cases": self.skipped_cases,
+            "unknown_symptoms": self.unknown_symptoms
+        }
+        with open(path, "wb") as f:
+            np.savez_compressed(f, header=np.array(json.dumps(header)), counts=self.counts[:n],
+                                disease_cases=self.disease_cases[:n])
+
+    @classmethod
+    def load(cls, path: str) -> "CaseCounts":
+        with np.load(path) as data:
+            header = json.loads(str(data["header"]))
+            counts = cls(header["symptoms"], header["severity_levels"], header["diseases"])
+            n = len(counts.diseases)
+            counts.counts[:n] = data["counts"]
+            counts.disease_cases[:n] = data["disease_cases"]
+        counts.skipped_cases = header["skipped_cases"]
+        counts.unknown_symptoms = header["unknown_symptoms"]
+        return counts
+
+    def fit(self, alpha: float = DEFAULT_ALPHA, base: str = "uniform",
+            prior_alpha: Optional[float] = DEFAULT_PRIOR_ALPHA) -> Tuple[List[str], Any, Any]:
+        """
+        Smoothed priors and CPTs, with diseases in sorted order.
+
+        Args:
+            alpha: Dirichlet pseudo-count per severity level
+            base: "uniform", or "pooled" to centre the Dirichlet on each
+                symptom's severity distribution over all diseases
+            prior_alpha: Pseudo-count added to every disease's case count for
+                the priors; None gives uniform priors
+
+        Returns:
+            (diseases, prior array, (diseases x symptoms x severity_levels) CPT array)
+        """
+        if alpha <= 0:
+            raise ValueError("alpha must be positive")
+        if base not in BASES:
+            raise ValueError(f"Unknown base: {base}")
+        if not self.diseases:
+            raise ValueError("No cases were counted")
+        order = sorted(range(len(self.diseases)), key=self.diseases.__getitem__)
+        counts = self.counts[order].astype(np.float64)
+        disease_cases = self.disease_cases[order].astype(np.float64)
+        n_levels = counts.shape[2]
+
+        if base == "pooled":
+            pooled = counts.sum(axis=0)
+            totals = pooled.sum(axis=1, keepdims=True)
+            # Symptoms never reported fall back to uniform
+            pooled = np.divide(pooled, totals, out=np.full(pooled.shape, 1.0 / n_levels), where=totals > 0)
+            pseudo_counts = alpha * n_levels * pooled
+        else:
+            pseudo_counts = np.full(counts.shape[1:], alpha)
+        cpt_array = (counts + pseudo_counts) / (counts.sum(axis=2, keepdims=True) + pseudo_counts.sum(axis=1)[:, None])
+
+        if prior_alpha is None:
+            prior = np.full(len(order), 1.0 / len(order))
+        else:
+            prior = (disease_cases + prior_alpha) / (disease_cases.sum() + prior_alpha * len(order))
+        return [self.diseases[d] for d in order], prior, cpt_array
+
+    def write_artifact(self, path: str, alpha: float = DEFAULT_ALPHA, base: str = "uniform",
+                       prior_alpha: Optional[float] = DEFAULT_PRIOR_ALPHA,
+                       smoothing: float = DEFAULT_SMOOTHING) -> None:
+        """Fit (see `fit`) and write a model artifact loadable by BayesianDiseaseModel(artifact=path)."""
+        diseases, prior, cpt_array = self.fit(alpha, base, prior_alpha)
+        present = np.ones(cpt_array.shape, dtype=bool)
+        write_artifact(path, diseases, self.symptoms, self.severity_levels,
+                       compile_factor_rows(prior, cpt_array),
+                       compile_log_factor_rows(prior, cpt_array, present, smoothing), smoothing)
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def _chunks(iterable: Iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _count_ndjson(path: str, counts: CaseCounts, chunk_size: int, missing: int) -> None:
+    symptom_index, severity_index = counts.symptom_index, counts.severity_index
+    n_symptoms = len(counts.symptoms)
+    with _open_text(path) as f:
+        for lines in _chunks(f, chunk_size):
+            disease_ids, rows, columns, values = [], [], [], []
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    case = _loads(line)
+                    disease, symptoms = case["disease"], case.get("symptoms") or {}
+                    encoded = []
+                    for symptom, level in symptoms.items():
+                        s = symptom_index.get(symptom)
+                        if s is None:
+                            counts.unknown_symptoms += 1
+                        else:
+                            encoded.append((s, severity_index[level]))
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    counts.skipped_cases += 1
+                    continue
+                if not isinstance(disease, str) or not disease:
+                    counts.skipped_cases += 1
+                    continue
+                row = len(disease_ids)
+                disease_ids.append(counts.disease_id(disease))
+                for s, l in encoded:
+                    rows.append(row)
+                    columns.append(s)
+                    values.append(l)
+
+            levels = np.full((len(disease_ids), n_symptoms), missing, dtype=np.int64)
+            levels[rows, columns] = values
+            counts.add(disease_ids, levels)
+
+
+class _LevelCodes(dict):
+    """Severity index per CSV cell value; unknown values map to -2. Padded variants are resolved once."""
+
+    def __missing__(self, value: str) -> int:
+        code = self[value] = self.get(value.strip(), -2)
+        return code
+
+
+def _count_csv(path: str, counts: CaseCounts, chunk_size: int, missing: int) -> None:
+    with _open_text(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        if "disease" not in header:
+            raise ValueError(f"{path} has no 'disease' column")
+        disease_column = header.index("disease")
+        symptom_columns = [(column, counts.symptom_index[name]) for column, name in enumerate(header)
+                           if name in counts.symptom_index]
+        # Blank cells are unreported symptoms
+        level_codes = _LevelCodes(counts.severity_index)
+        level_codes[""] = missing
+
+        for rows in _chunks(reader, chunk_size):
+            rows = [row for row in rows if len(row) == len(header)]
+            if not rows:
+                continue
+            columns = list(zip(*rows))
+            levels = np.full((len(rows), len(counts.symptoms)), missing, dtype=np.int64)
+            for column, s in symptom_columns:
+                levels[:, s] = [level_codes[value] for value in columns[column]]
+
+            diseases = [disease.strip() for disease in columns[disease_column]]
+            valid = (levels != -2).all(axis=1) & np.array([bool(disease) for disease in diseases])
+            counts.skipped_cases += int(len(rows) - valid.sum())
+            disease_ids = [counts.disease_id(disease) for disease, ok in zip(diseases, valid.tolist()) if ok]
+            counts.add(disease_ids, levels[valid])
+
+
+def count_file(path: str, symptoms: Sequence[str], severity_levels: Sequence[str],
+               chunk_size: int = DEFAULT_CHUNK_SIZE,
+               missing_level: Optional[str] = DEFAULT_MISSING_LEVEL) -> CaseCounts:
+    """
+    Count one case file (or load saved counts from an .npz file).
+
+    Args:
+        path: .ndjson/.jsonl, .csv or .npz, optionally with a .gz suffix
+        symptoms: Symptom vocabulary
+        severity_levels: Severity vocabulary
+        chunk_size: Cases encoded and counted per step
+        missing_level: Severity counted for symptoms a case does not
+            report; None leaves them uncounted
+
+    Raises:
+        ValueError: For unsupported file types or an unknown missing_level
+    """
+    if path.endswith(".npz"):
+        return CaseCounts.load(path)
+    counts = CaseCounts(symptoms, severity_levels)
+    if missing_level is not None and missing_level not in counts.severity_index:
+        raise ValueError(f"Unknown missing level: {missing_level}")
+    missing = -1 if missing_level is None else counts.severity_index[missing_level]
+
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith((".ndjson", ".jsonl")):
+        _count_ndjson(path, counts, chunk_size, missing)
+    elif name.endswith(".csv"):
+        _count_csv(path, counts, chunk_size, missing)
+    else:
+        raise ValueError(f"Unsupported case file: {path}")
+    return counts
+
+
+def count_files(paths: Sequence[str], symptoms: Sequence[str], severity_levels: Sequence[str],
+                workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                missing_level: Optional[str] = DEFAULT_MISSING_LEVEL) -> CaseCounts:
+    """Count every file, in `workers` processes, and merge the counts in input order."""
+    total = CaseCounts(symptoms, severity_levels)
+    arguments = [(path, symptoms, severity_levels, chunk_size, missing_level) for path in paths]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(min(workers, len(paths))) as pool:
+            for counts in pool.map(count_file, *zip(*arguments)):
+                total.merge(counts)
+    else:
+        for args in arguments:
+            total.merge(count_file(*args))
+    return total
+
+
+def main(argv=None) -> int:
+    from bayesian_model import BayesianDiseaseModel
+
+    parser = argparse.ArgumentParser(description="Fit disease priors and CPTs from labelled case files")
+    parser.add_argument("inputs", nargs="+", help="Case files (.ndjson, .jsonl, .csv, optionally .gz) or saved .npz counts")
+    parser.add_argument("-o", "--output", help="Model artifact to write")
+    parser.add_argument("--counts-out", help="Also save the merged counts to this .npz file")
+    parser.add_argument("--vocabulary", help="Model artifact whose symptoms and severity levels to use "
+                                             "(default: the built-in model's)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes counting files in parallel")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--missing-level", default=DEFAULT_MISSING_LEVEL,
+                        help="Severity counted for unreported symptoms; empty to leave them uncounted")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="Dirichlet pseudo-count per severity level")
+    parser.add_argument("--base", choices=BASES, default="uniform", help="Dirichlet base distribution")
+    parser.add_argument("--uniform-priors", action="store_true", help="Ignore disease frequencies for the priors")
+    args = parser.parse_args(argv)
+    if not args.output and not args.counts_out:
+        parser.error("Nothing to write: give --output and/or --counts-out")
+    if args.workers < 1 or args.chunk_size < 1:
+        parser.error("--workers and --chunk-size must be positive")
+
+    vocabulary = BayesianDiseaseModel(cache_size=0, artifact=args.vocabulary)
+    counts = count_files(args.inputs, vocabulary.symptoms, vocabulary.severity_levels, args.workers,
+                         args.chunk_size, args.missing_level or None)
+    print(f"Counted {counts.n_cases} cases of {len(counts.diseases)} diseases "
+          f"({counts.skipped_cases} cases skipped, {counts.unknown_symptoms} unknown symptoms ignored)")
+
+    if args.counts_out:
+        counts.save(args.counts_out)
+        print(f"Wrote counts to {args.counts_out}")
+    if args.output:
+        counts.write_artifact(args.output, args.alpha, args.base, None if args.uniform_priors else DEFAULT_PRIOR_ALPHA)
+        print(f"Wrote model artifact to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+JSON Provider
+Flask JSON provider that encodes with orjson when it is installed, and with
+Flask's default (stdlib json) provider otherwise. Both produce the same JSON
+documents (sorted keys, compact separators outside debug mode); only
+insignificant formatting such as float exponents or the escaping of non-ASCII
+characters can differ. Values orjson cannot encode, such as integers wider
+than 64 bits, are encoded by the stdlib provider instead.
+"""
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def __init__(self, app, use_orjson: bool = True):
+        """
+        Args:
+            app: The Flask app
+            use_orjson: Encode with orjson if it is installed
+        """
+        super().__init__(app)
+        self.use_orjson = use_orjson and orjson is not None
+
+    @property
+    def encoder(self) -> str:
+        return "orjson" if self.use_orjson else "json"
+
+    def _orjson_options(self) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # Formatting arguments are only understood by the stdlib encoder
+        if not self.use_orjson or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode()
+        except TypeError:  # orjson.JSONEncodeError, e.g. an integer wider than 64 bits
+            return super().dumps(obj, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if not self.use_orjson:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._orjson_options() | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        try:
+            body = orjson.dumps(obj, default=self.default, option=option)
+        except TypeError:  # orjson.JSONEncodeError, e.g. an integer wider than 64 bits
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,125 @@
+"""
+Evidence Lookup Table
+Precomputed posteriors for the triage path: a prediction is a few table
+lookups plus an add and a normalize, with no per-symptom work.
+
+Evidence is addressed by its compact integer code, `model.evidence_key()`:
+one base-(len(severity_levels) + 1) digit per catalogue symptom, 0 meaning
+"not reported". The full evidence space (5^14 codes for the built-in model)
+is too large to tabulate, but log-likelihoods add across symptoms, so the
+symptoms are split into groups of `group_size` and each group gets a table of
+partial log-likelihoods indexed by its own digits (5^7 = 78125 rows for
+groups of 7):
+
+    log P(d | code) = log P(d) + sum over groups g of table_g[digits_g(code)][d] + const
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Largest total table size compiled by default, in bytes
+MAX_TABLE_BYTES = 256 * 1024 * 1024
+
+
+class EvidenceLookupTable:
+    def __init__(self, model, group_size: int = 7, max_bytes: int = MAX_TABLE_BYTES):
+        """
+        Compile per-group log-likelihood tables from a numpy-backend model.
+
+        Args:
+            model: The model to tabulate; its current version is recorded in
+                `model_version`
+            group_size: Symptoms per group; table rows grow as
+                (len(severity_levels) + 1) ** group_size
+            max_bytes: Refuse to compile tables larger than this
+
+        Raises:
+            ValueError: For python-backend models or tables over `max_bytes`
+        """
+        if model.backend != "numpy":
+            raise ValueError("Lookup tables require the numpy backend")
+        n_symptoms, n_levels, n_diseases = len(model.symptoms), len(model.severity_levels), len(model.diseases)
+        self.base = n_levels + 1
+        self.groups = [(start, min(group_size, n_symptoms - start)) for start in range(0, n_symptoms, group_size)]
+        nbytes = sum(self.base ** size for _, size in self.groups) * n_diseases * 8
+        if nbytes > max_bytes:
+            raise ValueError(f"Lookup tables would take {nbytes} bytes (limit {max_bytes})")
+
+        self.diseases = model.diseases
+        self.inference = model.inference
+        self.model_version = model.version
+        self.n_codes = self.base ** n_symptoms
+        if model.inference == "log":
+            log_rows = model._log_factor_rows
+        else:
+            with np.errstate(divide="ignore"):
+                log_rows = np.log(model._factor_rows)
+        self.log_prior = log_rows[0].copy()
+        self.prior = model.prior_array.copy()
+
+        # Powers of the base, for splitting codes into group digits
+        self._strides = [self.base ** i for i in range(n_symptoms + 1)]
+        self.tables: List[Any] = []
+        for start, size in self.groups:
+            table = np.zeros((1, n_diseases))
+            for s in range(start, start + size):
+                # Digit 0 ("not reported") adds nothing; digit l + 1 adds row (s, l)
+                options = np.vstack((np.zeros(n_diseases), log_rows[1 + s * n_levels:1 + (s + 1) * n_levels]))
+                # The newest symptom becomes the most significant digit
+                table = (options[:, None, :] + table[None, :, :]).reshape(-1, n_diseases)
+            self.tables.append(table)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(table.nbytes for table in self.tables)
+
+    def posteriors(self, codes):
+        """
+        Normalized (codes x diseases) posteriors for an array of evidence codes.
+        Matches predict() on the decoded evidence up to floating-point rounding.
+        """
+        codes = np.asarray(codes, dtype=object if self.n_codes > np.iinfo(np.int64).max else np.int64)
+        if codes.ndim != 1 or (codes < 0).any() or (codes >= self.n_codes).any():
+            raise ValueError(f"Evidence codes must be integers in [0, {self.n_codes})")
+        log_posteriors = np.broadcast_to(self.log_prior, (len(codes), len(self.diseases))).copy()
+        for (start, size), table in zip(self.groups, self.tables):
+            rows = (codes // self.base ** start) % self.base ** size
+            log_posteriors += table[rows.astype(np.intp)]
+
+        peaks = log_posteriors.max(axis=1, keepdims=True)
+        impossible = ~np.isfinite(peaks[:, 0])
+        posteriors = np.exp(log_posteriors - np.where(impossible[:, None], 0.0, peaks))
+        # Same fallbacks as predict(): the prior in log mode, all-zero in linear mode
+        posteriors[impossible] = self.prior if self.inference == "log" else 0.0
+        totals = posteriors.sum(axis=1, keepdims=True)
+        return np.divide(posteriors, totals, out=posteriors, where=totals > 0)
+
+    def posterior(self, code: int):
+        """Normalized posterior vector for one evidence code."""
+        if not isinstance(code, int) or isinstance(code, bool) or not 0 <= code < self.n_codes:
+            raise ValueError(f"Evidence codes must be integers in [0, {self.n_codes})")
+        log_posterior = self.log_prior.copy()
+        for (start, size), table in zip(self.groups, self.tables):
+            log_posterior += table[code // self._strides[start] % self._strides[size]]
+        peak = log_posterior.max()
+        if not np.isfinite(peak):
+            return self.prior.copy() if self.inference == "log" else np.zeros(len(self.diseases))
+        posterior = np.exp(log_posterior - peak)
+        return posterior / posterior.sum()
+
+    def predict(self, code: int, top_k: int = 1) -> Dict[str, Any]:
+        """
+        Top-k diseases for one evidence code, in the per-case format of
+        BayesianDiseaseModel.predict_batch().
+        """
+        posterior = self.posterior(code)
+        top_k = max(1, min(top_k, len(self.diseases)))
+        order = np.argsort(-posterior, kind="stable")[:top_k].tolist()
+        percentages = (posterior * 100).tolist()
+        top_diseases = [{"name": self.diseases[d], "probability": round(percentages[d], 2)} for d in order]
+        return {
+            "most_probable_disease": top_diseases[0]["name"],
+            "most_probable_probability": top_diseases[0]["probability"],
+            "top_diseases": top_diseases
+        }
@@ -0,0 +1,214 @@
+"""
+Metrics
+Low-overhead counters and histograms rendered in the Prometheus text format.
+
+Recording never takes a lock: every thread accumulates into its own dict of
+cells, and a scrape merges the dicts of all threads. Each cell is only ever
+written by the thread that owns it, so recording never waits on a scrape; a
+scrape may just miss the observations recorded while it runs. When a thread
+exits, its cells are folded into a shared total, so thread-per-request servers
+keep one dict per live thread rather than one per thread ever started. Gauges
+are computed by a callback at scrape time.
+"""
+
+import threading
+import weakref
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Request and inference latencies, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Cases per batch request
+SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        """Add `amount` to the counter for the given label values."""
+        cells = self.registry._cells()
+        key = (self, labels)
+        cells[key] = cells.get(key, 0) + amount
+
+    def _merge(self, into: Dict[Tuple, Any], labels: Tuple, value) -> None:
+        into[labels] = into.get(labels, 0) + value
+
+    def _render(self, merged: Dict[Tuple, Any]) -> List[str]:
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(merged.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: Any) -> None:
+        """Record one observation for the given label values."""
+        cells = self.registry._cells()
+        key = (self, labels)
+        cell = cells.get(key)
+        if cell is None:
+            # Per-bucket (non-cumulative) counts, the +Inf bucket, then the sum
+            cell = cells[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def _merge(self, into: Dict[Tuple, Any], labels: Tuple, cell) -> None:
+        total = into.get(labels)
+        if total is None:
+            into[labels] = list(cell)
+        else:
+            for i, value in enumerate(cell):
+                total[i] += value
+
+    def _render(self, merged: Dict[Tuple, Any]) -> List[str]:
+        lines = self._header()
+        bucket_names = self.labelnames + ("le",)
+        for labels, cell in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), cell):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_names, labels + (_format_value(bound),))} "
+                             f"{cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(cell[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Any], kind: str = "gauge"):
+        """
+        Args:
+            collect: Called on every scrape. Returns a number, or a dict of
+                label value tuples to numbers when the metric has labels
+            kind: "gauge", or "counter" for monotonic values kept elsewhere
+                (e.g. cache hit counters)
+        """
+        super().__init__(registry, name, documentation, labelnames)
+        self.collect = collect
+        self.kind = kind
+
+    def _render(self, merged: Dict[Tuple, Any]) -> List[str]:
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+class _ThreadToken:
+    """Kept in a thread's local storage, so it is freed when the thread exits."""
+    __slots__ = ("__weakref__",)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """An empty set of metrics."""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Cell dicts of the live threads that have recorded a value, by id()
+        self._shards: Dict[int, Dict[Tuple, Any]] = {}
+        # Merged values recorded by threads that have exited
+        self._retired: Dict[_Metric, Dict[Tuple, Any]] = {}
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _cells(self) -> Dict[Tuple, Any]:
+        """The calling thread's cells, registered on first use."""
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = self._local.cells = {}
+            token = self._local.token = _ThreadToken()
+            weakref.finalize(token, self._retire, cells).atexit = False
+            with self._lock:
+                self._shards[id(cells)] = cells
+            return cells
+
+    def _retire(self, cells: Dict[Tuple, Any]) -> None:
+        """Fold the cells of a thread that has exited into the retired totals."""
+        with self._lock:
+            del self._shards[id(cells)]
+            for (metric, labels), value in cells.items():
+                metric._merge(self._retired.setdefault(metric, {}), labels, value)
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, collect: Callable[[], Any], labelnames: Sequence[str] = (),
+              kind: str = "gauge") -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames, collect, kind))
+
+    def render(self) -> str:
+        """Merge every thread's cells and render all metrics in the Prometheus text format."""
+        with self._lock:
+            shards = list(self._shards.values())
+            metrics = list(self._metrics.values())
+            merged: Dict[_Metric, Dict[Tuple, Any]] = {metric: {} for metric in metrics}
+            for metric, retired in self._retired.items():
+                for labels, value in retired.items():
+                    metric._merge(merged[metric], labels, value)
+
+        for cells in shards:
+            # A C-level copy, so the owning thread may keep recording meanwhile
+            for (metric, labels), value in list(cells.items()):
+                metric._merge(merged[metric], labels, value)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric._render(merged[metric]))
+        return "\n".join(lines) + "\n"
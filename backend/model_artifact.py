@@ -0,0 +1,148 @@
+"""
+Model Artifact Format
+Binary on-disk format for BayesianDiseaseModel tables, designed to be
+memory-mapped read-only so that many worker processes share one physical copy.
+
+Layout (little-endian):
+    8 bytes   magic b"BDMODEL\0"
+    4 bytes   format version (uint32)
+    4 bytes   header length in bytes (uint32)
+    N bytes   UTF-8 JSON header: vocabularies, smoothing and array descriptors
+    padding   to a 64-byte boundary; the data section starts here
+    arrays    contiguous float64 arrays, each 64-byte aligned, at the offsets
+              (relative to the data section) given in the header
+
+The arrays are the model's compiled factor tables (see
+`bayesian_model.compile_factor_rows`): "factor_rows" holds the prior and the
+linear CPT, "log_factor_rows" the smoothed log-space equivalent.
+
+Usage:
+    python model_artifact.py model.bdm    # convert the built-in tables
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Any, Dict, List
+
+import numpy as np
+
+MAGIC = b"BDMODEL\0"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+DTYPE = "<f8"
+ARRAY_NAMES = ("factor_rows", "log_factor_rows")
+
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class ModelArtifact:
+    def __init__(self, header: Dict[str, Any], arrays: Dict[str, Any]):
+        """Vocabularies and (memory-mapped) tables read from an artifact."""
+        self.header = header
+        self.diseases: List[str] = header["diseases"]
+        self.symptoms: List[str] = header["symptoms"]
+        self.severity_levels: List[str] = header["severity_levels"]
+        self.smoothing: float = header["smoothing"]
+        self.factor_rows = arrays["factor_rows"]
+        self.log_factor_rows = arrays["log_factor_rows"]
+
+
+def write_artifact(path: str, diseases: List[str], symptoms: List[str], severity_levels: List[str],
+                   factor_rows, log_factor_rows, smoothing: float) -> None:
+    """
+    Write model tables to `path`. The file is written next to its destination
+    and renamed into place, so readers never observe a partial artifact.
+    """
+    expected_shape = (1 + len(symptoms) * len(severity_levels) + 1, len(diseases))
+    arrays = {}
+    for name, array in (("factor_rows", factor_rows), ("log_factor_rows", log_factor_rows)):
+        array = np.ascontiguousarray(array, dtype=DTYPE)
+        if array.shape != expected_shape:
+            raise ValueError(f"{name} has shape {array.shape}, expected {expected_shape}")
+        arrays[name] = array
+
+    descriptors = {}
+    offset = 0
+    for name, array in arrays.items():
+        descriptors[name] = {"offset": offset, "shape": list(array.shape)}
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({
+        "diseases": list(diseases),
+        "symptoms": list(symptoms),
+        "severity_levels": list(severity_levels),
+        "smoothing": smoothing,
+        "dtype": DTYPE,
+        "arrays": descriptors
+    }).encode("utf-8")
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + descriptors[name]["offset"])
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_model(model, path: str) -> None:
+    """Convert a (numpy-backend) BayesianDiseaseModel's tables to an artifact."""
+    if model.backend != "numpy":
+        raise ValueError("Only numpy-backend models can be saved as artifacts")
+    write_artifact(path, model.diseases, model.symptoms, model.severity_levels,
+                   model._factor_rows, model._log_factor_rows, model.smoothing)
+
+
+def load_artifact(path: str) -> ModelArtifact:
+    """
+    Memory-map an artifact read-only. The returned arrays are views into the
+    mapping, so the OS page cache holds the only copy of the tables.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapped) < _PREAMBLE.size:
+        raise ValueError(f"{path} is not a model artifact")
+    magic, version, header_length = _PREAMBLE.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a model artifact")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version: {version}")
+
+    header = json.loads(bytes(mapped[_PREAMBLE.size:_PREAMBLE.size + header_length]).decode("utf-8"))
+    data_start = _align(_PREAMBLE.size + header_length)
+    expected_shape = [1 + len(header["symptoms"]) * len(header["severity_levels"]) + 1, len(header["diseases"])]
+
+    arrays = {}
+    for name in ARRAY_NAMES:
+        descriptor = header["arrays"][name]
+        if descriptor["shape"] != expected_shape:
+            raise ValueError(f"{name} has shape {descriptor['shape']}, expected {expected_shape}")
+        count = expected_shape[0] * expected_shape[1]
+        offset = data_start + descriptor["offset"]
+        if offset + count * np.dtype(header["dtype"]).itemsize > len(mapped):
+            raise ValueError(f"{path} is truncated")
+        arrays[name] = np.frombuffer(mapped, dtype=header["dtype"], count=count, offset=offset).reshape(expected_shape)
+
+    return ModelArtifact(header, arrays)
+
+
+if __name__ == "__main__":
+    from bayesian_model import BayesianDiseaseModel
+
+    if len(sys.argv) != 2:
+        print("Usage: python model_artifact.py <output path>")
+        sys.exit(1)
+    save_model(BayesianDiseaseModel(), sys.argv[1])
+    print(f"Wrote built-in model tables to {sys.argv[1]}")
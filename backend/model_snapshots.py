@@ -0,0 +1,221 @@
+"""
+Model Snapshots
+Zero-downtime replacement of the served model.
+
+A `ModelSnapshot` is an immutable (model, version id) pair. The
+`ModelManager` publishes one snapshot at a time through a single attribute,
+`current`, read-copy-update style: a replacement model is loaded and
+validated off to the side, then published with one reference assignment.
+Readers take `manager.current` once per request and use that snapshot
+throughout, so in-flight requests finish on the model they started with and
+the old model is freed when its last reader lets go of it.
+
+Replacements come from `reload()` (e.g. an admin endpoint), `reload_async()`
+or a `ModelFileWatcher` polling the artifact file. A model that fails to load
+or validate is never published; the error is kept in `status()`.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from bayesian_model import BayesianDiseaseModel
+
+# Largest tolerated deviation of a prior or CPT row sum from 1
+SUM_TOLERANCE = 1e-3
+DEFAULT_WATCH_INTERVAL = 5.0
+
+
+class ModelSnapshot(NamedTuple):
+    model: BayesianDiseaseModel
+    # "<model.version>-<table fingerprint>": unique per load, and the
+    # fingerprint identifies the tables across processes and restarts
+    version_id: str
+    source: Optional[str]
+    loaded_at: float
+
+
+def fingerprint(model: BayesianDiseaseModel) -> str:
+    """Short content hash of a model's vocabularies and tables."""
+    digest = hashlib.sha256()
+    for names in (model.diseases, model.symptoms, model.severity_levels):
+        digest.update("\0".join(names).encode("utf-8") + b"\1")
+    if model.backend == "numpy":
+        digest.update(np.ascontiguousarray(model._factor_rows).tobytes())
+    else:
+        digest.update(repr((model.prior_probabilities, model.cpt)).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def take_snapshot(model: BayesianDiseaseModel, source: Optional[str] = None) -> ModelSnapshot:
+    """Wrap `model` in a snapshot with a fresh version id."""
+    return ModelSnapshot(model, f"{model.version}-{fingerprint(model)}", source, time.time())
+
+
+def validate_model(model: BayesianDiseaseModel) -> None:
+    """
+    Check that a model is safe to serve.
+
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    if not model.diseases or not model.symptoms or not model.severity_levels:
+        raise ValueError("Model has an empty disease, symptom or severity vocabulary")
+    if model.backend == "numpy":
+        prior, cpt_array = model.prior_array, model.cpt_array
+        # Log tables may hold -inf for impossible cells, never NaN or +inf
+        log_rows = model._log_factor_rows
+        if not np.isfinite(model._factor_rows).all() or np.isnan(log_rows).any() or (log_rows == np.inf).any():
+            raise ValueError("Model tables contain NaN or infinite values")
+        if (prior < 0).any() or abs(prior.sum() - 1.0) > SUM_TOLERANCE:
+            raise ValueError("Priors must be non-negative and sum to 1")
+        row_sums = cpt_array.sum(axis=2)
+        if (cpt_array < 0).any() or np.abs(row_sums - 1.0).max() > SUM_TOLERANCE:
+            d, s = np.unravel_index(np.abs(row_sums - 1.0).argmax(), row_sums.shape)
+            raise ValueError(f"P({model.symptoms[s]} | {model.diseases[d]}) does not sum to 1")
+
+    # Smoke test: one prediction must produce a proper distribution
+    result = model.predict({model.symptoms[0]: model.severity_levels[-1]})
+    total = sum(result["probability_distribution"].values())
+    if not np.isfinite(total) or abs(total - 100.0) > 1.0:
+        raise ValueError("Model does not produce a normalized posterior")
+
+
+class ModelManager:
+    def __init__(self, model: BayesianDiseaseModel, source: Optional[str] = None,
+                 load_model: Optional[Callable[[str], BayesianDiseaseModel]] = None):
+        """
+        Args:
+            model: The initially served model
+            source: Artifact path it was loaded from, if any; the default for reloads
+            load_model: Builds a model from an artifact path; defaults to
+                BayesianDiseaseModel(artifact=path) with the initial model's
+                inference mode and sparse setting; smoothing is the one the
+                new artifact was built with
+        """
+        self.source = source
+        self._load_model = load_model or (
+            lambda path: BayesianDiseaseModel(inference=model.inference, sparse=model.sparse, artifact=path)
+        )
+        self._reload_lock = threading.Lock()
+        self._listeners: List[Callable[[ModelSnapshot, ModelSnapshot], None]] = []
+        self._status: Dict[str, Any] = {"state": "idle", "error": None, "attempted_at": None}
+        self.current = take_snapshot(model, source)
+
+    def add_listener(self, listener: Callable[[ModelSnapshot, ModelSnapshot], None]) -> None:
+        """Call `listener(old, new)` after every swap, e.g. to release per-model resources."""
+        self._listeners.append(listener)
+
+    def load(self, path: str) -> ModelSnapshot:
+        """Load and validate the artifact at `path` without publishing it."""
+        model = self._load_model(path)
+        validate_model(model)
+        return take_snapshot(model, path)
+
+    def swap(self, snapshot: ModelSnapshot) -> ModelSnapshot:
+        """Publish `snapshot` and return the one it replaced."""
+        previous, self.current = self.current, snapshot
+        for listener in self._listeners:
+            try:
+                listener(previous, snapshot)
+            except Exception as e:
+                print(f"Model swap listener failed: {e}", file=sys.stderr)
+        return previous
+
+    def reload(self, path: Optional[str] = None) -> ModelSnapshot:
+        """
+        Load, validate and publish the artifact at `path` (default: the
+        current source). One reload runs at a time.
+
+        Raises:
+            ValueError: If there is no path, or the model fails to load or validate
+        """
+        path = path or self.source
+        if not path:
+            raise ValueError("No model artifact path to load")
+        with self._reload_lock:
+            self._status = {"state": "loading", "error": None, "attempted_at": time.time(), "path": path}
+            try:
+                snapshot = self.load(path)
+            except Exception as e:
+                self._status = dict(self._status, state="failed", error=str(e))
+                raise ValueError(f"Model reload failed: {e}") from e
+            self.swap(snapshot)
+            self.source = path
+            self._status = dict(self._status, state="idle")
+        return snapshot
+
+    def reload_async(self, path: Optional[str] = None) -> threading.Thread:
+        """Run `reload(path)` on a background thread; the outcome is reported by `status()`."""
+        def run():
+            try:
+                self.reload(path)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+
+        thread = threading.Thread(target=run, name="model-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self.current
+        return {
+            "version_id": snapshot.version_id,
+            "source": snapshot.source,
+            "loaded_at": snapshot.loaded_at,
+            "diseases": len(snapshot.model.diseases),
+            "symptoms": len(snapshot.model.symptoms),
+            "last_reload": dict(self._status)
+        }
+
+
+class ModelFileWatcher:
+    def __init__(self, manager: ModelManager, path: str, interval: float = DEFAULT_WATCH_INTERVAL):
+        """
+        Reload `manager` whenever the file at `path` changes. Polls its size,
+        mtime and inode, so an artifact replaced with os.replace() (as
+        write_artifact does) is picked up within `interval` seconds.
+        """
+        self.manager = manager
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._signature = self._stat()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def start(self) -> "ModelFileWatcher":
+        self._thread.start()
+        return self
+
+    def check(self) -> bool:
+        """Reload if the file changed since the last check; returns whether a new model was published."""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            self.manager.reload(self.path)
+        except ValueError as e:
+            # Keep serving the current model; a later change is retried
+            print(e, file=sys.stderr)
+            return False
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,185 @@
+"""
+Parallel Batch Inference
+Shards large predict_batch() calls across a pool of worker processes.
+
+The model's compiled factor tables are copied once into a
+`multiprocessing.shared_memory` block; every worker maps that block read-only
+and wraps it in an artifact-backed BayesianDiseaseModel, so only the cases and
+results cross process boundaries. When the model is recompiled or replaced
+(its `version` changes) the tables are republished and the pool restarted.
+
+Spawned workers re-import the parent's `__main__` module. A server launched as
+a script (`python app.py`) calls `isolate_workers_from_main()` first, so the
+workers import this module in its place instead of repeating the server setup.
+"""
+
+import importlib.util
+import math
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bayesian_model import BayesianDiseaseModel, SymptomOverlay
+from model_artifact import ALIGNMENT, ModelArtifact
+
+# Batches smaller than this are scored in-process; shards are never smaller
+MIN_SHARD_SIZE = 2048
+# Shards per worker, so a slow shard does not leave the other workers idle
+SHARDS_PER_WORKER = 2
+
+# Worker process state, set by _attach()
+_worker_memory = None
+_worker_model = None
+
+
+def _attach(descriptor: Dict[str, Any]):
+    """Pool initializer: map the shared tables and build a model over them."""
+    global _worker_memory, _worker_model
+    _worker_memory = shared_memory.SharedMemory(name=descriptor["name"])
+    shape = tuple(descriptor["shape"])
+    arrays = {}
+    for name, offset in descriptor["offsets"].items():
+        array = np.ndarray(shape, dtype=np.float64, buffer=_worker_memory.buf, offset=offset)
+        array.flags.writeable = False
+        arrays[name] = array
+    artifact = ModelArtifact(descriptor["header"], arrays)
+    _worker_model = BayesianDiseaseModel(inference=descriptor["inference"], cache_size=0, artifact=artifact)
+    # Overlays are checked against the version of the model they were built for
+    _worker_model.version = descriptor["version"]
+
+
+def isolate_workers_from_main():
+    """
+    Make worker processes import this module as their `__main__` instead of
+    the script the parent was started from, which would otherwise load the
+    model, open the store and start background threads again in every worker.
+    Call from the script's `if __name__ == '__main__':` block before serving.
+    """
+    # multiprocessing re-imports __main__ by its spec name when it has one
+    sys.modules['__main__'].__spec__ = importlib.util.find_spec(__name__)
+
+
+def _predict_shard(cases: List[Dict[str, str]], top_k: int, allowed_symptoms,
+                   overlay: Optional[SymptomOverlay]) -> List[Dict[str, Any]]:
+    return _worker_model.predict_batch(cases, top_k=top_k, allowed_symptoms=allowed_symptoms, overlay=overlay)
+
+
+class ParallelBatchExecutor:
+    def __init__(self, model: BayesianDiseaseModel, workers: Optional[int] = None,
+                 min_shard_size: int = MIN_SHARD_SIZE):
+        """
+        Process-parallel front end for `model.predict_batch()`.
+
+        The pool and shared tables are created on the first batch large enough
+        to shard, and recreated after the model changes.
+
+        Args:
+            model: A numpy-backend model, or a proxy resolving to the model
+                currently served
+            workers: Worker processes; defaults to the number of CPUs
+            min_shard_size: Smallest number of cases sent to one worker
+        """
+        if model.backend != "numpy":
+            raise ValueError("Parallel batch inference requires the numpy backend")
+        self.model = model
+        self.workers = workers or os.cpu_count() or 1
+        self.min_shard_size = min_shard_size
+        self._lock = threading.Lock()
+        self._pool = None
+        self._memory = None
+        self._version = None
+
+    def _publish(self, model: BayesianDiseaseModel):
+        """Copy the model's tables into a fresh shared-memory block and start a pool on it."""
+        self._shutdown()
+        tables = {"factor_rows": model._factor_rows, "log_factor_rows": model._log_factor_rows}
+        offsets, size = {}, 0
+        for name, table in tables.items():
+            offsets[name] = size
+            size = (size + table.nbytes + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+        self._memory = shared_memory.SharedMemory(create=True, size=size)
+        for name, table in tables.items():
+            np.ndarray(table.shape, dtype=np.float64, buffer=self._memory.buf, offset=offsets[name])[...] = table
+
+        descriptor = {
+            "name": self._memory.name,
+            "shape": list(model._factor_rows.shape),
+            "offsets": offsets,
+            "header": {
+                "diseases": model.diseases,
+                "symptoms": model.symptoms,
+                "severity_levels": model.severity_levels,
+                "smoothing": model.smoothing
+            },
+            "inference": model.inference,
+            "version": model.version
+        }
+        # Spawned workers do not inherit the server's threads or open sockets
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_attach, initargs=(descriptor,))
+        self._version = model.version
+
+    def predict_batch(self, cases: List[Dict[str, str]], top_k: int = 1, allowed_symptoms=None,
+                      overlay: Optional[SymptomOverlay] = None) -> List[Dict[str, Any]]:
+        """
+        Same contract as BayesianDiseaseModel.predict_batch(); results are in
+        input order.
+        """
+        n_shards = min(self.workers * SHARDS_PER_WORKER, len(cases) // self.min_shard_size)
+        if n_shards < 2:
+            return self.model.predict_batch(cases, top_k=top_k, allowed_symptoms=allowed_symptoms, overlay=overlay)
+
+        model = self.model
+        allowed_symptoms = set(allowed_symptoms) if allowed_symptoms else None
+        shard_size = math.ceil(len(cases) / n_shards)
+        with self._lock:
+            if self._version is not None and model.version < self._version:
+                # A model older than the published one (a request still pinned
+                # to a replaced snapshot): score in-process instead of
+                # republishing its tables
+                stale = True
+            else:
+                stale = False
+                if self._pool is None or self._version != model.version:
+                    self._publish(model)
+                # Submitted under the lock, so a republish cannot shut the pool down in between
+                futures = [
+                    self._pool.submit(_predict_shard, cases[start:start + shard_size], top_k, allowed_symptoms, overlay)
+                    for start in range(0, len(cases), shard_size)
+                ]
+        if stale:
+            return model.predict_batch(cases, top_k=top_k, allowed_symptoms=allowed_symptoms, overlay=overlay)
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def _shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    def close(self):
+        """Stop the worker processes and release the shared tables."""
+        with self._lock:
+            self._shutdown()
+
+    def reset(self, model_version: int):
+        """
+        Release the pool and tables after the served model was replaced. Until
+        the next batch republishes them, models older than `model_version` are
+        scored in-process.
+        """
+        with self._lock:
+            self._shutdown()
+            self._version = model_version
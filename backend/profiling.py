@@ -0,0 +1,222 @@
+"""
+Request Profiling
+Opt-in cProfile profiling of individual requests, as WSGI middleware.
+
+A request is profiled when it carries the profiling token in its
+`X-Profile-Token` header, or when it is picked by random sampling (a rate
+between 0 and 1, for the paths in `sample_paths`). Each profile is kept in a
+bounded ring buffer as:
+
+    collapsed   "outer;inner;leaf <microseconds>" lines, the input format of
+                flamegraph.pl, speedscope and similar tools
+    stats       the top of the pstats report, by cumulative time
+
+cProfile records a call graph rather than full stacks, so collapsed stacks
+are reconstructed from it: a function's time is split between its callers in
+proportion to the time each of them spent calling it.
+
+One request per process is profiled at a time, across all profilers, since
+from Python 3.12 only one cProfile profiler can be active in a process.
+Requests arriving while the slot is busy, or while another tool holds the
+profiling hook, run normally, so the profiler is safe to enable under live
+traffic. With no token and a zero sampling rate, a request costs one
+attribute check.
+"""
+
+import cProfile
+import hmac
+import io
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+TOKEN_HEADER = "HTTP_X_PROFILE_TOKEN"
+DEFAULT_BUFFER_SIZE = 32
+DEFAULT_SAMPLE_PATHS = ("/api/predict", "/api/batch-predict")
+# Requests under this prefix (the profile endpoints themselves) are never profiled
+ADMIN_PREFIX = "/admin/"
+# Lines of the pstats report kept per profile
+STATS_LINES = 40
+# Stacks deeper than this, or cheaper than this many microseconds, are folded into their parent
+MAX_STACK_DEPTH = 64
+MIN_STACK_MICROSECONDS = 1
+
+# Held while a request is being profiled; shared by every RequestProfiler
+_profiling_slot = threading.Lock()
+
+
+def _frame_name(func: Tuple[str, int, str]) -> str:
+    filename, _, name = func
+    if filename == "~":
+        return name  # built-in, e.g. "<method 'argsort' of 'numpy.ndarray' objects>"
+    # Parent directory too, to tell flask/app.py from backend/app.py
+    directory, basename = os.path.split(filename)
+    return f"{os.path.basename(directory)}/{basename}:{name}"
+
+
+def collapsed_stacks(stats: Dict[Tuple, Tuple]) -> List[str]:
+    """
+    Rebuild collapsed stacks from `pstats.Stats.stats`.
+
+    Returns:
+        "frame;frame;frame <microseconds of self time>" lines, heaviest first
+    """
+    children: Dict[Tuple, List[Tuple[Tuple, float]]] = {}
+    roots = []
+    for func, (_, _, _, _, callers) in stats.items():
+        known_callers = [caller for caller in callers if caller in stats]
+        for caller in known_callers:
+            children.setdefault(caller, []).append((func, callers[caller][3]))
+        if not known_callers:
+            roots.append(func)
+
+    totals: Dict[str, float] = {}
+
+    def expand(func, path: List[str], share: float, seen: frozenset):
+        _, _, self_time, cumulative, _ = stats[func]
+        path = path + [_frame_name(func)]
+        key = ";".join(path)
+        totals[key] = totals.get(key, 0.0) + self_time * share
+        if len(path) >= MAX_STACK_DEPTH:
+            # Fold the rest of the subtree into this frame
+            totals[key] += (cumulative - self_time) * share
+            return
+        for callee, edge_cumulative in children.get(func, ()):
+            callee_cumulative = stats[callee][3]
+            if callee in seen or not callee_cumulative or edge_cumulative * share * 1e6 < MIN_STACK_MICROSECONDS:
+                continue
+            expand(callee, path, share * edge_cumulative / callee_cumulative, seen | {callee})
+
+    for root in roots:
+        expand(root, [], 1.0, frozenset((root,)))
+
+    weighted = sorted(((round(seconds * 1e6), stack) for stack, seconds in totals.items()), reverse=True)
+    return [f"{stack} {microseconds}" for microseconds, stack in weighted if microseconds > 0]
+
+
+def _stats_report(profiler: cProfile.Profile) -> str:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(STATS_LINES)
+    return out.getvalue()
+
+
+class RequestProfiler:
+    def __init__(self, wsgi_app, token: Optional[str] = None, sample_rate: float = 0.0,
+                 sample_paths: Iterable[str] = DEFAULT_SAMPLE_PATHS, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        """
+        Wrap a WSGI app so selected requests run under cProfile.
+
+        Args:
+            wsgi_app: The WSGI callable to wrap
+            token: Secret that selects a request for profiling via the
+                X-Profile-Token header and guards the admin endpoints; None
+                disables both
+            sample_rate: Fraction of requests to `sample_paths` profiled at random
+            sample_paths: Paths eligible for sampling
+            buffer_size: Profiles kept; the oldest are dropped first
+        """
+        self.wsgi_app = wsgi_app
+        self.token = token or None
+        self.sample_paths = frozenset(sample_paths)
+        self.profiles = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.skipped = 0
+        self.sample_rate = 0.0
+        self.set_sample_rate(sample_rate)
+
+    def set_sample_rate(self, rate: float) -> None:
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError("Sample rate must be between 0 and 1")
+        self.sample_rate = rate
+        self.enabled = self.token is not None or rate > 0
+
+    def authorized(self, environ: Dict[str, Any]) -> bool:
+        """Whether `environ` carries the profiling token."""
+        supplied = environ.get(TOKEN_HEADER)
+        return self.token is not None and supplied is not None and hmac.compare_digest(supplied, self.token)
+
+    def _trigger(self, environ: Dict[str, Any]) -> Optional[str]:
+        if environ.get("PATH_INFO", "").startswith(ADMIN_PREFIX):
+            return None
+        if self.authorized(environ):
+            return "header"
+        if self.sample_rate > 0 and environ.get("PATH_INFO") in self.sample_paths and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def __call__(self, environ, start_response):
+        if not self.enabled:
+            return self.wsgi_app(environ, start_response)
+        trigger = self._trigger(environ)
+        if trigger is None:
+            return self.wsgi_app(environ, start_response)
+        if not _profiling_slot.acquire(blocking=False):
+            self.skipped += 1
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self._profile(environ, start_response, trigger)
+        finally:
+            _profiling_slot.release()
+
+    def _profile(self, environ, start_response, trigger: str):
+        status = []
+
+        def record_status(status_line, headers, exc_info=None):
+            status[:] = [status_line]
+            return start_response(status_line, headers, exc_info)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler, e.g. a debugger, holds the process-wide hook
+            self.skipped += 1
+            return self.wsgi_app(environ, start_response)
+        started = time.time()
+        wall = time.perf_counter()
+        # Streamed response bodies are produced after this returns and are not profiled
+        try:
+            response = self.wsgi_app(environ, record_status)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - wall
+            stats = pstats.Stats(profiler).stats
+            profile = {
+                "id": next(self._ids),
+                "method": environ.get("REQUEST_METHOD"),
+                "path": environ.get("PATH_INFO"),
+                "status": int(status[0].split(" ", 1)[0]) if status else None,
+                "trigger": trigger,
+                "started_at": started,
+                "duration_ms": round(duration * 1000, 3),
+                "collapsed": collapsed_stacks(stats),
+                "stats": _stats_report(profiler)
+            }
+            with self._lock:
+                self.profiles.append(profile)
+        return response
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """Buffered profiles without their stacks, newest first."""
+        with self._lock:
+            profiles = list(self.profiles)
+        return [
+            {key: value for key, value in profile.items() if key not in ("collapsed", "stats")}
+            for profile in reversed(profiles)
+        ]
+
+    def get(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for profile in self.profiles:
+                if profile["id"] == profile_id:
+                    return profile
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self.profiles.clear()
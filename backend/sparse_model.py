@@ -0,0 +1,122 @@
+"""
+Sparse Likelihoods
+Sparse log-likelihood tables for catalogues with thousands of diseases, where
+most (disease, symptom) pairs simply follow a per-symptom background
+distribution.
+
+Only deviations from the background are stored, as log-likelihood ratios in a
+CSR table indexed by factor row (see `bayesian_model.compile_factor_rows`).
+Because the background factor of a reported symptom is the same for every
+disease, it cancels in normalization:
+
+    log P(d | evidence) = log P(d) + sum over reported (s, l) linked to d of
+                          log P(l | d, s) - log P_background(l | s) + const
+
+so a top-k prediction touches only the diseases linked to a reported symptom
+(the candidates). All other diseases keep their prior score: they enter the
+normalizer through their total prior mass and the ranking through a
+precomputed prior order.
+
+`BayesianDiseaseModel(inference="log", sparse=True)` builds these tables from
+its smoothed log-CPT and scores predict() calls through them.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+# Largest |log-likelihood ratio| of a (disease, symptom) pair still treated as
+# the background; 0 keeps every deviation, so scores match dense log inference
+DEFAULT_TOLERANCE = 0.0
+
+
+class SparseLikelihoods:
+    def __init__(self, log_prior, log_cpt_array, tolerance: float = DEFAULT_TOLERANCE):
+        """
+        Sparsify a smoothed log-CPT.
+
+        The background of each symptom is the per-severity median across
+        diseases, i.e. the distribution most diseases share when most of
+        them follow a default. A pair is linked when any of its severities
+        deviates from the background by more than `tolerance`.
+
+        Args:
+            log_prior: Log prior per disease
+            log_cpt_array: (diseases x symptoms x severity_levels) smoothed log-CPT
+            tolerance: See DEFAULT_TOLERANCE
+
+        Raises:
+            ValueError: If a table holds -inf (log-CPTs built with smoothing=0)
+        """
+        if not (np.isfinite(log_prior).all() and np.isfinite(log_cpt_array).all()):
+            raise ValueError("Sparse inference requires positive priors and smoothing")
+        n_diseases, n_symptoms, n_levels = log_cpt_array.shape
+        self.n_diseases = n_diseases
+        self.log_prior = np.asarray(log_prior, dtype=float)
+        self.prior = np.exp(self.log_prior)
+        self._prior_total = float(self.prior.sum())
+        # Diseases by descending prior: the ranking of every non-candidate
+        self._prior_order = np.argsort(-self.log_prior, kind="stable")
+
+        # CSR layout over factor rows: entries of row r are [indptr[r], indptr[r + 1]).
+        # Row 0 (the prior) and the pad row stay empty.
+        counts = np.zeros(1 + n_symptoms * n_levels + 1, dtype=np.intp)
+        disease_ids, log_ratios = [], []
+        for s in range(n_symptoms):
+            column = log_cpt_array[:, s, :]
+            ratios = column - np.median(column, axis=0)
+            linked = np.abs(ratios).max(axis=1) > tolerance
+            for l in range(n_levels):
+                members = np.flatnonzero(linked & (ratios[:, l] != 0.0))
+                counts[1 + s * n_levels + l] = len(members)
+                disease_ids.append(members)
+                log_ratios.append(ratios[members, l])
+        self._indptr = np.concatenate(([0], np.cumsum(counts)))
+        self._disease_ids = np.concatenate(disease_ids).astype(np.intp)
+        self._log_ratios = np.concatenate(log_ratios)
+
+    @property
+    def n_links(self) -> int:
+        """Number of stored (disease, symptom, severity) deviations."""
+        return len(self._log_ratios)
+
+    def candidates(self, row_ids: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Diseases linked to the given factor rows, ascending, and their
+        log-scores (log prior plus the summed log-likelihood ratios).
+        """
+        indptr = self._indptr
+        spans = [np.arange(indptr[row], indptr[row + 1]) for row in row_ids]
+        entries = np.concatenate(spans) if spans else np.empty(0, dtype=np.intp)
+        candidates, inverse = np.unique(self._disease_ids[entries], return_inverse=True)
+        ratio_sums = np.bincount(inverse, weights=self._log_ratios[entries], minlength=len(candidates))
+        return candidates, self.log_prior[candidates] + ratio_sums
+
+    def posterior(self, row_ids: List[int]):
+        """Normalized posterior over every disease, in disease order."""
+        candidates, scores = self.candidates(row_ids)
+        log_posterior = self.log_prior.copy()
+        log_posterior[candidates] = scores
+        posterior = np.exp(log_posterior - log_posterior.max())
+        return posterior / posterior.sum()
+
+    def top_k(self, row_ids: List[int], k: int) -> Tuple[List[int], List[float]]:
+        """
+        The k most probable diseases and their posterior probabilities, ranked
+        like a stable descending sort (ties go to the lower index). Costs
+        O(candidates + k) rather than O(diseases).
+        """
+        candidates, scores = self.candidates(row_ids)
+        # The best non-candidates are the first ones in prior order
+        head = self._prior_order[:k + len(candidates)]
+        others = head[~np.isin(head, candidates, assume_unique=True)][:k]
+        other_mass = max(self._prior_total - float(self.prior[candidates].sum()), 0.0)
+
+        peak = max(scores.max(initial=-np.inf), self.log_prior[others[0]] if len(others) else -np.inf)
+        weights = np.exp(scores - peak)
+        normalizer = float(weights.sum()) + other_mass * float(np.exp(-peak))
+
+        indices = np.concatenate((candidates, others))
+        probabilities = np.concatenate((weights, self.prior[others] * np.exp(-peak))) / normalizer
+        order = np.lexsort((indices, -probabilities))[:k]
+        return indices[order].tolist(), probabilities[order].tolist()
@@ -0,0 +1,608 @@
+"""
+Storage
+Pluggable persistence for users, login sessions, prediction history, custom
+symptoms and interactive diagnosis sessions. `MemoryStore` keeps everything in process (the original
+behaviour); `SQLiteStore` keeps it in one SQLite database in WAL mode, so any
+number of gunicorn workers share consistent state and worker memory stays
+bounded.
+"""
+
+import heapq
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Login tokens expire after this many idle seconds; each use extends them
+DEFAULT_SESSION_TTL = 7 * 24 * 3600
+# Creating more tokens than this for one user evicts their least recently used
+DEFAULT_MAX_SESSIONS_PER_USER = 10
+# SQLiteStore writes a token's extended expiry at most this often (seconds)
+SESSION_TOUCH_INTERVAL = 60
+# Diagnosis sessions expire after this many seconds without an update
+PREDICTION_SESSION_TTL = 24 * 3600
+# Diagnosis sessions MemoryStore keeps; the least recently updated go first
+MAX_PREDICTION_SESSIONS = 10000
+
+
+class Store:
+    """Interface shared by the storage backends."""
+
+    def get_user(self, username: str) -> Optional[Dict[str, str]]:
+        """Return {"password", "name"} for `username`, or None."""
+        raise NotImplementedError
+
+    def add_user(self, username: str, password: str, name: str) -> bool:
+        """Create a user; returns False if the username is taken."""
+        raise NotImplementedError
+
+    def create_session(self, token: str, username: str) -> None:
+        """
+        Record a login token for `username`, evicting the user's least
+        recently used token if they are at the per-user cap.
+        """
+        raise NotImplementedError
+
+    def session_user(self, token: str) -> Optional[str]:
+        """
+        Return the username a live token was issued to, or None. A successful
+        lookup extends the token's expiry (sliding expiry).
+        """
+        raise NotImplementedError
+
+    def session_stats(self) -> Dict[str, Any]:
+        """Return the live token count and expiry/eviction counters."""
+        raise NotImplementedError
+
+    def sizes(self) -> Dict[str, int]:
+        """Return the number of users, history entries, custom symptoms and diagnosis sessions stored."""
+        raise NotImplementedError
+
+    def history_page(self, username: str, limit: int,
+                     before: Optional[int] = None) -> Tuple[List[Tuple[int, Any]], Optional[int]]:
+        """
+        Return up to `limit` of the user's history entries, newest first.
+
+        Args:
+            username: Owner of the history
+            limit: Maximum number of entries returned
+            before: Only return entries with an id below this one
+
+        Returns:
+            (list of (entry id, entry), `before` value for the next page or
+            None when there are no older entries)
+        """
+        raise NotImplementedError
+
+    def add_history(self, username: str, entry: Any, retention: Optional[int] = None) -> None:
+        """
+        Append a (JSON-serializable) history entry, then drop the user's
+        oldest entries beyond the newest `retention` (if given).
+        """
+        raise NotImplementedError
+
+    def custom_symptoms(self, username: str) -> List[str]:
+        """Return the user's custom symptoms in the order they were added."""
+        raise NotImplementedError
+
+    def add_custom_symptom(self, username: str, symptom: str) -> bool:
+        """Add a custom symptom; returns False if the user already has it."""
+        raise NotImplementedError
+
+    def remove_custom_symptom(self, username: str, symptom: str) -> bool:
+        """Remove a custom symptom; returns False if the user did not have it."""
+        raise NotImplementedError
+
+    def save_prediction_session(self, session_id: str, username: Optional[str], evidence: Dict[str, str]) -> None:
+        """
+        Create or replace a diagnosis session's evidence. Each save restarts
+        its PREDICTION_SESSION_TTL.
+
+        Args:
+            session_id: The session's id
+            username: The signed-in user who started it, if any
+            evidence: Reported symptoms and their severities
+        """
+        raise NotImplementedError
+
+    def prediction_session(self, session_id: str) -> Optional[Tuple[Optional[str], Dict[str, str]]]:
+        """Return (username, evidence) of a live diagnosis session, or None."""
+        raise NotImplementedError
+
+    def delete_prediction_session(self, session_id: str) -> bool:
+        """End a diagnosis session; returns False if there was no live one."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release any resources held by the store."""
+
+
+class SessionTable:
+    def __init__(self, ttl: float = DEFAULT_SESSION_TTL, max_per_user: int = DEFAULT_MAX_SESSIONS_PER_USER,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        In-memory login tokens with sliding expiry.
+
+        Expired tokens are swept from a min-heap of expiry times on every
+        call. Lookups extend a token's expiry without touching the heap, so a
+        popped entry whose token was used since is pushed back with its
+        current expiry; each token has one heap entry, and entries left
+        behind by evicted tokens are compacted away once they dominate.
+
+        Args:
+            ttl: Idle seconds after which a token expires
+            max_per_user: Tokens kept per user; extra logins evict the least
+                recently used one
+            clock: Monotonic time source
+        """
+        if ttl <= 0 or max_per_user < 1:
+            raise ValueError("Session TTL and per-user cap must be positive")
+        self.ttl = ttl
+        self.max_per_user = max_per_user
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._owners: Dict[str, str] = {}
+        self._expiry: Dict[str, float] = {}
+        # Per-user tokens, least recently used first
+        self._user_tokens: Dict[str, OrderedDict] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, token: str, username: str) -> None:
+        with self._lock:
+            now = self._clock()
+            self._sweep(now)
+            tokens = self._user_tokens.setdefault(username, OrderedDict())
+            while len(tokens) >= self.max_per_user:
+                self._remove(next(iter(tokens)))
+                self.evicted += 1
+            tokens[token] = None
+            self._owners[token] = username
+            self._expiry[token] = now + self.ttl
+            heapq.heappush(self._heap, (now + self.ttl, token))
+            if len(self._heap) > 2 * len(self._expiry) + 64:
+                self._heap = [(expiry, token) for token, expiry in self._expiry.items()]
+                heapq.heapify(self._heap)
+
+    def lookup(self, token: str) -> Optional[str]:
+        with self._lock:
+            now = self._clock()
+            self._sweep(now)
+            username = self._owners.get(token)
+            if username is not None:
+                self._expiry[token] = now + self.ttl
+                self._user_tokens[username].move_to_end(token)
+            return username
+
+    def _sweep(self, now: float):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, token = heapq.heappop(heap)
+            expiry = self._expiry.get(token)
+            if expiry is None:
+                continue  # evicted earlier
+            if expiry > now:
+                heapq.heappush(heap, (expiry, token))
+            else:
+                self._remove(token)
+                self.expired += 1
+
+    def _remove(self, token: str):
+        username = self._owners.pop(token)
+        del self._expiry[token]
+        tokens = self._user_tokens[username]
+        del tokens[token]
+        if not tokens:
+            del self._user_tokens[username]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._sweep(self._clock())
+            return {
+                "live": len(self._owners),
+                "users": len(self._user_tokens),
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "ttl": self.ttl,
+                "max_per_user": self.max_per_user
+            }
+
+
+class MemoryStore(Store):
+    def __init__(self, session_ttl: float = DEFAULT_SESSION_TTL,
+                 max_sessions_per_user: int = DEFAULT_MAX_SESSIONS_PER_USER):
+        """Process-local store backed by dicts."""
+        self._lock = threading.Lock()
+        self._users: Dict[str, Dict[str, str]] = {}
+        self._sessions = SessionTable(session_ttl, max_sessions_per_user)
+        # Per-user (entry id, entry) lists in ascending id order
+        self._histories: Dict[str, List[Tuple[int, Any]]] = {}
+        self._next_history_id = 1
+        self._custom_symptoms: Dict[str, List[str]] = {}
+        # session id -> (username, evidence, expiry), least recently saved first
+        self._prediction_sessions: OrderedDict = OrderedDict()
+
+    def get_user(self, username: str) -> Optional[Dict[str, str]]:
+        user = self._users.get(username)
+        return dict(user) if user else None
+
+    def add_user(self, username: str, password: str, name: str) -> bool:
+        with self._lock:
+            if username in self._users:
+                return False
+            self._users[username] = {"password": password, "name": name}
+            return True
+
+    def create_session(self, token: str, username: str) -> None:
+        self._sessions.create(token, username)
+
+    def session_user(self, token: str) -> Optional[str]:
+        return self._sessions.lookup(token)
+
+    def session_stats(self) -> Dict[str, Any]:
+        return self._sessions.stats()
+
+    def sizes(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "history_entries": sum(len(entries) for entries in self._histories.values()),
+                "custom_symptoms": sum(len(symptoms) for symptoms in self._custom_symptoms.values()),
+                "prediction_sessions": len(self._prediction_sessions)
+            }
+
+    def history_page(self, username: str, limit: int,
+                     before: Optional[int] = None) -> Tuple[List[Tuple[int, Any]], Optional[int]]:
+        with self._lock:
+            entries = self._histories.get(username, [])
+            end = len(entries) if before is None else bisect_left(entries, (before,))
+            page = entries[max(end - limit, 0):end][::-1]
+        return page, (page[-1][0] if page and end > limit else None)
+
+    def add_history(self, username: str, entry: Any, retention: Optional[int] = None) -> None:
+        with self._lock:
+            entries = self._histories.setdefault(username, [])
+            entries.append((self._next_history_id, entry))
+            self._next_history_id += 1
+            if retention is not None and len(entries) > retention:
+                del entries[:len(entries) - retention]
+
+    def custom_symptoms(self, username: str) -> List[str]:
+        return list(self._custom_symptoms.get(username, []))
+
+    def add_custom_symptom(self, username: str, symptom: str) -> bool:
+        with self._lock:
+            current = self._custom_symptoms.setdefault(username, [])
+            if symptom in current:
+                return False
+            current.append(symptom)
+            return True
+
+    def remove_custom_symptom(self, username: str, symptom: str) -> bool:
+        with self._lock:
+            current = self._custom_symptoms.get(username, [])
+            if symptom not in current:
+                return False
+            current.remove(symptom)
+            return True
+
+    def save_prediction_session(self, session_id: str, username: Optional[str], evidence: Dict[str, str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            sessions = self._prediction_sessions
+            sessions[session_id] = (username, dict(evidence), now + PREDICTION_SESSION_TTL)
+            sessions.move_to_end(session_id)
+            # Saves come in expiry order, so expired sessions are at the front
+            while len(sessions) > MAX_PREDICTION_SESSIONS or next(iter(sessions.values()))[2] <= now:
+                sessions.popitem(last=False)
+
+    def prediction_session(self, session_id: str) -> Optional[Tuple[Optional[str], Dict[str, str]]]:
+        with self._lock:
+            stored = self._prediction_sessions.get(session_id)
+            if stored is None or stored[2] <= time.monotonic():
+                return None
+            return stored[0], dict(stored[1])
+
+    def delete_prediction_session(self, session_id: str) -> bool:
+        with self._lock:
+            stored = self._prediction_sessions.pop(session_id, None)
+        return stored is not None and stored[2] > time.monotonic()
+
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS custom_symptoms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    symptom TEXT NOT NULL,
+    UNIQUE (username, symptom)
+);
+CREATE TABLE IF NOT EXISTS prediction_sessions (
+    id TEXT PRIMARY KEY,
+    username TEXT,
+    evidence TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Columns added after a table was first released: (table, column, definition)
+_MIGRATIONS = (
+    ("sessions", "expires_at", "REAL NOT NULL DEFAULT 0"),
+)
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS sessions_username_expires_at ON sessions (username, expires_at);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+CREATE INDEX IF NOT EXISTS history_username_id ON history (username, id);
+CREATE INDEX IF NOT EXISTS history_created_at ON history (created_at);
+CREATE INDEX IF NOT EXISTS prediction_sessions_expires_at ON prediction_sessions (expires_at);
+"""
+
+
+_MAX_ROW_ID = 2 ** 63 - 1
+
+
+class SQLiteStore(Store):
+    def __init__(self, path: str, pool_size: int = 8, timeout: float = 30.0,
+                 session_ttl: float = DEFAULT_SESSION_TTL,
+                 max_sessions_per_user: int = DEFAULT_MAX_SESSIONS_PER_USER):
+        """
+        SQLite-backed store.
+
+        Connections are pooled per process and reopened after a fork. Every
+        query is a constant SQL string, so each connection compiles it once
+        and reuses the prepared statement from its statement cache.
+
+        Login tokens carry an indexed expiry time. Expired tokens are swept
+        with one range delete on each login, and lookups write an extended
+        expiry at most every SESSION_TOUCH_INTERVAL seconds.
+
+        Args:
+            path: Database file; created with the schema if missing
+            pool_size: Maximum number of idle connections kept open
+            timeout: Seconds to wait for a database lock
+            session_ttl: Idle seconds after which a login token expires
+            max_sessions_per_user: Tokens kept per user
+        """
+        if session_ttl <= 0 or max_sessions_per_user < 1:
+            raise ValueError("Session TTL and per-user cap must be positive")
+        self.path = path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session_ttl = session_ttl
+        self.max_sessions_per_user = max_sessions_per_user
+        self.sessions_expired = 0
+        self.sessions_evicted = 0
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._pid = os.getpid()
+        with self._connection() as connection:
+            connection.executescript(_TABLES)
+            for table, column, definition in _MIGRATIONS:
+                columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            connection.executescript(_INDEXES)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                     check_same_thread=False, cached_statements=64)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        if self._pid != os.getpid():
+            # Connections must not cross a fork: start a fresh pool in the child
+            self._pool = queue.LifoQueue(maxsize=self.pool_size)
+            self._pid = os.getpid()
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+    def get_user(self, username: str) -> Optional[Dict[str, str]]:
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT password, name FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return {"password": row[0], "name": row[1]} if row else None
+
+    def add_user(self, username: str, password: str, name: str) -> bool:
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO users (username, password, name) VALUES (?, ?, ?)",
+                (username, password, name)
+            )
+        return cursor.rowcount == 1
+
+    def create_session(self, token: str, username: str) -> None:
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                expired = connection.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+                # Least recently used = earliest expiry, since expiry slides with use
+                evicted = connection.execute(
+                    "DELETE FROM sessions WHERE token IN (SELECT token FROM sessions WHERE username = ? "
+                    "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (username, self.max_sessions_per_user - 1)
+                ).rowcount
+                connection.execute(
+                    "INSERT INTO sessions (token, username, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (token, username, now, now + self.session_ttl)
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        self.sessions_expired += expired
+        self.sessions_evicted += evicted
+
+    def session_user(self, token: str) -> Optional[str]:
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute("SELECT username, expires_at FROM sessions WHERE token = ?", (token,)).fetchone()
+            if row is None or row[1] <= now:
+                return None
+            if row[1] < now + self.session_ttl - SESSION_TOUCH_INTERVAL:
+                connection.execute("UPDATE sessions SET expires_at = ? WHERE token = ?", (now + self.session_ttl, token))
+        return row[0]
+
+    def session_stats(self) -> Dict[str, Any]:
+        with self._connection() as connection:
+            live, users = connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT username) FROM sessions WHERE expires_at > ?", (time.time(),)
+            ).fetchone()
+        return {
+            "live": live,
+            "users": users,
+            # Counted by this worker only
+            "expired": self.sessions_expired,
+            "evicted": self.sessions_evicted,
+            "ttl": self.session_ttl,
+            "max_per_user": self.max_sessions_per_user
+        }
+
+    def sizes(self) -> Dict[str, int]:
+        with self._connection() as connection:
+            users, history_entries, custom_symptoms, prediction_sessions = connection.execute(
+                "SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM history),"
+                " (SELECT COUNT(*) FROM custom_symptoms),"
+                " (SELECT COUNT(*) FROM prediction_sessions WHERE expires_at > ?)", (time.time(),)
+            ).fetchone()
+        return {"users": users, "history_entries": history_entries, "custom_symptoms": custom_symptoms,
+                "prediction_sessions": prediction_sessions}
+
+    def history_page(self, username: str, limit: int,
+                     before: Optional[int] = None) -> Tuple[List[Tuple[int, Any]], Optional[int]]:
+        with self._connection() as connection:
+            # One extra row tells whether an older page exists
+            rows = connection.execute(
+                "SELECT id, entry FROM history WHERE username = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (username, _MAX_ROW_ID if before is None else before, limit + 1)
+            ).fetchall()
+        page = [(row[0], json.loads(row[1])) for row in rows[:limit]]
+        return page, (page[-1][0] if len(rows) > limit else None)
+
+    def add_history(self, username: str, entry: Any, retention: Optional[int] = None) -> None:
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT INTO history (username, created_at, entry) VALUES (?, ?, ?)",
+                    (username, time.time(), json.dumps(entry))
+                )
+                if retention is not None:
+                    # Walks at most `retention` index entries to find the cut-off
+                    connection.execute(
+                        "DELETE FROM history WHERE username = ? AND id <= "
+                        "(SELECT id FROM history WHERE username = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (username, username, retention)
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def custom_symptoms(self, username: str) -> List[str]:
+        with self._connection() as connection:
+            rows = connection.execute(
+                "SELECT symptom FROM custom_symptoms WHERE username = ? ORDER BY id", (username,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add_custom_symptom(self, username: str, symptom: str) -> bool:
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO custom_symptoms (username, symptom) VALUES (?, ?)", (username, symptom)
+            )
+        return cursor.rowcount == 1
+
+    def remove_custom_symptom(self, username: str, symptom: str) -> bool:
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "DELETE FROM custom_symptoms WHERE username = ? AND symptom = ?", (username, symptom)
+            )
+        return cursor.rowcount == 1
+
+    def save_prediction_session(self, session_id: str, username: Optional[str], evidence: Dict[str, str]) -> None:
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("DELETE FROM prediction_sessions WHERE expires_at <= ?", (now,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO prediction_sessions (id, username, evidence, expires_at) VALUES (?, ?, ?, ?)",
+                    (session_id, username, json.dumps(evidence), now + PREDICTION_SESSION_TTL)
+                )
+                # Sessions updated least recently expire first
+                connection.execute(
+                    "DELETE FROM prediction_sessions WHERE id IN "
+                    "(SELECT id FROM prediction_sessions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (MAX_PREDICTION_SESSIONS,)
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def prediction_session(self, session_id: str) -> Optional[Tuple[Optional[str], Dict[str, str]]]:
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT username, evidence FROM prediction_sessions WHERE id = ? AND expires_at > ?",
+                (session_id, time.time())
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def delete_prediction_session(self, session_id: str) -> bool:
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "DELETE FROM prediction_sessions WHERE id = ? AND expires_at > ?", (session_id, time.time())
+            )
+        return cursor.rowcount == 1
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def open_store(path: Optional[str] = None, session_ttl: float = DEFAULT_SESSION_TTL,
+               max_sessions_per_user: int = DEFAULT_MAX_SESSIONS_PER_USER) -> Store:
+    """Return an SQLiteStore for `path`, or a MemoryStore if no path is given."""
+    if path:
+        return SQLiteStore(path, session_ttl=session_ttl, max_sessions_per_user=max_sessions_per_user)
+    return MemoryStore(session_ttl=session_ttl, max_sessions_per_user=max_sessions_per_user)
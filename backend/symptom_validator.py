@@ -0,0 +1,162 @@
+"""
+Symptom Validator
+Precompiled validation of user-defined symptom names: frozen vocabularies,
+compiled regexes and an indexed fuzzy matcher, with memoized verdicts.
+"""
+
+import re
+from difflib import SequenceMatcher
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from prediction_cache import LRUCache
+
+# Words that make a custom symptom medical
+DESCRIPTORS = frozenset({
+    "Pain", "Ache", "Swelling", "Rash", "Numbness", "Itching", "Bleeding",
+    "Cramp", "Stiffness", "Burning", "Tingling", "Weakness", "Fatigue",
+    "Diarrhea", "Vomiting", "Nausea", "Cough", "Fever", "Dizziness",
+    "Shortness", "Breath", "Soreness", "Inflammation"
+})
+
+# Known anatomical/symptom terms; at least one non-descriptor word must match one
+ALLOWED_TERMS = frozenset({
+    # Anatomy
+    "Head", "Scalp", "Face", "Eye", "Ear", "Nose", "Mouth", "Tooth", "Gum", "Throat", "Neck",
+    "Shoulder", "Arm", "Elbow", "Wrist", "Hand", "Finger", "Chest", "Breast", "Back", "Upper", "Lower",
+    "Abdomen", "Stomach", "Hip", "Groin", "Thigh", "Knee", "Calf", "Ankle", "Foot", "Toe", "Spine", "Waist",
+    "Skin", "Joint", "Muscle",
+    # Systems / general
+    "Breathing", "Vision", "Hearing", "Urination", "Bowel", "Sleep", "Appetite"
+})
+
+_WHITESPACE = re.compile(r"\s+")
+_ALLOWED_CHARACTERS = re.compile(r"^[A-Za-z\s\-/]+$")
+
+
+def normalize_symptom(name: str) -> str:
+    return _WHITESPACE.sub(" ", name.strip()).title()
+
+
+class FuzzyIndex:
+    def __init__(self, terms: Iterable[str]):
+        """
+        Index `terms` for closest-match lookups.
+
+        Each term is stored as a row of character counts. A lookup computes
+        difflib's quick_ratio() upper bound for every term in one vectorized
+        pass, then runs SequenceMatcher only on terms that can still beat the
+        best match so far, in descending bound order.
+        """
+        self.terms = sorted(set(terms))
+        self._columns = {char: i for i, char in enumerate(sorted({c for term in self.terms for c in term}))}
+        self._counts = np.zeros((len(self.terms), len(self._columns)), dtype=np.int32)
+        for row, term in enumerate(self.terms):
+            for char in term:
+                self._counts[row, self._columns[char]] += 1
+        self._lengths = np.array([len(term) for term in self.terms], dtype=np.int32)
+
+    def closest(self, word: str, cutoff: float) -> Optional[str]:
+        """
+        Return the same match as difflib.get_close_matches(word, terms, n=1,
+        cutoff=cutoff)[0], or None.
+        """
+        if not self.terms:
+            return None
+        word_counts = np.zeros(len(self._columns), dtype=np.int32)
+        for char in word:
+            column = self._columns.get(char)
+            if column is not None:
+                word_counts[column] += 1
+
+        # quick_ratio() >= ratio(), so terms below the cutoff can be skipped
+        bounds = 2.0 * np.minimum(self._counts, word_counts).sum(axis=1) / (self._lengths + len(word))
+        candidates = np.flatnonzero(bounds >= cutoff)
+        if not len(candidates):
+            return None
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        best = None
+        for row in candidates[np.argsort(-bounds[candidates], kind="stable")].tolist():
+            if best is not None and bounds[row] < best[0]:
+                break
+            term = self.terms[row]
+            matcher.set_seq1(term)
+            score = matcher.ratio()
+            # get_close_matches keeps the largest (score, term) pair
+            if score >= cutoff and (best is None or (score, term) > best):
+                best = (score, term)
+
+        return best[1] if best else None
+
+
+_ALLOWED_TERMS_INDEX = FuzzyIndex(ALLOWED_TERMS)
+
+
+class SymptomValidator:
+    def __init__(self, model_symptoms: Iterable[str], cache_size: int = 4096):
+        """
+        Validator for custom symptom names against a model's symptom catalogue.
+
+        Args:
+            model_symptoms: Built-in symptom names
+            cache_size: Number of memoized verdicts; 0 disables memoization
+        """
+        self.model_symptoms = frozenset(model_symptoms)
+        self._symptom_index = FuzzyIndex(self.model_symptoms)
+        self._cache = LRUCache(cache_size)
+
+    def validate(self, symptom: str) -> Tuple[bool, str, str]:
+        """
+        Validate a custom symptom name.
+
+        Returns:
+            (is_valid, error message, normalized or suggested symptom)
+        """
+        if not symptom or not isinstance(symptom, str):
+            return False, "Symptom must be a non-empty string", ""
+        verdict = self._cache.get(symptom)
+        if verdict is None:
+            verdict = self._validate(symptom)
+            self._cache.put(symptom, verdict)
+        return verdict
+
+    def _validate(self, symptom: str) -> Tuple[bool, str, str]:
+        normalized = normalize_symptom(symptom)
+        if not _ALLOWED_CHARACTERS.match(normalized):
+            return False, "Only letters, spaces, hyphen and slash are allowed", ""
+
+        # Already exists in model
+        if normalized in self.model_symptoms:
+            return False, "Symptom already exists in the system", normalized
+
+        # Basic quality checks for custom symptoms
+        tokens = [t for t in _WHITESPACE.split(normalized) if t]
+        if len(tokens) < 2:
+            return False, "Please provide a more descriptive symptom (e.g., 'Back Pain').", ""
+        if any(len(t) < 3 for t in tokens):
+            return False, "Each word should have at least 3 letters.", ""
+
+        # Require a medical descriptor to avoid nonsense terms
+        if not any(t in DESCRIPTORS for t in tokens):
+            return False, "Please end with a medical descriptor like 'Pain', 'Rash', 'Swelling', etc.", ""
+
+        # At least one non-descriptor token should be a known anatomical/symptom term
+        non_descriptor_tokens = [t for t in tokens if t not in DESCRIPTORS]
+        has_known_term = any(
+            t in ALLOWED_TERMS or _ALLOWED_TERMS_INDEX.closest(t, 0.85) is not None
+            for t in non_descriptor_tokens
+        )
+        if not has_known_term:
+            close_any = _ALLOWED_TERMS_INDEX.closest(non_descriptor_tokens[0], 0.7) if non_descriptor_tokens else None
+            hint = f" Did you mean '{close_any}'?" if close_any else ""
+            return False, "Please use a recognizable body area or symptom term." + hint, ""
+
+        # Suggest closest existing symptom if typo
+        close = self._symptom_index.closest(normalized, 0.85)
+        if close:
+            return False, f"Did you mean '{close}'? This symptom already exists.", close
+
+        return True, "", normalized
@@ -0,0 +1,37 @@
+import random
+import uuid
+
+import pytest
+
+from bayesian_model import BayesianDiseaseModel
+
+
+@pytest.fixture(scope="session")
+def model():
+    return BayesianDiseaseModel()
+
+
+@pytest.fixture
+def cases(model):
+    """300 random symptom dicts over the built-in catalogue, reproducible."""
+    rng = random.Random(7)
+    return [
+        {symptom: rng.choice(model.severity_levels) for symptom in rng.sample(model.symptoms, rng.randint(0, 6))}
+        for _ in range(300)
+    ]
+
+
+@pytest.fixture
+def client():
+    import app
+    return app.app.test_client()
+
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Authorization headers for a freshly registered user."""
+    username = f"user-{uuid.uuid4()}"
+    client.post('/api/register', json={"username": username, "password": "pw", "name": "Test"})
+    token = client.post('/api/login', json={"username": username, "password": "pw"}).get_json()["token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,94 @@
+import pytest
+
+from bayesian_model import BayesianDiseaseModel
+
+
+def test_numpy_backend_matches_python_reference(model, cases):
+    reference = BayesianDiseaseModel(backend="python", cache_size=0)
+    for symptoms in cases:
+        result, expected = model.predict(symptoms), reference.predict(symptoms)
+        assert result == expected
+        assert list(result["probability_distribution"]) == list(expected["probability_distribution"])
+
+
+def test_unknown_entries_are_ignored(model):
+    symptoms = {"Fever": "Severe"}
+    noisy = dict(symptoms, Nonexistent="Severe", Cough="Extreme")
+    assert model.predict(noisy)["probability_distribution"] == model.predict(symptoms)["probability_distribution"]
+
+
+def test_top_k_ranks_the_most_probable_diseases(model, cases):
+    for symptoms in cases[:50]:
+        full = model.predict(symptoms)
+        top = model.predict(symptoms, top_k=3, full_distribution=False)
+        assert "probability_distribution" not in top
+        assert [p for _, p in top["all_diseases"]] == pytest.approx([p for _, p in full["all_diseases"][:3]])
+
+
+def test_predict_batch_matches_predict(model, cases):
+    tied = {"Nausea": "Moderate", "Fever": "Severe", "Difficulty Breathing": "Mild"}
+    cases = [tied] + cases
+    # Batches of one must rank exact ties like larger batches and predict()
+    results = model.predict_batch(cases, top_k=3)
+    results_one_by_one = [model.predict_batch([symptoms], top_k=3)[0] for symptoms in cases]
+    for symptoms, result, alone in zip(cases, results, results_one_by_one):
+        single = model.predict(symptoms)
+        expected = [{"name": name, "probability": round(p * 100, 2)} for name, p in single["all_diseases"][:3]]
+        assert result == alone
+        assert result["most_probable_disease"] == single["most_probable_disease"]
+        assert result["most_probable_probability"] == single["most_probable_probability"]
+        assert result["top_diseases"] == expected
+
+
+def test_predict_batch_reports_invalid_cases_in_place(model):
+    results = model.predict_batch([{"Fever": "Severe"}, {"Fever": "Extreme"}, "not a dict"])
+    assert "most_probable_disease" in results[0]
+    assert "error" in results[1] and "error" in results[2]
+
+
+def test_log_inference_is_normalized(cases):
+    log_model = BayesianDiseaseModel(inference="log")
+    for symptoms in cases[:50]:
+        assert sum(p for _, p in log_model.predict(symptoms)["all_diseases"]) == pytest.approx(1.0)
+
+
+def test_evidence_key_round_trip(model, cases):
+    for symptoms in cases:
+        key = model.evidence_key(symptoms)
+        assert model.decode_evidence(key) == {s: symptoms[s] for s in model.symptoms if s in symptoms}
+    with pytest.raises(ValueError):
+        model.decode_evidence(-1)
+
+
+def test_mutating_a_result_does_not_corrupt_the_cache():
+    model = BayesianDiseaseModel()
+    symptoms = {"Fever": "Severe", "Cough": "Mild"}
+    first = model.predict(symptoms)
+    expected = model.predict(symptoms)
+    for result in (first, model.predict(symptoms)):
+        result["probability_distribution"].clear()
+        result["all_diseases"].append(("Injected", 1.0))
+        result["most_probable_disease"] = "Injected"
+    assert model.predict(symptoms) == expected
+    assert model.prediction_cache.stats()["hits"] >= 3
+
+
+def test_custom_symptoms_borrow_from_the_same_body_part(model):
+    assert model.similar_symptom("Chest Burning") == "Chest Pain"
+    assert model.similar_symptom("Head Ache") == "Headache"
+    assert model.similar_symptom("Knee Pain") is None
+    assert model.similar_symptom("Upper Back Pain") is None
+
+
+@pytest.mark.parametrize("custom", ["Knee Pain", "Ankle Swelling", "Skin Rash"])
+def test_unrelated_custom_symptoms_leave_the_ranking_unchanged(model, cases, custom):
+    overlay = model.build_overlay([custom])
+    assert overlay.sources == {custom: None}
+    for symptoms in cases[:50]:
+        for severity in model.severity_levels:
+            expected = dict(model.predict(symptoms)["all_diseases"])
+            result = dict(model.predict(dict(symptoms, **{custom: severity}), overlay=overlay)["all_diseases"])
+            # Ranked to 12 digits, as diseases tied up to rounding may swap places
+            assert sorted(result, key=lambda name: (-round(result[name], 12), name)) == \
+                sorted(expected, key=lambda name: (-round(expected[name], 12), name))
+            assert result == pytest.approx(expected)
@@ -0,0 +1,10 @@
+import benchmark
+
+
+def test_batch_benchmarks_report_per_case_times():
+    document = benchmark.run(sizes=(14,), batch_size=20, repeat=1, only="batch", log=None)
+    results = document["results"]
+    assert set(results) == {f"{name}[14]" for name in benchmark.BATCH_BENCHMARKS}
+    for result in results.values():
+        assert result["items"] == 20
+        assert result["per_item_us"] == round(result["median_us"] / 20, 3)
@@ -0,0 +1,111 @@
+import csv
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from bayesian_model import BayesianDiseaseModel
+from fit_model import CaseCounts, count_file, count_files
+
+SYMPTOMS = ["Fever", "Cough", "Headache"]
+LEVELS = ["None", "Mild", "Severe"]
+
+
+@pytest.fixture(scope="module")
+def generated():
+    """Cases sampled from a known model: (diseases, prior, cpt, case list)."""
+    rng = np.random.default_rng(5)
+    diseases = ["Cold", "Flu", "Migraine"]
+    prior = np.array([0.5, 0.3, 0.2])
+    cpt = rng.dirichlet(np.ones(len(LEVELS)), size=(len(diseases), len(SYMPTOMS)))
+    labels = rng.choice(len(diseases), size=20000, p=prior)
+    cases = []
+    for d in labels.tolist():
+        levels = [rng.choice(len(LEVELS), p=cpt[d, s]) for s in range(len(SYMPTOMS))]
+        cases.append({"disease": diseases[d],
+                      "symptoms": {SYMPTOMS[s]: LEVELS[l] for s, l in enumerate(levels) if l != 0}})
+    return diseases, prior, cpt, cases
+
+
+def write_ndjson(path, cases, compress=False):
+    with (gzip.open(path, "wt") if compress else open(path, "w")) as f:
+        for case in cases:
+            f.write(json.dumps(case) + "\n")
+
+
+def write_csv(path, cases):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["disease"] + SYMPTOMS)
+        for case in cases:
+            writer.writerow([case["disease"]] + [case["symptoms"].get(symptom, "") for symptom in SYMPTOMS])
+
+
+def test_fit_recovers_the_generating_model(generated):
+    diseases, prior, cpt, cases = generated
+    counts = CaseCounts(SYMPTOMS, LEVELS)
+    index = {level: l for l, level in enumerate(LEVELS)}
+    disease_ids = [counts.disease_id(case["disease"]) for case in cases]
+    levels = [[index[case["symptoms"].get(symptom, "None")] for symptom in SYMPTOMS] for case in cases]
+    counts.add(disease_ids, levels)
+    fitted_diseases, fitted_prior, fitted_cpt = counts.fit()
+    assert fitted_diseases == diseases
+    np.testing.assert_allclose(fitted_prior, prior, atol=0.02)
+    np.testing.assert_allclose(fitted_cpt, cpt, atol=0.03)
+    np.testing.assert_allclose(fitted_cpt.sum(axis=2), 1.0)
+
+
+def test_file_formats_count_the_same(generated, tmp_path):
+    cases = generated[3][:3000]
+    write_ndjson(tmp_path / "cases.ndjson", cases)
+    write_ndjson(tmp_path / "cases.jsonl.gz", cases, compress=True)
+    write_csv(tmp_path / "cases.csv", cases)
+    results = [count_file(str(tmp_path / name), SYMPTOMS, LEVELS, chunk_size=700)
+               for name in ("cases.ndjson", "cases.jsonl.gz", "cases.csv")]
+    for counts in results[1:]:
+        assert counts.diseases == results[0].diseases
+        np.testing.assert_array_equal(counts.counts, results[0].counts)
+    assert results[0].n_cases == 3000
+
+
+def test_bad_cases_are_skipped(tmp_path):
+    path = tmp_path / "cases.ndjson"
+    path.write_text('{"disease": "Flu", "symptoms": {"Fever": "Severe"}}\n'
+                    'not json\n'
+                    '{"disease": "Flu", "symptoms": {"Fever": "Extreme"}}\n'
+                    '{"symptoms": {}}\n'
+                    '{"disease": "Flu", "symptoms": {"Rash": "Mild"}}\n')
+    counts = count_file(str(path), SYMPTOMS, LEVELS)
+    assert (counts.n_cases, counts.skipped_cases, counts.unknown_symptoms) == (2, 3, 1)
+
+
+def test_parallel_and_saved_counts_merge_like_serial(generated, tmp_path):
+    cases = generated[3]
+    paths = []
+    for i in range(3):
+        paths.append(str(tmp_path / f"part{i}.ndjson"))
+        write_ndjson(paths[-1], cases[i::3])
+    serial = count_files(paths, SYMPTOMS, LEVELS)
+    parallel = count_files(paths, SYMPTOMS, LEVELS, workers=2)
+    count_file(paths[0], SYMPTOMS, LEVELS).save(str(tmp_path / "part0.npz"))
+    saved = count_files([str(tmp_path / "part0.npz")] + paths[1:], SYMPTOMS, LEVELS)
+    for counts in (parallel, saved):
+        assert counts.diseases == serial.diseases
+        np.testing.assert_array_equal(counts.counts, serial.counts)
+        np.testing.assert_array_equal(counts.disease_cases, serial.disease_cases)
+
+
+def test_fitted_artifact_round_trip(generated, tmp_path):
+    diseases, _, _, cases = generated
+    write_ndjson(tmp_path / "cases.ndjson", cases)
+    output = str(tmp_path / "fitted.bdm")
+    counts = count_file(str(tmp_path / "cases.ndjson"), SYMPTOMS, LEVELS)
+    counts.write_artifact(output)
+    fitted = counts.fit()
+
+    model = BayesianDiseaseModel(artifact=output)
+    assert (model.diseases, model.symptoms, model.severity_levels) == (diseases, SYMPTOMS, LEVELS)
+    np.testing.assert_allclose(model.prior_array, fitted[1])
+    np.testing.assert_allclose(model.cpt_array, fitted[2])
+    assert model.predict({"Fever": "Severe"})["most_probable_disease"] in diseases
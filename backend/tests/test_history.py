@@ -0,0 +1,29 @@
+import base64
+
+import pytest
+
+
+def _cursor(text):
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+
+def test_cursor_pages_through_history(client, auth_headers):
+    for n in range(5):
+        client.post('/api/history', json={"entry": {"n": n}}, headers=auth_headers)
+    seen, cursor = [], None
+    while True:
+        query = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = client.get('/api/history', query_string=query, headers=auth_headers).get_json()
+        seen += [entry["n"] for entry in body["history"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == list(range(5))
+    assert len(seen) == 5
+
+
+@pytest.mark.parametrize("cursor", ["!!!", _cursor("abc"), _cursor("-1"), _cursor("²"), _cursor("١٢"),
+                                    _cursor(str(2 ** 63)), _cursor("9" * 4000)])
+def test_malformed_cursors_are_rejected(client, auth_headers, cursor):
+    response = client.get('/api/history', query_string={"cursor": cursor}, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+from flask import Flask
+
+from json_provider import FastJSONProvider, orjson
+
+BIG = 2 ** 70
+
+
+@pytest.fixture
+def flask_app():
+    if orjson is None:
+        pytest.skip("orjson is not installed")
+    return Flask(__name__)
+
+
+@pytest.fixture
+def provider(flask_app):
+    return FastJSONProvider(flask_app)
+
+
+def test_wide_integers_fall_back_to_the_stdlib_encoder(flask_app, provider):
+    assert json.loads(provider.dumps({"n": BIG, "m": [1, -BIG]})) == {"n": BIG, "m": [1, -BIG]}
+    with flask_app.app_context():
+        assert json.loads(provider.response({"n": BIG}).get_data()) == {"n": BIG}
+
+
+def test_unserializable_values_still_raise(provider):
+    with pytest.raises(TypeError):
+        provider.dumps({"value": object()})
+
+
+def test_batch_predict_echoes_wide_ids(client):
+    response = client.post('/api/batch-predict', json={"cases": [{"id": BIG, "symptoms": {"Fever": "Severe"}}]})
+    assert response.status_code == 200
+    assert json.loads(response.get_data())["results"][0]["id"] == BIG
+
+
+def test_history_returns_wide_integers(client, auth_headers):
+    assert client.post('/api/history', json={"entry": {"n": BIG}}, headers=auth_headers).status_code == 200
+    response = client.get('/api/history', headers=auth_headers)
+    assert response.status_code == 200
+    assert json.loads(response.get_data())["history"] == [{"n": BIG}]
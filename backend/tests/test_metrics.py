@@ -0,0 +1,27 @@
+import gc
+import threading
+
+from metrics import MetricsRegistry
+
+
+def test_exited_threads_are_folded_into_the_totals():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+
+    def record():
+        requests.inc('/a')
+        latency.observe(0.5)
+
+    for _ in range(50):
+        thread = threading.Thread(target=record)
+        thread.start()
+        thread.join()
+    requests.inc('/a')
+    gc.collect()
+
+    assert len(registry._shards) == 1  # only the calling thread is still alive
+    text = registry.render()
+    assert 'requests_total{route="/a"} 51' in text
+    assert 'latency_seconds_bucket{le="1.0"} 50' in text
+    assert 'latency_seconds_sum 25.0' in text
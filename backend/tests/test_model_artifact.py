@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from bayesian_model import BayesianDiseaseModel
+from model_artifact import load_artifact, save_model
+
+
+def test_artifact_round_trip(model, cases, tmp_path):
+    path = str(tmp_path / "model.bdm")
+    save_model(model, path)
+    loaded = BayesianDiseaseModel(artifact=path)
+    assert (loaded.diseases, loaded.symptoms, loaded.severity_levels) == \
+        (model.diseases, model.symptoms, model.severity_levels)
+    np.testing.assert_array_equal(loaded._factor_rows, model._factor_rows)
+    assert loaded.predict_batch(cases, top_k=3) == model.predict_batch(cases, top_k=3)
+    for symptoms in cases[:50]:
+        assert loaded.predict(symptoms) == model.predict(symptoms)
+
+
+def test_artifact_tables_are_read_only(model, tmp_path):
+    path = str(tmp_path / "model.bdm")
+    save_model(model, path)
+    with pytest.raises(ValueError):
+        load_artifact(path).factor_rows[0, 0] = 1.0
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-model.bdm"
+    path.write_bytes(b"hello world, this is not a model artifact")
+    with pytest.raises(ValueError):
+        load_artifact(str(path))
+
+
+def test_reloads_use_the_smoothing_of_the_new_artifact(tmp_path):
+    from model_snapshots import ModelManager
+
+    path = str(tmp_path / "model.bdm")
+    save_model(BayesianDiseaseModel(inference="log", smoothing=0.05), path)
+    manager = ModelManager(BayesianDiseaseModel(inference="log"))
+    reloaded = manager.reload(path).model
+    assert (reloaded.inference, reloaded.smoothing) == ("log", 0.05)
+    np.testing.assert_array_equal(reloaded._log_factor_rows, load_artifact(path).log_factor_rows)
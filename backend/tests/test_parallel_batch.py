@@ -0,0 +1,71 @@
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from bayesian_model import BayesianDiseaseModel
+import parallel_batch
+from parallel_batch import ParallelBatchExecutor
+
+
+@pytest.fixture
+def executor(model):
+    executor = ParallelBatchExecutor(model, workers=2, min_shard_size=50)
+    yield executor
+    executor.close()
+
+
+def test_pooled_batch_matches_serial(model, executor, cases):
+    batch = cases + [{"Fever": "Extreme"}]
+    assert executor.predict_batch(batch, top_k=3) == model.predict_batch(batch, top_k=3)
+    assert executor._pool is not None
+
+
+def test_small_batches_stay_in_process(model, executor, cases):
+    assert executor.predict_batch(cases[:60]) == model.predict_batch(cases[:60])
+    assert executor._pool is None
+
+
+def test_tables_are_republished_after_the_model_changes(cases):
+    model = BayesianDiseaseModel()
+    executor = ParallelBatchExecutor(model, workers=2, min_shard_size=50)
+    try:
+        executor.predict_batch(cases)
+        priors = dict.fromkeys(model.diseases, 0.0)
+        priors[random.Random(3).choice(model.diseases)] = 1.0
+        model.set_priors(priors)
+        assert executor.predict_batch(cases) == model.predict_batch(cases)
+    finally:
+        executor.close()
+
+
+SERVER_SCRIPT = """
+import os
+import sys
+
+sys.path.insert(0, {backend!r})
+with open({log!r}, "a") as log:
+    log.write(f"{{os.getpid()}}\\n")
+
+from bayesian_model import BayesianDiseaseModel
+from parallel_batch import ParallelBatchExecutor, isolate_workers_from_main
+
+if __name__ == "__main__":
+    if {isolate!r}:
+        isolate_workers_from_main()
+    model = BayesianDiseaseModel()
+    executor = ParallelBatchExecutor(model, workers=2, min_shard_size=2)
+    assert executor.predict_batch([{{"Fever": "Mild"}}] * 8) == model.predict_batch([{{"Fever": "Mild"}}] * 8)
+    executor.close()
+"""
+
+
+@pytest.mark.parametrize("isolate, runs", [(True, 1), (False, 3)])
+def test_workers_do_not_rerun_the_server_script(tmp_path, isolate, runs):
+    log = tmp_path / "runs.log"
+    script = tmp_path / "server.py"
+    script.write_text(SERVER_SCRIPT.format(backend=os.path.dirname(os.path.abspath(parallel_batch.__file__)), log=str(log), isolate=isolate))
+    subprocess.run([sys.executable, str(script)], check=True, timeout=60)
+    assert len(log.read_text().split()) == runs
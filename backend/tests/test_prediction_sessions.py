@@ -0,0 +1,125 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def session_id(client):
+    response = client.post('/api/predict/session', json={"symptoms": {"Fever": "Severe", "Cough": "Mild"}})
+    assert response.status_code == 201
+    return response.get_json()["session_id"]
+
+
+def test_deltas_match_a_fresh_prediction(client, session_id):
+    response = client.patch(f'/api/predict/session/{session_id}',
+                            json={"set": {"Headache": "Moderate"}, "retract": ["Cough"]})
+    assert response.status_code == 200
+    expected = client.post('/api/predict', json={"symptoms": {"Fever": "Severe", "Headache": "Moderate"}})
+    assert response.get_json()["all_probabilities"] == pytest.approx(expected.get_json()["all_probabilities"],
+                                                                      abs=0.011)
+
+
+def test_duplicate_retractions_retract_once(client, session_id):
+    response = client.patch(f'/api/predict/session/{session_id}', json={"retract": ["Fever", "Fever"]})
+    assert response.status_code == 200
+    assert response.get_json()["input_symptoms"] == {"Cough": "Mild"}
+
+
+@pytest.mark.parametrize("retract", ["Fever", [["Fever"]], [{"a": 1}], [1], ["Headache"]])
+def test_bad_retractions_are_rejected(client, session_id, retract):
+    response = client.patch(f'/api/predict/session/{session_id}', json={"retract": retract})
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+@pytest.mark.parametrize("updates", [["Fever"], {"Fever": ["Severe"]}, {"Fever": "Extreme"}, {"Rash": "Mild"}])
+def test_bad_updates_are_rejected(client, session_id, updates):
+    assert client.patch(f'/api/predict/session/{session_id}', json={"set": updates}).status_code == 400
+
+
+def test_unknown_and_deleted_sessions(client, session_id):
+    assert client.delete(f'/api/predict/session/{session_id}').status_code == 200
+    assert client.patch(f'/api/predict/session/{session_id}', json={}).status_code == 404
+    assert client.delete(f'/api/predict/session/{session_id}').status_code == 404
+
+
+def test_sessions_survive_a_different_worker(client, session_id):
+    # Another worker process has none of this worker's in-process state
+    app.inference_sessions.clear()
+    response = client.patch(f'/api/predict/session/{session_id}', json={"retract": ["Cough"]})
+    assert response.status_code == 200
+    assert response.get_json()["input_symptoms"] == {"Fever": "Severe"}
+    app.inference_sessions.clear()
+    assert client.delete(f'/api/predict/session/{session_id}').status_code == 200
+
+
+def test_sessions_follow_custom_symptom_changes(client, auth_headers):
+    headers = auth_headers
+    assert client.post('/api/custom-symptoms', json={"text": "Chest Burning"}, headers=headers).status_code == 200
+
+    response = client.post('/api/predict/session', json={"symptoms": {"Chest Burning": "Severe"}}, headers=headers)
+    assert response.status_code == 201
+    session_id = response.get_json()["session_id"]
+    with_custom = response.get_json()["all_probabilities"]
+    baseline = client.post('/api/predict', json={"symptoms": {}}).get_json()["all_probabilities"]
+    assert with_custom != baseline
+
+    client.delete('/api/custom-symptoms', json={"text": "Chest Burning"}, headers=headers)
+    response = client.patch(f'/api/predict/session/{session_id}', json={}, headers=headers)
+    assert response.get_json()["all_probabilities"] == baseline
+
+
+@pytest.mark.parametrize("body", ['["Fever"]', '"Fever"', '{"set": ', 'null'])
+def test_non_object_bodies_are_rejected(client, session_id, body):
+    kwargs = {"data": body, "content_type": "application/json"}
+    assert client.post('/api/predict/session', **kwargs).status_code == 400
+    response = client.patch(f'/api/predict/session/{session_id}', **kwargs)
+    assert response.status_code == 400
+    assert app.store.prediction_session(session_id)[1] == {"Fever": "Severe", "Cough": "Mild"}
+
+
+def test_sessions_only_accept_their_owner(client, auth_headers):
+    response = client.post('/api/predict/session', json={"symptoms": {"Fever": "Severe"}}, headers=auth_headers)
+    session_id = response.get_json()["session_id"]
+    client.post('/api/register', json={"username": "session-intruder", "password": "pw", "name": "Other"})
+    token = client.post('/api/login', json={"username": "session-intruder", "password": "pw"}).get_json()["token"]
+    other_headers = {"Authorization": f"Bearer {token}"}
+
+    url = f'/api/predict/session/{session_id}'
+    assert client.patch(url, json={"retract": ["Fever"]}).status_code == 401
+    assert client.patch(url, json={"retract": ["Fever"]}, headers=other_headers).status_code == 403
+    assert client.delete(url, headers=other_headers).status_code == 403
+    assert app.store.prediction_session(session_id)[1] == {"Fever": "Severe"}
+    assert client.patch(url, json={"retract": ["Fever"]}, headers=auth_headers).status_code == 200
+    assert client.delete(url, headers=auth_headers).status_code == 200
+
+
+def test_concurrent_updates_apply_in_turn(session_id, monkeypatch):
+    validate = app._validate_session_symptoms
+    first_validated, resume = threading.Event(), threading.Event()
+
+    def pause_first_request(symptoms, username):
+        if not first_validated.is_set():
+            first_validated.set()
+            resume.wait(5)
+        return validate(symptoms, username)
+
+    monkeypatch.setattr(app, "_validate_session_symptoms", pause_first_request)
+
+    def retract_cough():
+        with app.app.test_client() as client:
+            return client.patch(f'/api/predict/session/{session_id}', json={"retract": ["Cough"]}).status_code
+
+    with ThreadPoolExecutor(2) as executor:
+        first = executor.submit(retract_cough)
+        first_validated.wait(5)
+        second = executor.submit(retract_cough)
+        # The second request must wait for the paused first one instead of racing it
+        with pytest.raises(TimeoutError):
+            second.result(timeout=0.3)
+        resume.set()
+        assert (first.result(), second.result()) == (200, 400)
+    assert app.store.prediction_session(session_id)[1] == {"Fever": "Severe"}
@@ -0,0 +1,44 @@
+import threading
+
+from profiling import TOKEN_HEADER, RequestProfiler
+
+
+def _environ(path="/api/predict"):
+    return {"REQUEST_METHOD": "POST", "PATH_INFO": path, TOKEN_HEADER: "secret"}
+
+
+def _app(environ, start_response):
+    start_response("200 OK", [])
+    return [b"ok"]
+
+
+def test_token_requests_are_profiled():
+    profiler = RequestProfiler(_app, token="secret")
+    assert profiler(_environ(), lambda status, headers, exc_info=None: None) == [b"ok"]
+    [summary] = profiler.summaries()
+    assert summary["status"] == 200 and summary["trigger"] == "header"
+    assert profiler.get(summary["id"])["collapsed"]
+
+
+def test_one_request_is_profiled_at_a_time_across_profilers():
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_app(environ, start_response):
+        entered.set()
+        release.wait(5)
+        return _app(environ, start_response)
+
+    first = RequestProfiler(slow_app, token="secret")
+    second = RequestProfiler(_app, token="secret")
+    thread = threading.Thread(target=first, args=(_environ(), lambda *args: None))
+    thread.start()
+    try:
+        assert entered.wait(5)
+        assert second(_environ(), lambda *args: None) == [b"ok"]
+        assert second.skipped == 1 and not second.summaries()
+    finally:
+        release.set()
+        thread.join()
+    assert len(first.summaries()) == 1
+    second(_environ(), lambda *args: None)
+    assert len(second.summaries()) == 1
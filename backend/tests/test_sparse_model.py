@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from bayesian_model import BayesianDiseaseModel, compile_factor_rows, compile_log_factor_rows
+from model_artifact import ModelArtifact
+
+
+def background_catalogue(n_diseases=400, n_symptoms=40, seed=0):
+    """A catalogue where each disease deviates from the shared background on only 2-5 symptoms."""
+    rng = np.random.default_rng(seed)
+    cpt_array = np.broadcast_to([0.85, 0.10, 0.04, 0.01], (n_diseases, n_symptoms, 4)).copy()
+    for d in range(n_diseases):
+        chosen = rng.choice(n_symptoms, size=rng.integers(2, 6), replace=False)
+        draws = rng.gamma(np.broadcast_to([0.5, 1.5, 2.5, 2.0], (len(chosen), 4)))
+        cpt_array[d, chosen] = draws / draws.sum(axis=1, keepdims=True)
+    prior = rng.pareto(1.5, size=n_diseases) + 1.0
+    prior /= prior.sum()
+    header = {
+        "diseases": [f"Disease {d}" for d in range(n_diseases)],
+        "symptoms": [f"Symptom {s}" for s in range(n_symptoms)],
+        "severity_levels": ["None", "Mild", "Moderate", "Severe"],
+        "smoothing": 1e-3
+    }
+    present = np.ones(cpt_array.shape, dtype=bool)
+    return ModelArtifact(header, {
+        "factor_rows": compile_factor_rows(prior, cpt_array),
+        "log_factor_rows": compile_log_factor_rows(prior, cpt_array, present, 1e-3)
+    })
+
+
+def random_cases(model, count=200, seed=1):
+    rng = np.random.default_rng(seed)
+    return [
+        {model.symptoms[s]: str(rng.choice(model.severity_levels)) for s in rng.choice(len(model.symptoms), size=n, replace=False)}
+        for n in rng.integers(0, 6, size=count)
+    ]
+
+
+def ranking(result):
+    """Ranked names, with diseases tied up to rounding error in name order."""
+    return [name for name, p in sorted(result["all_diseases"], key=lambda item: (-round(item[1], 12), item[0]))]
+
+
+def assert_same_prediction(result, expected):
+    assert result["most_probable_probability"] == expected["most_probable_probability"]
+    assert [p for _, p in result["all_diseases"]] == pytest.approx([p for _, p in expected["all_diseases"]], abs=1e-12)
+    assert ranking(result) == ranking(expected)
+
+
+@pytest.mark.parametrize("full_distribution", [True, False])
+def test_sparse_predict_matches_dense_log_inference(full_distribution):
+    artifact = background_catalogue()
+    dense = BayesianDiseaseModel(inference="log", cache_size=0, artifact=artifact)
+    sparse = BayesianDiseaseModel(inference="log", cache_size=0, artifact=artifact, sparse=True)
+    for symptoms in random_cases(dense):
+        for top_k in (1, 5, None):
+            if top_k is None and not full_distribution:
+                continue
+            assert_same_prediction(sparse.predict(symptoms, top_k, full_distribution),
+                                   dense.predict(symptoms, top_k, full_distribution))
+
+
+def test_sparse_predict_matches_dense_on_builtin_catalogue(cases):
+    dense = BayesianDiseaseModel(inference="log", cache_size=0)
+    sparse = BayesianDiseaseModel(inference="log", cache_size=0, sparse=True)
+    for symptoms in cases:
+        result, expected = sparse.predict(symptoms), dense.predict(symptoms)
+        assert result["probability_distribution"] == expected["probability_distribution"]
+        assert_same_prediction(result, expected)
+        # The built-in catalogue has exact ties, so top-k is checked against the sparse ranking itself
+        top = sparse.predict(symptoms, 3, False)["all_diseases"]
+        assert [name for name, _ in top] == [name for name, _ in result["all_diseases"][:3]]
+        assert [p for _, p in top] == pytest.approx([p for _, p in result["all_diseases"][:3]], abs=1e-12)
+
+
+def test_sparse_tables_store_only_deviations():
+    model = BayesianDiseaseModel(inference="log", cache_size=0, artifact=background_catalogue(), sparse=True)
+    n_diseases, n_symptoms, n_levels = model.log_cpt_array.shape
+    assert model._sparse.n_links <= n_diseases * 5 * n_levels
+    candidates, _ = model._sparse.candidates(model._encode({"Symptom 3": "Severe"}))
+    assert 0 < len(candidates) < n_diseases / 4
+
+
+def test_sparse_tables_follow_refresh():
+    model = BayesianDiseaseModel(inference="log", cache_size=0, sparse=True)
+    model.set_priors({**model.prior_probabilities, "Migraine": 0.9})
+    dense = BayesianDiseaseModel(inference="log", cache_size=0)
+    dense.set_priors({**dense.prior_probabilities, "Migraine": 0.9})
+    symptoms = {"Headache": "Severe", "Fever": "Mild"}
+    assert_same_prediction(model.predict(symptoms, 3, False), dense.predict(symptoms, 3, False))
+
+
+def test_sparse_requires_log_inference_and_smoothing():
+    with pytest.raises(ValueError):
+        BayesianDiseaseModel(sparse=True)
+    with pytest.raises(ValueError):
+        BayesianDiseaseModel(inference="log", smoothing=0, sparse=True)
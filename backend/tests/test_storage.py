@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+import storage
+from storage import MemoryStore, SQLiteStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        if request.param == "memory":
+            store = MemoryStore(**kwargs)
+        else:
+            store = SQLiteStore(str(tmp_path / f"store{len(stores)}.db"), **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def history_pages(store, username, limit):
+    pages, before = [], None
+    while True:
+        page, before = store.history_page(username, limit, before)
+        pages.append(page)
+        if before is None:
+            return pages
+
+
+def test_users(make_store):
+    store = make_store()
+    assert store.add_user("alice", "pw", "Alice")
+    assert not store.add_user("alice", "other", "Alice")
+    assert store.get_user("alice") == {"password": "pw", "name": "Alice"}
+    assert store.get_user("bob") is None
+
+
+def test_history_pages_newest_first_with_retention(make_store):
+    store = make_store()
+    for i in range(23):
+        store.add_history("alice", {"n": i}, retention=20)
+        store.add_history("bob", {"n": -i})
+    pages = history_pages(store, "alice", 7)
+    assert [len(page) for page in pages] == [7, 7, 6]
+    assert [entry["n"] for page in pages for _, entry in page] == list(range(22, 2, -1))
+    ids = [entry_id for page in pages for entry_id, _ in page]
+    assert ids == sorted(ids, reverse=True)
+    assert store.history_page("carol", 10) == ([], None)
+
+
+def test_history_exact_page_has_no_next_cursor(make_store):
+    store = make_store()
+    for i in range(5):
+        store.add_history("alice", i)
+    page, before = store.history_page("alice", 5)
+    assert len(page) == 5 and before is None
+
+
+def test_custom_symptoms(make_store):
+    store = make_store()
+    assert store.add_custom_symptom("alice", "Knee Pain")
+    assert store.add_custom_symptom("alice", "Back Pain")
+    assert not store.add_custom_symptom("alice", "Knee Pain")
+    assert store.custom_symptoms("alice") == ["Knee Pain", "Back Pain"]
+    assert store.remove_custom_symptom("alice", "Knee Pain")
+    assert not store.remove_custom_symptom("alice", "Knee Pain")
+    assert store.custom_symptoms("alice") == ["Back Pain"]
+    assert store.custom_symptoms("bob") == []
+
+
+def test_sizes(make_store):
+    store = make_store()
+    store.add_user("alice", "pw", "Alice")
+    store.add_history("alice", {})
+    store.add_custom_symptom("alice", "Knee Pain")
+    store.save_prediction_session("s1", "alice", {"Fever": "Mild"})
+    assert store.sizes() == {"users": 1, "history_entries": 1, "custom_symptoms": 1, "prediction_sessions": 1}
+
+
+def test_prediction_sessions(make_store):
+    store = make_store()
+    store.save_prediction_session("s1", "alice", {"Fever": "Mild"})
+    store.save_prediction_session("s2", None, {})
+    store.save_prediction_session("s1", "alice", {"Fever": "Severe", "Cough": "Mild"})
+    assert store.prediction_session("s1") == ("alice", {"Fever": "Severe", "Cough": "Mild"})
+    assert store.prediction_session("s2") == (None, {})
+    assert store.prediction_session("s3") is None
+    assert store.delete_prediction_session("s1")
+    assert not store.delete_prediction_session("s1")
+    assert store.prediction_session("s1") is None
+
+
+def test_prediction_sessions_are_capped(make_store, monkeypatch):
+    store = make_store()
+    monkeypatch.setattr(storage, "MAX_PREDICTION_SESSIONS", 2)
+    for session_id in ("s1", "s2", "s3"):
+        store.save_prediction_session(session_id, None, {})
+        time.sleep(0.01)
+    assert store.prediction_session("s1") is None
+    assert store.prediction_session("s3") == (None, {})
+    assert store.sizes()["prediction_sessions"] == 2
+
+
+def test_prediction_sessions_expire(make_store, monkeypatch):
+    store = make_store()
+    monkeypatch.setattr(storage, "PREDICTION_SESSION_TTL", 0.05)
+    store.save_prediction_session("s1", None, {"Fever": "Mild"})
+    time.sleep(0.1)
+    assert store.prediction_session("s1") is None
+    assert not store.delete_prediction_session("s1")
+
+
+def test_sessions_are_capped_per_user(make_store):
+    store = make_store(max_sessions_per_user=2)
+    for token in ("t1", "t2", "t3"):
+        store.create_session(token, "alice")
+        time.sleep(0.01)
+    assert store.session_user("t1") is None
+    assert store.session_user("t2") == "alice" and store.session_user("t3") == "alice"
+    assert store.session_stats()["live"] == 2
+
+
+def test_sessions_expire(make_store):
+    store = make_store(session_ttl=0.05)
+    store.create_session("t1", "alice")
+    assert store.session_user("t1") == "alice"
+    time.sleep(0.1)
+    assert store.session_user("t1") is None
+
+
+def test_backends_agree(tmp_path):
+    memory, sqlite = MemoryStore(), SQLiteStore(str(tmp_path / "agree.db"))
+    for store in (memory, sqlite):
+        for i in range(40):
+            store.add_history(f"user{i % 3}", {"n": i, "tags": ["a", i]}, retention=10)
+            store.add_custom_symptom(f"user{i % 3}", f"Symptom {i % 5} Pain")
+    for username in ("user0", "user1", "user2", "nobody"):
+        assert [[entry for _, entry in page] for page in history_pages(memory, username, 4)] == \
+            [[entry for _, entry in page] for page in history_pages(sqlite, username, 4)]
+        assert memory.custom_symptoms(username) == sqlite.custom_symptoms(username)
+    assert memory.sizes() == sqlite.sizes()
+    sqlite.close()
@@ -0,0 +1,76 @@
+import random
+import re
+from difflib import get_close_matches
+
+import pytest
+
+from symptom_validator import ALLOWED_TERMS, DESCRIPTORS, FuzzyIndex, SymptomValidator, normalize_symptom
+
+
+def baseline_verdict(symptom, model_symptoms):
+    """The validator as it was before precompilation, kept as the reference."""
+    if not symptom or not isinstance(symptom, str):
+        return False, "Symptom must be a non-empty string", ""
+    normalized = normalize_symptom(symptom)
+    if not re.match(r"^[A-Za-z\s\-/]+$", normalized):
+        return False, "Only letters, spaces, hyphen and slash are allowed", ""
+    if normalized in model_symptoms:
+        return False, "Symptom already exists in the system", normalized
+    tokens = [t for t in re.split(r"\s+", normalized) if t]
+    if len(tokens) < 2:
+        return False, "Please provide a more descriptive symptom (e.g., 'Back Pain').", ""
+    if any(len(t) < 3 for t in tokens):
+        return False, "Each word should have at least 3 letters.", ""
+    if not any(t in DESCRIPTORS for t in tokens):
+        return False, "Please end with a medical descriptor like 'Pain', 'Rash', 'Swelling', etc.", ""
+    non_descriptor_tokens = [t for t in tokens if t not in DESCRIPTORS]
+    if not any(t in ALLOWED_TERMS or get_close_matches(t, list(ALLOWED_TERMS), n=1, cutoff=0.85)
+               for t in non_descriptor_tokens):
+        close_any = get_close_matches(non_descriptor_tokens[0], list(ALLOWED_TERMS), n=1, cutoff=0.7) \
+            if non_descriptor_tokens else []
+        hint = f" Did you mean '{close_any[0]}'?" if close_any else ""
+        return False, "Please use a recognizable body area or symptom term." + hint, ""
+    close = get_close_matches(normalized, list(model_symptoms), n=1, cutoff=0.85)
+    if close:
+        return False, f"Did you mean '{close[0]}'? This symptom already exists.", close[0]
+    return True, "", normalized
+
+
+def mutate(word, rng):
+    """`word` with one random edit, to exercise the fuzzy matches."""
+    i = rng.randrange(len(word))
+    letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return rng.choice([word[:i] + word[i + 1:], word[:i] + letter + word[i:], word[:i] + letter + word[i + 1:]])
+
+
+@pytest.fixture(scope="module")
+def inputs(model):
+    rng = random.Random(11)
+    words = sorted(ALLOWED_TERMS | DESCRIPTORS) + ["Xyz", "Qwerty", "Leg"]
+    texts = ["", "  ", "Fever", "Back Pain", "back   pain", "Pain", "Ab Pain", "Knee 2 Pain", "Lower-back/Pain"]
+    texts += list(model.symptoms) + [mutate(symptom, rng) for symptom in model.symptoms]
+    for _ in range(400):
+        tokens = [rng.choice(words) for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.5:
+            tokens = [mutate(token, rng) for token in tokens]
+        texts.append(" ".join(tokens).lower() if rng.random() < 0.3 else " ".join(tokens))
+    return texts
+
+
+def test_fuzzy_index_matches_difflib(inputs):
+    index = FuzzyIndex(ALLOWED_TERMS)
+    for text in inputs:
+        for word in text.split() or [text]:
+            for cutoff in (0.7, 0.85):
+                expected = get_close_matches(word, list(ALLOWED_TERMS), n=1, cutoff=cutoff)
+                assert index.closest(word, cutoff) == (expected[0] if expected else None)
+
+
+def test_validator_matches_baseline_verdicts(model, inputs):
+    validator = SymptomValidator(model.symptoms)
+    for text in inputs + inputs:  # second pass is served from the memo
+        assert validator.validate(text) == baseline_verdict(text, set(model.symptoms))
+
+
+def test_non_string_input_is_rejected(model):
+    assert SymptomValidator(model.symptoms).validate(None)[0] is False
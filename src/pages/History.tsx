@@ -1,43 +1,48 @@
-import { useEffect, useState } from "react";
+import { useCallback, useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { Activity, History as HistoryIcon } from "lucide-react";
 
 const History = () => {
   const [history, setHistory] = useState<any[]>([]);
+  // Cursor of the next (older) page; null once every entry is loaded
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const navigate = useNavigate();
 
-  useEffect(() => {
-    const fetchHistory = async () => {
-      setLoading(true);
-      setError("");
-      try {
-        const token = localStorage.getItem("token");
-        if (!token) {
-          setError("Not logged in");
-          setLoading(false);
-          return;
-        }
-        const BASE_URL = (import.meta.env.VITE_BACKEND_URL as string) || "http://localhost:5000";
-        const response = await fetch(`${BASE_URL}/api/history`, {
-          headers: { Authorization: token }
-        });
-        const data = await response.json();
-        if (data.success) {
-          setHistory(data.history);
-        } else {
-          setError(data.error || "Failed to fetch history");
-        }
-      } catch (err) {
-        setError("Network error");
-      } finally {
-        setLoading(false);
+  // The API returns history newest first, one page at a time
+  const fetchHistory = useCallback(async (cursor: string | null) => {
+    setLoading(true);
+    setError("");
+    try {
+      const token = localStorage.getItem("token");
+      if (!token) {
+        setError("Not logged in");
+        return;
+      }
+      const BASE_URL = (import.meta.env.VITE_BACKEND_URL as string) || "http://localhost:5000";
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      const response = await fetch(`${BASE_URL}/api/history${query}`, {
+        headers: { Authorization: token }
+      });
+      const data = await response.json();
+      if (data.success) {
+        setHistory((previous) => (cursor ? [...previous, ...data.history] : data.history));
+        setNextCursor(data.next_cursor ?? null);
+      } else {
+        setError(data.error || "Failed to fetch history");
       }
-    };
-    fetchHistory();
+    } catch (err) {
+      setError("Network error");
+    } finally {
+      setLoading(false);
+    }
   }, []);
 
+  useEffect(() => {
+    fetchHistory(null);
+  }, [fetchHistory]);
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-background to-accent/20 py-10 px-4">
       <div className="max-w-3xl mx-auto">
@@ -50,7 +55,7 @@ const History = () => {
         </div>
 
         <div className="bg-card/80 backdrop-blur-sm border border-border/60 rounded-lg shadow-[var(--card-shadow)] p-6 animate-scale-in">
-          {loading && (
+          {loading && history.length === 0 && (
             <div className="flex items-center justify-center gap-3 text-muted-foreground py-8">
               <Activity className="w-5 h-5 animate-pulse" /> Loading history...
             </div>
@@ -79,6 +84,18 @@ const History = () => {
             ))}
           </ul>
 
+          {nextCursor && (
+            <div className="mt-4 text-center">
+              <button
+                className="px-4 py-2 border border-border/60 rounded hover:bg-accent/40 disabled:opacity-50"
+                disabled={loading}
+                onClick={() => fetchHistory(nextCursor)}
+              >
+                {loading ? "Loading..." : "Load older results"}
+              </button>
+            </div>
+          )}
+
           <div className="mt-6 text-right">
             <button className="px-4 py-2 bg-primary text-primary-foreground rounded hover:bg-primary-hover" onClick={() => navigate("/")}>Return to Home</button>
           </div>